@@ -2,11 +2,13 @@ from collections import deque
 
 import numpy as np
 from algorithm.parameters import params
+from representation.flat_tree import FlatTree
 from representation.tree import Tree
+from utilities.representation.phenotype_key import intern_phenotype
 from utilities.representation.python_filter import python_filter
 
 
-def mapper(genome, tree):
+def mapper(genome, tree, checkpoints=None):
     """
     Wheel for mapping. Calls the correct mapper for a given _input. Checks
     the params dict to ensure the correct type of individual is being created.
@@ -17,6 +19,9 @@ def mapper(genome, tree):
 
     :param genome: Genome of an individual.
     :param tree: Tree of an individual.
+    :param checkpoints: An optional list of mapping checkpoints for the
+    genome, which is updated in place. If given, the compiled grammar
+    mapper is used and resumes from the last valid checkpoint.
     :return: All components necessary for a fully mapped individual.
     """
 
@@ -31,13 +36,31 @@ def mapper(genome, tree):
         # This is a fast way of creating a new unique copy of the genome
         # (prevents cross-contamination of information between individuals).
 
-        if params['GENOME_OPERATIONS']:
+        if params['GENOME_OPERATIONS'] and checkpoints is not None:
+            # Resume mapping from the last valid checkpoint using the
+            # compiled grammar tables.
+            phenotype, genome, tree, nodes, invalid, depth, \
+            used_codons = map_ind_from_compiled_genome(genome, checkpoints)
+
+        elif params['GENOME_OPERATIONS'] and params['COMPILED_GRAMMAR']:
+            # Use the integer-indexed compiled grammar tables for the
+            # fastest possible mapping.
+            phenotype, genome, tree, nodes, invalid, depth, \
+            used_codons = map_ind_from_compiled_genome(genome)
+
+        elif params['GENOME_OPERATIONS']:
             # Can generate tree information faster using
             # algorithm.mapper.map_ind_from_genome() if we don't need to
             # store the whole tree.
             phenotype, genome, tree, nodes, invalid, depth, \
             used_codons = map_ind_from_genome(genome)
 
+        elif params['FLAT_TREES']:
+            # Build an array-backed flat tree using
+            # algorithm.mapper.map_flat_tree_from_genome().
+            phenotype, genome, tree, nodes, invalid, depth, \
+            used_codons = map_flat_tree_from_genome(genome)
+
         else:
             # Build the tree using algorithm.mapper.map_tree_from_genome().
             phenotype, genome, tree, nodes, invalid, depth, \
@@ -63,6 +86,9 @@ def mapper(genome, tree):
         # Set values for invalid individuals.
         phenotype, nodes, depth, used_codons = None, np.NaN, np.NaN, np.NaN
 
+    # Individuals with the same phenotype share a single string.
+    phenotype = intern_phenotype(phenotype)
+
     return phenotype, genome, tree, nodes, invalid, depth, used_codons
 
 
@@ -175,6 +201,248 @@ def map_ind_from_genome(genome):
     return output, genome, None, nodes, False, max_depth, used_input
 
 
+def map_ind_from_compiled_genome(genome, checkpoints=None):
+    """
+    A fast genotype to phenotype mapping process which uses the
+    integer-indexed compiled grammar tables in
+    representation.compiled_grammar.CompiledGrammar. Produces exactly the
+    same output as algorithm.mapper.map_ind_from_genome(), but symbols are
+    integer IDs, production choices are looked up in flat arrays, and the
+    number of unexpanded non-terminals is tracked as a running count rather
+    than by re-scanning the list of unexpanded symbols.
+
+    If a list of checkpoints is given, mapping resumes from the last
+    checkpoint in the list, rather than from the start rule. The list is
+    then updated in place with a new checkpoint of the mapping state every
+    params['MAPPING_CHECKPOINTS'] codons during the first pass over the
+    genome. Each checkpoint records the full mapping state immediately
+    after a given number of codons has been used:
+
+        (used_input, output_segment, unexpanded_symbols,
+         unexpanded_depths, max_depth, nodes, unexpanded_nts)
+
+    where output_segment is the output generated since the previous
+    checkpoint. Since the mapping state at a checkpoint only depends on the
+    codons used up to that point, a checkpoint is valid for any genome
+    which shares those codons (and is long enough to still be in its first
+    pass), e.g. the children of linear crossover and mutation.
+
+    :param genome: A genome to be mapped.
+    :param checkpoints: An optional list of mapping checkpoints valid for
+    this genome.
+    :return: Output in the form of a phenotype string ('None' if invalid),
+             Genome,
+             None (this is reserved for the derivation tree),
+             The number of nodes in the derivation,
+             A boolean flag for whether or not the individual is invalid,
+             The maximum depth of any node in the tree, and
+             The number of used codons.
+    """
+
+    # Create local variables to avoid multiple dictionary lookups
+    max_tree_depth, max_wraps = params['MAX_TREE_DEPTH'], params['MAX_WRAPS']
+    grammar = params['BNF_GRAMMAR'].compiled
+    n_nts, symbols = grammar.n_nts, grammar.symbols
+    no_choices, choice_offset = grammar.no_choices, grammar.choice_offset
+    productions = grammar.reversed_productions
+    arities, nt_counts = grammar.arities, grammar.nt_counts
+    node_counts = grammar.node_counts
+
+    n_input = len(genome)
+
+    # Depth, max_depth, and nodes start from 1 to account for starting root
+    # Initialise number of wraps at -1 (since the first pass over the genome
+    # is not a wrap).
+    used_input, max_depth, nodes, wraps = 0, 1, 1, -1
+
+    # Initialise output as empty list.
+    output = []
+
+    # Initialise the stack of unexpanded symbols with the start rule. The
+    # depth of each symbol is stored in a parallel stack. The last item on
+    # each stack is the next symbol to be expanded.
+    unexpanded_symbols, unexpanded_depths = [grammar.start_id], [1]
+
+    # Keep count of the number of unexpanded non-terminals.
+    unexpanded_nts = 1
+
+    if checkpoints is not None:
+        # Set the interval at which new checkpoints are recorded.
+        interval = params['MAPPING_CHECKPOINTS']
+
+        # Checkpoints are only valid during the first pass over the genome.
+        while checkpoints and checkpoints[-1][0] >= n_input:
+            checkpoints.pop()
+
+        if checkpoints:
+            # Resume mapping from the last valid checkpoint.
+            used_input, _, unexpanded_symbols, unexpanded_depths, \
+            max_depth, nodes, unexpanded_nts = checkpoints[-1]
+            unexpanded_symbols = list(unexpanded_symbols)
+            unexpanded_depths = list(unexpanded_depths)
+
+            # Rebuild the output generated up to the checkpoint.
+            output = [checkpoint[1] for checkpoint in checkpoints]
+
+        # Keep track of the start of the output generated since the last
+        # checkpoint.
+        segment_start = len(output)
+
+    while (wraps < max_wraps) and unexpanded_symbols:
+        # While there are unexpanded non-terminals, and we are below our
+        # wrapping limit, we can continue to map the genome.
+
+        if max_tree_depth and (max_depth > max_tree_depth):
+            # We have breached our maximum tree depth limit.
+            break
+
+        if used_input % n_input == 0 and \
+                used_input > 0 and \
+                unexpanded_nts:
+            # If we have reached the end of the genome and unexpanded
+            # non-terminals remain, then we need to wrap back to the start
+            # of the genome again. Can break the while loop.
+            wraps += 1
+
+        # Expand a production from the stack of unexpanded symbols.
+        current_symbol = unexpanded_symbols.pop()
+        current_depth = unexpanded_depths.pop()
+
+        if max_depth < current_depth:
+            # Set the new maximum depth.
+            max_depth = current_depth
+
+        # Set output if it is a terminal.
+        if current_symbol >= n_nts:
+            output.append(symbols[current_symbol])
+
+        else:
+            # Current item is a non-terminal. Select the index of the
+            # production based on the next available codon in the genome.
+            production = choice_offset[current_symbol] + \
+                         genome[used_input % n_input] % \
+                         no_choices[current_symbol]
+
+            # Use an input
+            used_input += 1
+
+            # Add the new children to the stack of unexpanded symbols.
+            unexpanded_symbols.extend(productions[production])
+            unexpanded_depths.extend([current_depth + 1] *
+                                     arities[production])
+
+            # Update the number of unexpanded non-terminals and the number
+            # of nodes.
+            unexpanded_nts += nt_counts[production] - 1
+            nodes += node_counts[production]
+
+            if checkpoints is not None and used_input % interval == 0 and \
+                    used_input < n_input:
+                # Record a checkpoint of the current mapping state.
+                checkpoints.append((used_input,
+                                    "".join(output[segment_start:]),
+                                    tuple(unexpanded_symbols),
+                                    tuple(unexpanded_depths),
+                                    max_depth, nodes, unexpanded_nts))
+                segment_start = len(output)
+
+    # Generate phenotype string.
+    output = "".join(output)
+
+    if len(unexpanded_symbols) > 0:
+        # All non-terminals have not been completely expanded, invalid
+        # solution.
+        return None, genome, None, nodes, True, max_depth, used_input
+
+    return output, genome, None, nodes, False, max_depth, used_input
+
+
+def map_genomes(genomes, checkpoints=None):
+    """
+    Map a whole list of genomes together in a single batch. Returns exactly
+    the same information for each genome as algorithm.mapper.mapper(), but
+    all genomes share the same mapping state (grammar tables and local
+    lookups are only set up once), and identical genomes (e.g. clones of
+    parents which passed unchanged through variation) are only mapped once.
+
+    If linear genome operations are not being used (i.e. full derivation
+    trees are required), genomes are mapped one at a time with
+    algorithm.mapper.mapper().
+
+    :param genomes: A list of genomes to be mapped.
+    :param checkpoints: An optional list of mapping checkpoint lists, one
+    for each genome. Each list is updated in place, as in
+    algorithm.mapper.map_ind_from_compiled_genome().
+    :return: A list of all components necessary for a fully mapped
+    individual for each genome, in the same order as the given genomes.
+    """
+
+    if not params['GENOME_OPERATIONS']:
+        # Full derivation trees need to be built for each genome.
+        return [mapper(genome, None) for genome in genomes]
+
+    if checkpoints is None:
+        # No checkpoints are used.
+        checkpoints = [None] * len(genomes)
+
+    # Select the linear mapping engine once for the whole batch.
+    if params['COMPILED_GRAMMAR']:
+        map_genome = map_ind_from_compiled_genome
+    else:
+        map_genome = map_ind_from_genome
+
+    python_mode = params['BNF_GRAMMAR'].python_mode
+
+    # Map each unique genome only once.
+    mapped = {}
+
+    for genome, genome_checkpoints in zip(genomes, checkpoints):
+        key = tuple(genome)
+
+        if key in mapped:
+            if genome_checkpoints is not None and \
+                    mapped[key][-1] is not None:
+                # Copy the checkpoints of the identical genome.
+                genome_checkpoints[:] = mapped[key][-1]
+
+        else:
+            # Map a new unique genome.
+            if genome_checkpoints is not None:
+                # Resume mapping from the last valid checkpoint.
+                phenotype, _, _, nodes, invalid, depth, used_codons = \
+                    map_ind_from_compiled_genome(genome, genome_checkpoints)
+
+            else:
+                phenotype, _, _, nodes, invalid, depth, used_codons = \
+                    map_genome(genome)
+
+            if python_mode and not invalid:
+                # Grammar contains python code
+                phenotype = python_filter(phenotype)
+
+            if invalid:
+                # Set values for invalid individuals.
+                phenotype, nodes, depth, used_codons = None, np.NaN, \
+                                                       np.NaN, np.NaN
+
+            # Individuals with the same phenotype share a single string.
+            phenotype = intern_phenotype(phenotype)
+
+            mapped[key] = phenotype, nodes, invalid, depth, used_codons, \
+                          genome_checkpoints
+
+    # Build the mapped output for every genome. Each genome is given its
+    # own unique copy.
+    output = []
+    for genome in genomes:
+        phenotype, nodes, invalid, depth, used_codons, _ = \
+            mapped[tuple(genome)]
+        output.append((phenotype, list(genome), None, nodes, invalid, depth,
+                       used_codons))
+
+    return output
+
+
 def map_tree_from_genome(genome):
     """
     Maps a full tree from a given genome.
@@ -203,11 +471,146 @@ def map_tree_from_genome(genome):
                used_codons
 
 
+def map_flat_tree_from_genome(genome):
+    """
+    Maps a full array-backed flat derivation tree (an instance of the
+    representation.flat_tree.FlatTree class) from a given genome. Produces
+    exactly the same output as algorithm.mapper.map_tree_from_genome(), but
+    without recursion, and without creating a node object for every node in
+    the tree. Nodes are appended to the flat tree in preorder as they are
+    created.
+
+    :param genome: A genome to be mapped.
+    :return: All components necessary for a fully mapped individual.
+    """
+
+    # Create local variables to avoid multiple dictionary lookups
+    max_tree_depth = params['MAX_TREE_DEPTH']
+    grammar = params['BNF_GRAMMAR'].compiled
+    n_nts, symbol_strings = grammar.n_nts, grammar.symbols
+    no_choices, choice_offset = grammar.no_choices, grammar.choice_offset
+    productions, nt_counts = grammar.productions, grammar.nt_counts
+
+    n_input = len(genome)
+    limit = n_input * (params['MAX_WRAPS'] + 1)
+
+    # Initialise the preorder node arrays with the root node.
+    symbols, codons, depths, parents = [grammar.start_id], [-1], [1], [-1]
+
+    # Initialise output as empty list.
+    output = []
+
+    used_input, max_depth, nodes, invalid = 0, 0, 0, False
+
+    # Each frame on the stack is a non-terminal node which is currently
+    # being expanded: [node index, node depth, production, index of next
+    # symbol in the production]. Expanding a node is equivalent to a call
+    # of algorithm.mapper.genome_tree_map().
+    frames = []
+    expand = 0
+
+    while True:
+
+        if expand is not None:
+            # Expand the non-terminal node at index expand.
+
+            if not invalid and used_input < limit:
+                # If the solution is not invalid thus far, and if we still
+                # have remaining codons in the genome, then we can continue
+                # to map the tree.
+
+                if max_tree_depth and (max_depth > max_tree_depth):
+                    # We have breached our maximum tree depth limit.
+                    invalid = True
+
+                # Increment number of nodes.
+                nodes += 1
+
+                # Set the current codon value from the genome, and select the
+                # production.
+                codon = genome[used_input % n_input]
+                symbol = symbols[expand]
+                production = choice_offset[symbol] + codon % no_choices[symbol]
+                codons[expand] = codon
+
+                # Increment the index
+                used_input += 1
+
+                frames.append([expand, depths[expand], production, 0])
+
+            else:
+                # Mapping incomplete, solution is invalid.
+                invalid = True
+
+            expand = None
+
+        if not frames:
+            # The whole tree has been mapped.
+            break
+
+        frame = frames[-1]
+        index, depth, production, position = frame
+
+        if position < len(productions[production]):
+            # Add the next child to the derivation tree.
+            symbol = productions[production][position]
+            frame[3] += 1
+
+            symbols.append(symbol)
+            codons.append(-1)
+            depths.append(depth + 1)
+            parents.append(index)
+
+            if symbol >= n_nts:
+                # Child is a terminal, do not expand.
+                output.append(symbol_strings[symbol])
+
+            else:
+                # Expand the non-terminal child next.
+                expand = len(symbols) - 1
+
+        else:
+            # All children of the current node have been added.
+            frames.pop()
+
+            if not nt_counts[production]:
+                # There are no non-terminals in the chosen production
+                # choice, the branch terminates here.
+                depth += 1
+                nodes += 1
+
+            if not invalid:
+                # The solution is valid thus far.
+
+                if depth > max_depth:
+                    # Set the new maximum depth.
+                    max_depth = depth
+
+                if max_tree_depth and (max_depth > max_tree_depth):
+                    # If our maximum depth exceeds the limit, the solution
+                    # is invalid.
+                    invalid = True
+
+    # Build the flat tree.
+    tree = FlatTree.from_lists(symbols, codons, depths, parents)
+
+    if invalid:
+        # Return "None" phenotype if invalid
+        return None, genome, tree, nodes, invalid, max_depth, used_input
+
+    else:
+        return "".join(output), genome, tree, nodes, invalid, max_depth, \
+               used_input
+
+
 def genome_tree_map(tree, genome, output, index, depth, max_depth, nodes,
                     invalid=False):
     """
-    Recursive function which builds a tree using production choices from a
-    given genome. Not guaranteed to terminate.
+    Function which builds a tree using production choices from a given
+    genome. Not guaranteed to terminate. The tree is built depth-first with
+    an explicit stack rather than recursion, so there is no limit on the
+    depth of the tree. Nodes are mapped in exactly the same order as a
+    recursive depth-first mapping.
 
     :param tree: An instance of the representation.tree.Tree class.
     :param genome: A full genome.
@@ -227,83 +630,118 @@ def genome_tree_map(tree, genome, output, index, depth, max_depth, nodes,
              individual is invalid.
     """
 
-    if not invalid and index < len(genome) * (params['MAX_WRAPS'] + 1):
-        # If the solution is not invalid thus far, and if we still have
-        # remaining codons in the genome, then we can continue to map the tree.
+    # Each frame on the stack is a node which is currently being mapped:
+    # [node, node depth, chosen production, index of next symbol in the
+    # production].
+    frames = []
 
-        if params['MAX_TREE_DEPTH'] and (max_depth > params['MAX_TREE_DEPTH']):
-            # We have breached our maximum tree depth limit.
-            invalid = True
+    # Set the next node to be mapped.
+    expand = tree
 
-        # Increment and set number of nodes and current depth.
-        nodes += 1
-        depth += 1
-        tree.id, tree.depth = nodes, depth
+    while True:
+
+        if expand is not None:
+            # Map a new node.
+
+            if not invalid and index < len(genome) * (params['MAX_WRAPS'] + 1):
+                # If the solution is not invalid thus far, and if we still
+                # have remaining codons in the genome, then we can continue to
+                # map the tree.
+
+                if params['MAX_TREE_DEPTH'] and \
+                        (max_depth > params['MAX_TREE_DEPTH']):
+                    # We have breached our maximum tree depth limit.
+                    invalid = True
+
+                # Increment and set number of nodes and current depth.
+                nodes += 1
+                depth += 1
+                expand.id, expand.depth = nodes, depth
 
-        # Find all production choices and the number of those production
-        # choices that can be made by the current root non-terminal.
-        productions = params['BNF_GRAMMAR'].rules[tree.root]['choices']
-        no_choices = params['BNF_GRAMMAR'].rules[tree.root]['no_choices']
+                # Find all production choices and the number of those
+                # production choices that can be made by the current root
+                # non-terminal.
+                productions = params['BNF_GRAMMAR'].rules[expand.root][
+                    'choices']
+                no_choices = params['BNF_GRAMMAR'].rules[expand.root][
+                    'no_choices']
 
-        # Set the current codon value from the genome.
-        tree.codon = genome[index % len(genome)]
+                # Set the current codon value from the genome.
+                expand.codon = genome[index % len(genome)]
 
-        # Select the index of the correct production from the list.
-        selection = tree.codon % no_choices
+                # Select the index of the correct production from the list.
+                selection = expand.codon % no_choices
 
-        # Set the chosen production
-        chosen_prod = productions[selection]
+                # Set the chosen production
+                chosen_prod = productions[selection]
 
-        # Increment the index
-        index += 1
+                # Increment the index
+                index += 1
 
-        # Initialise an empty list of children.
-        tree.children = []
+                # Initialise an empty list of children.
+                expand.children = []
 
-        for symbol in chosen_prod['choice']:
-            # Add children to the derivation tree by creating a new instance
-            # of the representation.tree.Tree class for each child.
+                frames.append([expand, depth, chosen_prod['choice'], 0])
+
+            elif not frames:
+                # Mapping incomplete, solution is invalid.
+                return output, index, nodes, depth, max_depth, True
+
+            else:
+                # Mapping of this node is incomplete, solution is invalid.
+                # Continue with the remaining children of its parent.
+                invalid = True
+
+            expand = None
+
+        frame = frames[-1]
+        node, depth, symbols, position = frame
+
+        if position < len(symbols):
+            # Add the next child to the derivation tree by creating a new
+            # instance of the representation.tree.Tree class.
+            symbol = symbols[position]
+            frame[3] += 1
+
+            # Append the child to the parent node.
+            node.children.append(Tree(symbol["symbol"], node))
 
             if symbol["type"] == "T":
-                # Append the child to the parent node. Child is a terminal, do
-                # not recurse.
-                tree.children.append(Tree(symbol["symbol"], tree))
+                # Child is a terminal, append it to the output.
                 output.append(symbol["symbol"])
 
             elif symbol["type"] == "NT":
-                # Append the child to the parent node.
-                tree.children.append(Tree(symbol["symbol"], tree))
+                # Map the next non-terminal from the genome.
+                expand = node.children[-1]
 
-                # Recurse by calling the function again to map the next
-                # non-terminal from the genome.
-                output, index, nodes, d, max_depth, invalid = \
-                    genome_tree_map(tree.children[-1], genome, output,
-                                    index, depth, max_depth, nodes,
-                                    invalid=invalid)
+            continue
 
-    else:
-        # Mapping incomplete, solution is invalid.
-        return output, index, nodes, depth, max_depth, True
+        # All children of the current node have been mapped.
+        frames.pop()
 
-    # Find all non-terminals in the chosen production choice.
-    NT_kids = [kid for kid in tree.children if kid.root in
-               params['BNF_GRAMMAR'].non_terminals]
+        # Find all non-terminals in the chosen production choice.
+        NT_kids = [kid for kid in node.children if kid.root in
+                   params['BNF_GRAMMAR'].non_terminals]
 
-    if not NT_kids:
-        # There are no non-terminals in the chosen production choice, the
-        # branch terminates here.
-        depth += 1
-        nodes += 1
+        if not NT_kids:
+            # There are no non-terminals in the chosen production choice, the
+            # branch terminates here.
+            depth += 1
+            nodes += 1
 
-    if not invalid:
-        # The solution is valid thus far.
+        if not invalid:
+            # The solution is valid thus far.
 
-        if depth > max_depth:
-            # Set the new maximum depth.
-            max_depth = depth
+            if depth > max_depth:
+                # Set the new maximum depth.
+                max_depth = depth
 
-        if params['MAX_TREE_DEPTH'] and (max_depth > params['MAX_TREE_DEPTH']):
-            # If our maximum depth exceeds the limit, the solution is invalid.
-            invalid = True
+            if params['MAX_TREE_DEPTH'] and \
+                    (max_depth > params['MAX_TREE_DEPTH']):
+                # If our maximum depth exceeds the limit, the solution is
+                # invalid.
+                invalid = True
 
-    return output, index, nodes, depth, max_depth, invalid
+        if not frames:
+            # The whole tree has been mapped.
+            return output, index, nodes, depth, max_depth, invalid
@@ -30,6 +30,10 @@ params = {
     'DATASET_TRAIN': "Vladislavleva4/Train.txt",
     'DATASET_TEST': None,
     'DATASET_DELIMITER': None,
+    # Cache parsed datasets as binary files in this directory, so that
+    # later runs load them rather than parse them again. None switches the
+    # dataset cache off.
+    'DATASET_CACHE_DIR': None,
 
     # Set grammar file
     'GRAMMAR_FILE': "supervised_learning/Vladislavleva4.bnf",
@@ -50,11 +54,72 @@ params = {
 
     # Set max sizes of individuals
     'MAX_TREE_DEPTH': 90,  # SET TO 90 DUE TO PYTHON EVAL() STACK LIMIT.
-    # INCREASE AT YOUR OWN RISK.
+    # INCREASE AT YOUR OWN RISK, OR USE STACK_EVALUATION.
     'MAX_TREE_NODES': None,
     'CODON_SIZE': 100000,
     'MAX_GENOME_LENGTH': None,
     'MAX_WRAPS': 0,
+    # Use integer-indexed compiled grammar tables for faster genome
+    # mapping. Only used with linear genome operators.
+    'COMPILED_GRAMMAR': False,
+    # Map all individuals generated by linear crossover and mutation
+    # together in a single batch.
+    'BATCH_MAPPING': False,
+    # Store a checkpoint of the mapping state every n codons on each
+    # individual, so that the children of linear crossover and mutation can
+    # resume mapping from their parent's checkpoints. Only used with linear
+    # genome operators. Set to None to disable.
+    'MAPPING_CHECKPOINTS': None,
+    # Store derivation trees as array-backed flat trees rather than linked
+    # node objects. Only used with subtree operators.
+    'FLAT_TREES': False,
+    # Share derivation trees between copies of individuals, and only copy
+    # the path to the modified node during subtree crossover and mutation.
+    # Only used with subtree operators.
+    'COPY_ON_WRITE_TREES': False,
+    # Evaluate supervised learning phenotypes with an explicit stack rather
+    # than with eval(), so that very deep trees can be evaluated.
+    'STACK_EVALUATION': False,
+    # Evaluate all individuals in a generation together as a single
+    # expression DAG, so that each distinct subexpression is only computed
+    # once. Only used with supervised learning problems, and not with
+    # MULTICORE evaluation.
+    'DAG_EVALUATION': False,
+    # Cache the outputs of subexpressions over the dataset across
+    # generations, so that subtrees shared by many individuals are only
+    # computed once. Set to the maximum total size of cached outputs in
+    # megabytes; least recently used outputs are evicted first. Implies
+    # DAG_EVALUATION. None switches the cache off.
+    'SEMANTIC_CACHE_SIZE': None,
+    # Evaluate each generation on a sample of the training data rather than
+    # on all of it. Values below 1 are a fraction of the training data,
+    # other values are a number of rows. None uses all training data. Only
+    # used with supervised learning problems.
+    'TRAINING_SAMPLE_SIZE': None,
+    # Set the method used to sample the training data: "random" or
+    # "stratified" (by class, or by range of output values).
+    'TRAINING_SAMPLE_METHOD': "random",
+    # Evaluate every n-th generation on all training data when
+    # TRAINING_SAMPLE_SIZE is specified. None always uses a sample.
+    'FULL_EVALUATION_INTERVAL': None,
+    # Stop evaluating new individuals once their error over the fitness
+    # cases evaluated so far shows that they cannot reach the fitness of the
+    # individual at this quantile of the current population (ranked from
+    # best to worst, so 1 is the worst individual). Only used with
+    # supervised learning problems and error metrics which sum the errors
+    # of fitness cases (mae, mse, rmse, Hamming_error). None switches
+    # racing off.
+    'RACING_QUANTILE': None,
+    # Set the number of rows of training data evaluated between checks of
+    # the racing bound. None uses a tenth of the training data, or
+    # STREAMING_CHUNK_SIZE if it is specified.
+    'RACING_CHUNK_SIZE': None,
+    # Evaluate phenotypes on chunks of this many rows of data at a time,
+    # computing the error metric incrementally, so that datasets larger than
+    # memory can be used (with DATASET_CACHE_DIR, which memory-maps them).
+    # Only used with supervised learning problems and error metrics which
+    # sum the errors of fitness cases. None evaluates all rows at once.
+    'STREAMING_CHUNK_SIZE': None,
 
     # INITIALISATION
     # Set initialisation operator.
@@ -131,6 +196,39 @@ params = {
     'MULTICORE': False,
     # Set the number of cpus to be used for multiprocessing
     'CORES': cpu_count(),
+    # The number of individuals sent to a worker at once for multi-core
+    # evaluation. None sets the chunk size automatically, so that each
+    # worker is sent about four chunks per generation.
+    'MULTICORE_CHUNK_SIZE': None,
+    # Keep the training and test datasets of supervised learning problems
+    # in shared memory, so that multicore workers do not each hold their
+    # own copy of the data.
+    'SHARED_MEMORY_DATA': False,
+    # The number of evaluation processes used to evaluate progsys programs
+    # concurrently. None evaluates programs one at a time in a single
+    # evaluation process.
+    'PROGSYS_EVALUATORS': None,
+    # The number of worker processes used to evaluate regexes with the
+    # RegexEval fitness function, and the time limit in seconds for the
+    # evaluation of each regex. Workers are reused for many evaluations,
+    # and only a worker which runs over the time limit is replaced.
+    'REGEX_WORKERS': 1,
+    'REGEX_TIMEOUT': 1,
+    # The cost of a regex added to its functionality error by RegexEval.
+    # "time" uses the wall-clock time taken to run the regex on the test
+    # cases, "steps" uses the number of steps taken by a backtracking
+    # matcher, which is deterministic. Each step costs REGEX_STEP_COST, which
+    # is about the time in seconds taken by a step of the re library.
+    'REGEX_COST': "time",
+    'REGEX_STEP_COST': 2.5e-8,
+    # Give regexes with nested repeats which can backtrack exponentially
+    # the default fitness without running them, rather than waiting for
+    # them to reach REGEX_TIMEOUT.
+    'REGEX_BACKTRACKING_CHECK': False,
+    # Save the test suites generated from seed regexes by RegexEval in this
+    # directory, so that later runs with the same seed regex load them
+    # rather than generate them again. None switches the cache off.
+    'REGEX_TEST_CACHE_DIR': None,
 
     # STATE SAVING/LOADING
     # Save the state of the evolutionary run every generation. You can
@@ -174,6 +272,35 @@ params = {
     # with mutated versions of the original individual. Hopefully this will
     # encourage diversity in the population.
     'MUTATE_DUPLICATES': False,
+    # Bounds the number of entries in the cache. When the cache is full,
+    # entries are evicted according to CACHE_EVICTION. Evicted phenotypes
+    # are no longer recognised as duplicates. None means no bound.
+    'CACHE_SIZE': None,
+    # Bounds the approximate memory use of the cache, in megabytes. None
+    # means no bound.
+    'CACHE_MEMORY': None,
+    # Eviction policy for a bounded cache: "lru" (least recently used),
+    # "lfu" (least frequently used) or "age" (oldest entries first).
+    'CACHE_EVICTION': "lru",
+    # The number of phenotypes which produced runtime errors to keep as a
+    # sample. Runtime errors are counted but only the most recent phenotypes
+    # are kept.
+    'RUNTIME_ERROR_SAMPLE_SIZE': 100,
+    # The keys used for phenotypes in the cache: "phenotype" (the phenotype
+    # string), "digest" (a fixed-size digest of the phenotype, which uses
+    # much less memory for long phenotypes) or "verified_digest" (a digest,
+    # checked for collisions by storing all phenotypes).
+    'PHENOTYPE_KEYS': "phenotype",
+    # Caches compiled phenotype code so that duplicate phenotypes (and the
+    # re-evaluation of the best individual on test data) are not compiled
+    # again. Set to the maximum number of compiled phenotypes to keep; least
+    # recently used code is evicted first. None switches the cache off.
+    'CODE_CACHE_SIZE': None,
+    # Path to an SQLite file used as a fitness cache which persists across
+    # runs. Runs with the same fitness function, datasets and error metric
+    # (e.g. all runs of an experiment) share fitnesses through this file,
+    # and may use it at the same time. None switches the cache off.
+    'PERSISTENT_CACHE': None,
 
     # MULTI-AGENT Parameters
     # True or False for multi-agent
@@ -309,6 +436,21 @@ def set_params(command_line_args, create_files=True):
                 "Only one of these parameters can be used at a time."
             raise Exception(s)
 
+        if params['PHENOTYPE_KEYS'] not in ["phenotype", "digest",
+                                            "verified_digest"]:
+            s = "algorithm.parameters.set_params\n" \
+                "Error: unknown phenotype key type '%s'.\n" \
+                "Valid types are 'phenotype', 'digest' and " \
+                "'verified_digest'." % params['PHENOTYPE_KEYS']
+            raise Exception(s)
+
+        if params['CACHE_EVICTION'] not in ["lru", "lfu", "age"]:
+            s = "algorithm.parameters.set_params\n" \
+                "Error: unknown cache eviction policy '%s'.\n" \
+                "Valid policies are 'lru', 'lfu' and 'age'." % \
+                params['CACHE_EVICTION']
+            raise Exception(s)
+
         # Initialise run lists and folders before we set imports.r
         initialise_run_params(create_files)
 
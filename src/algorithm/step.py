@@ -1,3 +1,4 @@
+from algorithm.parameters import params
 from fitness.evaluation import evaluate_fitness
 from operators.crossover import crossover
 from operators.mutation import mutation
@@ -28,6 +29,9 @@ def step(individuals):
     # Mutate the new population.
     new_pop = mutation(cross_pop)
 
+    # Let the fitness function see the current population.
+    params['FITNESS_FUNCTION'].set_population(individuals)
+
     # Evaluate the fitness of the new population.
     new_pop = evaluate_fitness(new_pop)
 
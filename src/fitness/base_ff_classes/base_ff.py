@@ -1,4 +1,5 @@
 import numpy as np
+from utilities.fitness.code_cache import compile_cached
 
 np.seterr(all="raise")
 
@@ -65,6 +66,61 @@ class base_ff:
         """
 
         # Evaluate the fitness of the phenotype
-        fitness = eval(ind.phenotype)
+        fitness = eval(compile_cached(ind.phenotype))
 
         return fitness
+
+    def evaluate_batch(self, individuals, **kwargs):
+        """
+        Default batched fitness execution call for all fitness functions.
+        Evaluates each individual in turn by calling the fitness function.
+        Fitness functions which can exploit batching (e.g. by evaluating
+        duplicate phenotypes only once, or by vectorising evaluation) can
+        over-write this function. Runtime errors must be handled as in
+        __call__, i.e. individuals which produce a runtime error are given
+        the default fitness and have ind.runtime_error set.
+
+        :param individuals: A list of individuals to be evaluated.
+        :param kwargs: Optional extra arguments.
+        :return: A list of the fitnesses of the individuals, in order.
+        """
+
+        return [self(ind, **kwargs) for ind in individuals]
+
+    def get_data_files(self):
+        """
+        Called when the persistent fitness cache is opened, to find the files
+        which the fitness function reads (e.g. datasets), so that changes to
+        them are detected. Fitness functions which read files must
+        over-write this function.
+
+        :return: A list of paths to the files read by the fitness function.
+        """
+
+        return []
+
+    def set_generation(self, generation):
+        """
+        Called before each population is evaluated, with the current
+        generation. Fitness functions which change from one generation to the
+        next (e.g. by evaluating on a different sample of the training data in
+        each generation) can over-write this function.
+
+        :param generation: The current generation.
+        :return: Nothing.
+        """
+
+        pass
+
+    def set_population(self, individuals):
+        """
+        Called with the current population before its offspring are
+        evaluated. Fitness functions which use the fitnesses of the current
+        population during evaluation (e.g. to stop evaluating offspring which
+        cannot compete with it) can over-write this function.
+
+        :param individuals: The current population.
+        :return: Nothing.
+        """
+
+        pass
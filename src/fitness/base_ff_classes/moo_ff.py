@@ -58,6 +58,57 @@ class moo_ff:
 
         return fitness
 
+    def evaluate_batch(self, individuals):
+        """
+        Evaluate a batch of individuals at once. Each individual fitness
+        function evaluates the whole batch with its own evaluate_batch()
+        method, so that each objective can exploit batching.
+
+        :param individuals: A list of individuals to be evaluated.
+        :return: A list of the fitnesses of the individuals, in order.
+        """
+
+        # Evaluate all individuals on each objective.
+        objectives = [ff.evaluate_batch(individuals) for ff in
+                      self.fitness_functions]
+
+        fitnesses = []
+
+        for fitness in zip(*objectives):
+            fitness = list(fitness)
+
+            if any([isnan(i) for i in fitness]):
+                # Check if any objective fitness value is NaN, if so set
+                # default fitness.
+                fitness = self.default_fitness
+
+            fitnesses.append(fitness)
+
+        return fitnesses
+
+    def set_generation(self, generation):
+        """
+        Pass the current generation on to all individual fitness functions.
+
+        :param generation: The current generation.
+        :return: Nothing.
+        """
+
+        for ff in self.fitness_functions:
+            ff.set_generation(generation)
+
+    def set_population(self, individuals):
+        """
+        Called with the current population before its offspring are
+        evaluated. The fitnesses of multi-objective populations are not used
+        during evaluation.
+
+        :param individuals: The current population.
+        :return: Nothing.
+        """
+
+        pass
+
     @staticmethod
     def value(fitness_vector, objective_index):
         """
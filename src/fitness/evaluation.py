@@ -1,16 +1,38 @@
+from math import ceil
+
 import numpy as np
 
 from algorithm.parameters import params
 from stats.stats import stats
+from utilities.fitness import persistent_cache
+from utilities.representation.phenotype_key import get_phenotype_key, \
+    intern_phenotype
 from utilities.stats.trackers import cache, runtime_error_cache
 
 
+class TaskIndividual(object):
+    """
+    A lightweight stand-in for an individual, which is sent to multicore
+    workers for evaluation in place of the full individual.
+    """
+
+    pass
+
+
+# The attributes of individuals which are sent to multicore workers for
+# evaluation. Fitness functions may only use these attributes of
+# individuals if multicore evaluation is used.
+TASK_ATTRIBUTES = ["phenotype", "nodes", "depth", "used_codons", "invalid",
+                   "runtime_error"]
+
+
 def evaluate_fitness(individuals):
     """
     Evaluate an entire population of individuals. Invalid individuals are given
     a default bad fitness. If params['CACHE'] is specified then individuals
     have their fitness stored in a dictionary called utilities.trackers.cache.
-    Dictionary keys are the string of the phenotype.
+    Dictionary keys are given by the phenotype of each individual, see
+    utilities.representation.phenotype_key.
     There are currently three options for use with the cache:
         1. If params['LOOKUP_FITNESS'] is specified (default case if
            params['CACHE'] is specified), individuals which have already been
@@ -22,15 +44,43 @@ def evaluate_fitness(individuals):
            have already been evaluated are mutated to produce new unique
            individuals which have not been encountered yet by the search
            process.
+    With multi-core evaluation, all individuals which need to be evaluated
+    are sent to the pool of workers together once the whole population has
+    been checked against the cache. Otherwise, all individuals which need
+    to be evaluated are collected into a batch and evaluated together by
+    the evaluate_batch() method of the fitness function. Results are then
+    recorded in population order, exactly as if each individual had been
+    evaluated in turn. If the cache is used, the batch is evaluated before
+    any duplicate of an individual in the batch is checked against the
+    cache. With params['MUTATE_DUPLICATES'], mutated individuals must be
+    checked against an up to date cache, so individuals are evaluated one
+    at a time.
+
+    If params['PERSISTENT_CACHE'] is specified, individuals which are not
+    in the cache of the current run are looked up in the persistent fitness
+    cache (see utilities.fitness.persistent_cache), which is shared with
+    other runs. The fitnesses of all newly evaluated individuals are written
+    to the persistent cache at the end of each evaluation.
 
     :param individuals: A population of individuals to be evaluated.
     :return: A population of fully evaluated individuals.
     """
 
-    results, pool = [], None
+    tasks, batch = [], []
+
+    # Let the fitness function prepare for the current generation.
+    params['FITNESS_FUNCTION'].set_generation(stats['gen'])
+
+    # The set of phenotype keys of all individuals in the batch.
+    pending = set()
+
+    # The fitnesses of individuals evaluated by previous runs.
+    stored = {}
 
-    if params['MULTICORE']:
-        pool = params['POOL']
+    if params['PERSISTENT_CACHE']:
+        # Look up all valid individuals in the persistent cache at once.
+        stored = persistent_cache.lookup([ind.phenotype for ind in
+                                          individuals if not ind.invalid])
 
     for name, ind in enumerate(individuals):
         ind.name = name
@@ -45,15 +95,24 @@ def evaluate_fitness(individuals):
         else:
             eval_ind = True
 
+            # The key of the individual in the cache.
+            key = get_phenotype_key(ind.phenotype)
+
+            if params['CACHE'] and key in pending:
+                # The individual is a duplicate of an individual in the
+                # batch. Evaluate the batch so the cache is up to date.
+                evaluate_batch(batch)
+                batch, pending = [], set()
+
             # Valid individuals can be evaluated.
-            if params['CACHE'] and ind.phenotype in cache:
+            if params['CACHE'] and key in cache:
                 # The individual has been encountered before in
                 # the utilities.trackers.cache.
 
                 if params['LOOKUP_FITNESS']:
                     # Set the fitness as the previous fitness from the
                     # cache.
-                    ind.fitness = cache[ind.phenotype]
+                    ind.fitness = cache[key]
                     eval_ind = False
 
                 elif params['LOOKUP_BAD_FITNESS']:
@@ -64,71 +123,199 @@ def evaluate_fitness(individuals):
                 elif params['MUTATE_DUPLICATES']:
                     # Mutate the individual to produce a new phenotype
                     # which has not been encountered yet.
-                    while (not ind.phenotype) or ind.phenotype in cache:
+                    while (not ind.phenotype) or \
+                            get_phenotype_key(ind.phenotype) in cache:
                         ind = params['MUTATION'](ind)
                         stats['regens'] += 1
 
+                    key = get_phenotype_key(ind.phenotype)
+
                     # Need to overwrite the current individual in the pop.
                     individuals[name] = ind
                     ind.name = name
 
-            if eval_ind:
-                results = eval_or_append(ind, results, pool)
+            if eval_ind and ind.phenotype in stored:
+                # The individual has been evaluated by a previous run. Set
+                # the fitness from the persistent cache.
+                ind.fitness = stored[ind.phenotype]
+                persistent_cache.hits += 1
 
-    if params['MULTICORE']:
-        for result in results:
-            # Execute all jobs in the pool.
-            ind = result.get()
+                if params['CACHE']:
+                    cache[key] = ind.fitness
 
-            # Set the fitness of the evaluated individual by placing the
-            # evaluated individual back into the population.
-            individuals[ind.name] = ind
+            elif eval_ind and params['MULTICORE']:
+                # Evaluate the individual using the pool of workers.
+                tasks.append(ind)
 
+            elif eval_ind:
+                # Evaluate the individual as part of the batch.
+                batch.append(ind)
+                pending.add(key)
+
+                if params['MUTATE_DUPLICATES']:
+                    # The cache must be updated before the next individual
+                    # is checked.
+                    evaluate_batch(batch)
+                    batch, pending = [], set()
+
+    if batch:
+        # Evaluate all remaining individuals in the batch at once.
+        evaluate_batch(batch)
+
+    if tasks:
+        # Evaluate all individuals using the pool of workers.
+        evaluate_multicore(tasks)
+
+        for ind in tasks:
             # Add the evaluated individual to the cache.
-            cache[ind.phenotype] = ind.fitness
+            cache[get_phenotype_key(ind.phenotype)] = ind.fitness
 
             # Check if individual had a runtime error.
             if ind.runtime_error:
                 runtime_error_cache.append(ind.phenotype)
 
+            if params['PERSISTENT_CACHE']:
+                # Add the evaluated individual to the persistent cache.
+                persistent_cache.add(ind.phenotype, ind.fitness)
+
+    if params['PERSISTENT_CACHE']:
+        # Write all new fitnesses to the persistent cache at once.
+        persistent_cache.flush()
+
     return individuals
 
 
-def eval_or_append(ind, results, pool):
+def evaluate_multicore(individuals):
     """
-    Evaluates an individual if sequential evaluation is being used. If
-    multi-core parallel evaluation is being used, adds the individual to the
-    pool to be evaluated.
-
-    :param ind: An individual to be evaluated.
-    :param results: A list of individuals to be evaluated by the multicore
-    pool of workers.
-    :param pool: A pool of workers for multicore evaluation.
-    :return: The evaluated individual or the list of individuals to be
-    evaluated.
+    Evaluates a list of individuals in parallel using the multicore pool of
+    workers in params['POOL']. Only the attributes of each individual listed
+    in TASK_ATTRIBUTES (i.e. not the genome or derivation tree) are sent to
+    the workers, in chunks of params['MULTICORE_CHUNK_SIZE'] individuals, and
+    only the fitness and any attributes changed by the fitness function
+    (e.g. the runtime error flag) are sent back. The individuals are updated
+    in place.
+
+    :param individuals: A list of individuals to be evaluated.
+    :return: Nothing.
     """
 
-    if params['MULTICORE']:
-        # Add the individual to the pool of jobs.
-        results.append(pool.apply_async(ind.evaluate, ()))
-        return results
-
-    else:
-        # Evaluate the individual.
-        ind.evaluate()
-
-        # Check if individual had a runtime error.
-        if ind.runtime_error:
-            runtime_error_cache.append(ind.phenotype)
-
-        if params['CACHE']:
-            # The phenotype string of the individual does not appear
-            # in the cache, it must be evaluated and added to the
-            # cache.
-
-            if (isinstance(ind.fitness, list) and not
-            any([np.isnan(i) for i in ind.fitness])) or \
-                    (not isinstance(ind.fitness, list) and not
-                    np.isnan(ind.fitness)):
-                # All fitnesses are valid.
-                cache[ind.phenotype] = ind.fitness
+    chunk_size = params['MULTICORE_CHUNK_SIZE']
+
+    if not chunk_size:
+        # Send each worker about four chunks, so that work is still shared
+        # out evenly if some individuals take longer than others.
+        chunk_size = max(1, ceil(len(individuals) / (4 * params['CORES'])))
+
+    # Build the tasks for the workers.
+    tasks = [tuple(getattr(ind, attr, None) for attr in TASK_ATTRIBUTES)
+             for ind in individuals]
+    chunks = [tasks[i:i + chunk_size] for i in
+              range(0, len(tasks), chunk_size)]
+
+    results = params['POOL'].map(evaluate_chunk, chunks)
+
+    i = 0
+    for chunk in results:
+        for fitness, changes in chunk:
+            # Set the results of the evaluation on the individual.
+            ind = individuals[i]
+            ind.fitness = fitness
+
+            for attr, value in changes.items():
+                setattr(ind, attr, value)
+
+            # The phenotype of the individual was copied by the worker.
+            ind.phenotype = intern_phenotype(ind.phenotype)
+
+            i += 1
+
+
+def evaluate_chunk(tasks):
+    """
+    Evaluates a chunk of tasks in a multicore worker. Each task holds the
+    attributes of an individual given by TASK_ATTRIBUTES, which are set on a
+    lightweight stand-in for the individual which is then evaluated by the
+    fitness function.
+
+    :param tasks: A list of tuples of attributes of individuals.
+    :return: A list of tuples of the fitness of each individual, and a dict
+    of all attributes which were set or changed by the fitness function.
+    """
+
+    results = []
+
+    for task in tasks:
+        # Build a stand-in for the individual.
+        ind = TaskIndividual()
+        attrs = dict(zip(TASK_ATTRIBUTES, task))
+        vars(ind).update(attrs)
+
+        fitness = params['FITNESS_FUNCTION'](ind)
+
+        # Find all attributes which have been set or changed.
+        changes = {attr: value for attr, value in vars(ind).items() if
+                   attr not in attrs or attrs[attr] is not value}
+
+        results.append((fitness, changes))
+
+    return results
+
+
+def evaluate_batch(batch):
+    """
+    Evaluates a batch of individuals at once using the evaluate_batch()
+    method of the fitness function, then records the results of each
+    evaluation in order.
+
+    :param batch: A list of individuals to be evaluated.
+    :return: Nothing.
+    """
+
+    # Evaluate all individuals in the batch.
+    fitnesses = params['FITNESS_FUNCTION'].evaluate_batch(batch)
+
+    for ind, fitness in zip(batch, fitnesses):
+        # Set the fitness of each individual and record the result.
+        ind.fitness = fitness
+        record_evaluation(ind)
+
+
+def record_evaluation(ind):
+    """
+    Records the results of a sequential evaluation of an individual: adds
+    individuals with runtime errors to the runtime error cache, and adds the
+    fitness of the individual to the cache if params['CACHE'] is specified
+    and to the persistent cache if params['PERSISTENT_CACHE'] is specified.
+    Individuals whose evaluation was truncated by racing are counted but
+    not cached.
+
+    :param ind: An evaluated individual.
+    :return: Nothing.
+    """
+
+    # Check if individual had a runtime error.
+    if ind.runtime_error:
+        runtime_error_cache.append(ind.phenotype)
+
+    if ind.truncated:
+        # The evaluation of the individual was stopped early by racing, so
+        # its fitness is only a lower bound and must not be cached.
+        stats['truncated'] += 1
+        return
+
+    if params['CACHE']:
+        # The phenotype string of the individual does not appear
+        # in the cache, it must be evaluated and added to the
+        # cache.
+
+        if (isinstance(ind.fitness, list) and not
+        any([np.isnan(i) for i in ind.fitness])) or \
+                (not isinstance(ind.fitness, list) and not
+                np.isnan(ind.fitness)):
+            # All fitnesses are valid.
+            cache[get_phenotype_key(ind.phenotype)] = ind.fitness
+
+    if params['PERSISTENT_CACHE']:
+        # Add the fitness of the individual to the persistent cache. Invalid
+        # fitnesses are not added.
+        persistent_cache.add(ind.phenotype, ind.fitness)
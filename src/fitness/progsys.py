@@ -5,13 +5,16 @@ from os import path
 
 from algorithm.parameters import params
 from fitness.base_ff_classes.base_ff import base_ff
+from utilities.fitness.evaluator_pool import EvaluatorPool
 
 
 
 class progsys(base_ff):
     """Fitness function for program synthesis problems. Grammars and datasets
     for 29 benchmark problems from doi.org/10.1145/2739480.2754769 are
-    provided. Evaluation is done in a separate python process."""
+    provided. Evaluation is done in a separate python process, or in a pool
+    of params['PROGSYS_EVALUATORS'] python processes which evaluate whole
+    batches of individuals concurrently."""
 
     # constants required for formatting the code correctly
     INSERTCODE = "<insertCodeHere>"
@@ -32,23 +35,36 @@ class progsys(base_ff):
         self.training, self.test, self.embed_header, self.embed_footer = \
             self.get_data(params['DATASET_TRAIN'], params['DATASET_TEST'],
                           params['GRAMMAR_FILE'])
-        self.eval = self.create_eval_process()
+
+        if params['PROGSYS_EVALUATORS']:
+            # Start a pool of evaluation processes.
+            self.pool = EvaluatorPool(
+                [sys.executable, 'scripts/python_script_evaluation.py'],
+                params['PROGSYS_EVALUATORS'], restart_on=self.is_bad_request,
+                setup=self.get_definitions())
+            self.eval = None
+
+        else:
+            self.pool = None
+            self.eval = self.create_eval_process()
+
         if params['MULTICORE']:
             print("Warming: multi-core is not supported with progsys "
                   "as fitness function.\n"
-                  "Fitness function only allows sequential evaluation.")
+                  "Fitness function only allows sequential evaluation. "
+                  "Use PROGSYS_EVALUATORS to evaluate in parallel.")
 
     def evaluate(self, ind, **kwargs):
 
         dist = kwargs.get('dist', 'training')
 
-        program = self.format_program(ind.phenotype,
-                                      self.embed_header, self.embed_footer)
-        data = self.training if dist == "training" else self.test
-        program = "{}\n{}\n".format(data, program)
-        eval_json = json.dumps({'script': program, 'timeout': 1.0,
-                                'variables': ['cases', 'caseQuality',
-                                              'quality']})
+        request = self.get_request(ind, dist)
+
+        if self.pool:
+            # Evaluate the individual in the pool of evaluation processes.
+            return self.get_quality(self.pool.evaluate([request])[0])
+
+        eval_json = json.dumps(request)
 
         self.eval.stdin.write((eval_json + '\n').encode())
         self.eval.stdin.flush()
@@ -56,11 +72,105 @@ class progsys(base_ff):
 
         result = json.loads(result_json.decode())
 
-        if 'exception' in result and 'JSONDecodeError' in result['exception']:
+        if self.is_bad_request(result):
             self.eval.stdin.close()
             self.eval = self.create_eval_process()
-            
-       	if 'quality' in	result:
+
+        return self.get_quality(result)
+
+    def evaluate_batch(self, individuals, **kwargs):
+        """
+        Evaluate a batch of individuals at once. If
+        params['PROGSYS_EVALUATORS'] is specified, the programs of all
+        individuals with distinct phenotypes are sent to the pool of
+        evaluation processes together, and evaluated concurrently.
+        Otherwise each individual is evaluated in turn.
+
+        :param individuals: A list of individuals to be evaluated.
+        :param kwargs: An optional parameter which specifies the
+        distribution (i.e. training or test) upon which evaluation is to be
+        performed.
+        :return: A list of the fitnesses of the individuals, in order.
+        """
+
+        if not self.pool:
+            return super().evaluate_batch(individuals, **kwargs)
+
+        dist = kwargs.get('dist', 'training')
+
+        # Evaluate each distinct phenotype once.
+        first, requests = {}, []
+
+        for ind in individuals:
+            if ind.phenotype not in first:
+                first[ind.phenotype] = len(requests)
+                requests.append(self.get_request(ind, dist))
+
+        results = self.pool.evaluate(requests)
+
+        return [self.get_quality(results[first[ind.phenotype]]) for ind in
+                individuals]
+
+    def get_definitions(self):
+        """
+        Builds the definitions of the training and test contexts, which are
+        sent to each evaluation process once when it is started. A context
+        holds a dataset, which the evaluation process compiles only once,
+        and the embed code around the program, so that requests only need to
+        carry the code of each individual.
+
+        :return: A list of JSON-serialisable definitions.
+        """
+
+        return [{'define': dist, 'data': data + "\n",
+                 'header': self.embed_header, 'footer': self.embed_footer}
+                for dist, data in [("training", self.training),
+                                   ("test", self.test)]]
+
+    def get_request(self, ind, dist):
+        """
+        Builds the request to evaluate an individual, which is sent to an
+        evaluation process. The request only holds the code of the
+        individual and the name of the context (i.e. the dataset and embed
+        code) in which it is run.
+
+        :param ind: An individual to be evaluated.
+        :param dist: The distribution (i.e. training or test) upon which
+        evaluation is to be performed.
+        :return: A JSON-serialisable request.
+        """
+
+        code = self.format_individual(ind.phenotype,
+                                      self.get_indent(self.embed_header))
+
+        return {'context': "training" if dist == "training" else "test",
+                'code': code, 'timeout': 1.0,
+                'variables': ['cases', 'caseQuality', 'quality']}
+
+    @staticmethod
+    def is_bad_request(result):
+        """
+        Checks whether an evaluation process failed to read a request, in
+        which case the process is restarted.
+
+        :param result: The result returned by an evaluation process.
+        :return: True if the request could not be read.
+        """
+
+        return 'exception' in result and \
+            'JSONDecodeError' in result['exception']
+
+    @staticmethod
+    def get_quality(result):
+        """
+        Returns the fitness of an individual from the result of its
+        evaluation. Programs which failed to run are given the worst fitness.
+
+        :param result: The result returned by an evaluation process.
+        :return: The fitness of the individual.
+        """
+
+        if 'quality' in result:
             if result['quality'] > sys.maxsize:
                 result['quality'] = sys.maxsize
 
@@ -68,18 +178,23 @@ class progsys(base_ff):
             result['quality'] = sys.maxsize
         return result['quality']
 
+    def create_eval_process(self):
+        """create separate python process for evaluation, and send it the
+        definitions of the training and test contexts"""
+        process = Popen([sys.executable,
+                         'scripts/python_script_evaluation.py'],
+                        stdout=PIPE, stdin=PIPE)
+        for definition in self.get_definitions():
+            process.stdin.write((json.dumps(definition) + '\n').encode())
+        process.stdin.flush()
+        return process
+
     @staticmethod
-    def create_eval_process():
-        """create separate python process for evaluation"""
-        return Popen([sys.executable, 'scripts/python_script_evaluation.py'],
-                     stdout=PIPE, stdin=PIPE)
-
-    def format_program(self, individual, header, footer):
-        """formats the program by formatting the individual and adding
-        a header and footer"""
+    def get_indent(header):
+        """returns the indentation of the last line of the header, at
+        which the individual is inserted"""
         last_new_line = header.rindex('\n')
-        indent = header[last_new_line + len('\n'):len(header)]
-        return header + self.format_individual(individual, indent) + footer
+        return header[last_new_line + len('\n'):len(header)]
 
     def format_individual(self, code, additional_indent=""):
         """format individual by adding appropriate indentation and loop break
@@ -136,15 +251,31 @@ class progsys(base_ff):
 
         return string_builder
 
-    def get_data(self, train, test, grammar):
-        """ Return the training and test data for the current experiment.
-        A new get_data method is required to load from a sub folder and to
-        read the embed file"""
+    @staticmethod
+    def get_data_paths(train, test, grammar):
+        """ Return the paths of the training and test datasets, which are
+        in a sub folder, and of the embed file of the grammar"""
         train_set = path.join("..", "datasets", "progsys", train)
         test_set = path.join("..", "datasets", "progsys", test)
 
         embed_file = path.join("..", "grammars", "progsys",
                                (grammar[8:-4] + "-Embed.txt"))
+        return train_set, test_set, embed_file
+
+    def get_data_files(self):
+        """ Return the files read by the fitness function: the datasets,
+        the embed file and the script which runs the programs"""
+        return list(self.get_data_paths(params['DATASET_TRAIN'],
+                                        params['DATASET_TEST'],
+                                        params['GRAMMAR_FILE'])) + \
+               ['scripts/python_script_evaluation.py']
+
+    def get_data(self, train, test, grammar):
+        """ Return the training and test data for the current experiment.
+        A new get_data method is required to load from a sub folder and to
+        read the embed file"""
+        train_set, test_set, embed_file = self.get_data_paths(train, test,
+                                                              grammar)
         with open(embed_file, 'r') as embed:
             embed_code = embed.read()
         insert = embed_code.index(self.INSERTCODE)
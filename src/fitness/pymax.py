@@ -1,4 +1,5 @@
 from fitness.base_ff_classes.base_ff import base_ff
+from utilities.fitness.code_cache import compile_cached
 
 
 class pymax(base_ff):
@@ -29,7 +30,7 @@ class pymax(base_ff):
         p, d = ind.phenotype, {}
 
         # Exec the phenotype.
-        exec(p, d)
+        exec(compile_cached(p, "exec"), d)
 
         # Get the output
         s = d['XXX_output_XXX']  # this is the program's output: a number.
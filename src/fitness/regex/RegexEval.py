@@ -1,11 +1,15 @@
 import re
-from multiprocessing import Process, Queue
 
 import fitness.regex.testing.RegexTestGenerator as TestGen
 from algorithm.parameters import params
 from fitness.base_ff_classes.base_ff import base_ff
+from fitness.regex.testing.RegexBacktracking import \
+    has_catastrophic_backtracking
+from fitness.regex.testing.RegexStepCounter import StepCounter, \
+    count_regex_test_case
 from fitness.regex.testing.RegexTimer import time_regex_test_case
 from stats.stats import stats
+from utilities.fitness.deadline_pool import DeadlinePool
 
 
 # Author: Brendan Cody-Kenny - codykenny at gmail
@@ -18,14 +22,29 @@ class RegexEval(base_ff):
     The regex is presented with a number of strings, resulting matches are
     checked for correctness against known correct answers.
     Sum of wall-clock time taken to execute the test strings.
+
+    With params['REGEX_COST'] set to "steps", the time is replaced by the
+    number of steps taken by a backtracking matcher to run the regex on the
+    test strings, times params['REGEX_STEP_COST']. Step counts do not depend
+    on the load of the machine, so fitness values can be reproduced, and
+    each distinct test string only needs to be run once.
+
+    With params['REGEX_BACKTRACKING_CHECK'], regexes which are found to
+    backtrack exponentially by a static analysis are given the default
+    fitness without being run.
+
+    Regexes are evaluated by a pool of params['REGEX_WORKERS'] long-lived
+    worker processes, so that evaluations which run for longer than
+    params['REGEX_TIMEOUT'] seconds can be stopped. Only a worker which
+    times out is killed and replaced.
     """
 
     # these need to be class variables, not object variables
     test_cases = []
     seed_regex = None
     time = True
-    q = Queue()
-    pstartup, prunner = None, None
+    pool = None
+    step_cost = None
 
     def __init__(self):
         # Initialise base fitness function class.
@@ -35,38 +54,56 @@ class RegexEval(base_ff):
             s = "fitness.regex.RegexEval.RegexEval\n" \
                 "Error: multi-core evaluation cannot be used with RegexEval " \
                 "fitness function, as this fitness function already manages " \
-                "processes using the multiprocessing library."
+                "processes using the multiprocessing library. Use " \
+                "REGEX_WORKERS to evaluate regexes in parallel."
             raise Exception(s)
 
-    def call_fitness(self, individual, q):
+    @staticmethod
+    def call_fitness(regex_string):
         """
-        This method is called when this class is instantiated with an
-        individual (a regex)
+        This method is called by a worker process of the pool with the
+        phenotype of an individual (a regex)
         
-        :param individual:
-        :param q:
-        :return:
+        :param regex_string: The regex to be evaluated.
+        :return: The fitness of the regex.
         """
-        regex_string = individual.phenotype
         try:
             compiled_regex = re.compile(regex_string)
-            eval_results = self.test_regex(compiled_regex)
-            result_error, time_sum = self.calculate_fitness(eval_results)
+            eval_results = RegexEval.test_regex(compiled_regex)
+            result_error, time_sum = RegexEval.calculate_fitness(eval_results)
             fitness = result_error + time_sum
 
-            # We are running this code in a thread so put the fitness on the
-            # queue so it can be read back by the first length of the phenotype
-            # puts parsimony pressure toward shorter regex
-            q.put(fitness)
+            # We are running this code in a worker process so return the
+            # fitness so it can be sent back to the main process
+            return fitness
 
         except:  # Error as e:
-            # if the regex is broken, or the thread is timedout, return a
-            # really bad fitness
+            # if the regex is broken, return a really bad fitness
             # print(e)
             # traceback.print_exc()
-            q.put(RegexEval.default_fitness)
+            return RegexEval.default_fitness
+
+    @staticmethod
+    def set_test_cases(seed_regex, search_strings, step_cost=None):
+        """
+        Called by each worker process of the pool when it starts, to set the
+        test cases on which regexes are evaluated. The expected matches of
+        the test cases cannot be pickled, so workers are sent the search
+        strings of the test cases and rebuild the test suite from them.
 
-    def calculate_fitness(self, eval_results):
+        :param seed_regex: The phenotype of the seed regex.
+        :param search_strings: The search strings of the test cases.
+        :param step_cost: The cost of each matching step, or None to cost
+        regexes by the time they take.
+        :return: Nothing.
+        """
+
+        RegexEval.test_cases = TestGen.build_test_suite(seed_regex,
+                                                        search_strings)
+        RegexEval.step_cost = step_cost
+
+    @staticmethod
+    def calculate_fitness(eval_results):
         """
         Sum the functionality error with time (and any other fitness penalties
         you want to add, e.g. length of regex)
@@ -83,7 +120,8 @@ class RegexEval(base_ff):
 
         return result_error, time_sum
 
-    def test_regex(self, compiled_regex):
+    @staticmethod
+    def test_regex(compiled_regex):
         """
         Iterate through test cases
         
@@ -94,20 +132,71 @@ class RegexEval(base_ff):
         results = list()
         testing_iterations = 1
 
+        if RegexEval.step_cost is not None:
+            return RegexEval.count_regex(compiled_regex)
+
         for test_case in RegexEval.test_cases:
             results.append(time_regex_test_case(compiled_regex, test_case,
                                                 testing_iterations))
         return results
 
+    @staticmethod
+    def count_regex(compiled_regex):
+        """
+        Iterate through test cases, costing the regex by the number of
+        matching steps it takes rather than by time. Test cases often share
+        a search string, and the matches and steps of a search string are
+        always the same, so each search string is only run once.
+
+        :param compiled_regex:
+        :return:
+        """
+
+        step_counter = StepCounter(compiled_regex.pattern,
+                                   compiled_regex.flags)
+
+        results = list()
+
+        # The result of each search string run so far.
+        runs = {}
+
+        for test_case in RegexEval.test_cases:
+            run = runs.get(test_case.search_string)
+
+            if run is None:
+                run = count_regex_test_case(compiled_regex, test_case,
+                                            step_counter)
+                run[0] *= RegexEval.step_cost
+                runs[test_case.search_string] = run
+
+            results.append(run[:3] + [test_case])
+
+        return results
+
     def evaluate(self, ind, **kwargs):
         """
-        When this class is instantiated with individual, evaluate in a new
-        process, timeout and kill process if it runs for 1 second.
+        When this class is instantiated with individual, evaluate in a
+        worker process, timeout and replace the worker process if it runs
+        for params['REGEX_TIMEOUT'] seconds.
 
         :param ind: An individual to be evaluated.
         :return: The fitness of the evaluated individual.
         """
 
+        return self.evaluate_batch([ind])[0]
+
+    def evaluate_batch(self, individuals, **kwargs):
+        """
+        Evaluate a batch of individuals at once, keeping all worker
+        processes of the pool busy. Each regex which runs for longer than
+        params['REGEX_TIMEOUT'] seconds is given the default fitness and
+        counted as a runtime error.
+
+        :param individuals: A list of individuals to be evaluated.
+        :param kwargs: Optional extra arguments.
+        :return: A list of the fitnesses of the individuals, in order.
+        """
+
         if RegexEval.seed_regex is None:
             # We can't initialise the seed regex when we initialise the
             # fitness function as the representation.individual.Individual
@@ -115,8 +204,12 @@ class RegexEval(base_ff):
 
             RegexEval.seed_regex = params['SEED_INDIVIDUALS'][0]
 
-            RegexEval.test_cases = TestGen.generate_test_suite(
-                RegexEval.seed_regex.phenotype)
+            # The test suite is generated by the worker processes, and is
+            # loaded from params['REGEX_TEST_CACHE_DIR'] if it has already
+            # been generated by an earlier run.
+            RegexEval.test_cases = TestGen.load_test_suite(
+                RegexEval.seed_regex.phenotype,
+                params['REGEX_TEST_CACHE_DIR'], params['REGEX_WORKERS'])
 
             if len(RegexEval.test_cases) == 0:
                 s = "fitness.regex.RegexEval.RegexEval\n" \
@@ -124,31 +217,58 @@ class RegexEval(base_ff):
                     "       Please add at least one passing regex test string."
                 raise Exception(s)
 
-        if RegexEval.pstartup is None:
-            RegexEval.pstartup = Process(target=self.call_fitness,
-                                         name="self.call_fitness")
-        RegexEval.pstartup._args = (ind, RegexEval.q)
+        if RegexEval.pool is None:
+            # Start the workers once the test cases are known.
+            if params['REGEX_COST'] == "steps":
+                step_cost = params['REGEX_STEP_COST']
+
+            elif params['REGEX_COST'] == "time":
+                step_cost = None
+
+            else:
+                s = "fitness.regex.RegexEval.RegexEval\n" \
+                    "Error: unknown regex cost '%s'.\n" \
+                    "Valid costs are 'time' and 'steps'." % \
+                    params['REGEX_COST']
+                raise Exception(s)
+
+            RegexEval.pool = DeadlinePool(
+                RegexEval.call_fitness, params['REGEX_WORKERS'],
+                params['REGEX_TIMEOUT'], initializer=RegexEval.set_test_cases,
+                initargs=(RegexEval.seed_regex.phenotype,
+                          [test_case.search_string for test_case in
+                           RegexEval.test_cases], step_cost))
+
+        # Regexes with catastrophic backtracking would only run until the
+        # time limit, so they are not run at all.
+        rejected = [params['REGEX_BACKTRACKING_CHECK'] and
+                    has_catastrophic_backtracking(ind.phenotype) for ind in
+                    individuals]
+
+        results = iter(RegexEval.pool.map(
+            [ind.phenotype for ind, reject in zip(individuals, rejected) if
+             not reject]))
+
+        fitnesses = []
+
+        for reject in rejected:
+            if reject:
+                stats['rejected_regexes'] += 1
+                fitnesses.append(self.default_fitness)
+                continue
 
-        RegexEval.pstartup.start()
-        RegexEval.prunner = RegexEval.pstartup
-        RegexEval.pstartup = Process(target=self.call_fitness,
-                                     name="self.call_fitness")
+            finished, fitness = next(results)
 
-        # Set one second time limit for running thread.
-        self.prunner.join(1)
+            if not finished:
+                # The worker was killed after the time limit.
+                print("Regex evaluation timeout reached, "
+                      "killing evaluation process")
 
-        # If thread is active
-        if self.prunner.is_alive():
-            # After one second, if prunner is still running, kill it.
-            print("Regex evaluation timeout reached, "
-                  "killing evaluation process")
-            self.prunner.terminate()
-            self.prunner.join()
+                # Count individual as a runtime error.
+                stats['runtime_error'] += 1
 
-            # Count individual as a runtime error.
-            stats['runtime_error'] += 1
+                fitness = self.default_fitness
 
-            return self.default_fitness
+            fitnesses.append(fitness)
 
-        else:
-            return self.q.get()
+        return fitnesses
@@ -0,0 +1,166 @@
+import warnings
+
+try:
+    # Python 3.11 and later.
+    from re import _parser as sre_parse
+
+except ImportError:
+    import sre_parse
+
+"""Static detection of regexes whose matching time can grow exponentially
+with the length of the string (catastrophic backtracking), so that they can
+be rejected without being run.
+
+A regex is rejected if it has an unbounded repeat whose body can match the
+same string either in one iteration or split over several iterations, e.g.
+(a+)+, (\\d*\\.?)* or (\\s*\\w+)+, and which is followed by something that
+can fail, e.g. (a+)+$. When the rest of the regex fails, a backtracking
+matcher tries every way of splitting the string between the iterations
+before giving up, and there are exponentially many of them. Possessive
+repeats and atomic groups are never backtracked into, so they are safe.
+
+The analysis only looks for this one pattern, so it does not find every
+regex with catastrophic backtracking (e.g. ([\\da-z]\\d+)*$, where the first
+character of each iteration can also be matched by \\d+ of the previous
+one), but it rarely rejects a regex which does not backtrack
+exponentially."""
+
+# The opcodes of elements which may fail to match without consuming any
+# characters.
+ASSERTIONS = (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT,
+              sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS)
+
+# The opcodes of repeats which are backtracked into.
+REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+
+def has_catastrophic_backtracking(regex_string):
+    """
+    Check if a regex has catastrophic backtracking.
+
+    :param regex_string: The regex, as a string.
+    :return: True if the regex has a nested repeat which can backtrack
+    exponentially. Regexes which cannot be parsed return False, as they are
+    handled when they are evaluated.
+    """
+
+    try:
+        with warnings.catch_warnings():
+            # Warnings about the regex are shown when it is evaluated.
+            warnings.simplefilter("ignore")
+            parsed = sre_parse.parse(regex_string)
+
+    except Exception:
+        return False
+
+    return find_nested_repeat(parsed, False)
+
+
+def find_nested_repeat(pattern, can_fail_after):
+    """
+    Look for an unbounded repeat of an ambiguous body, followed by something
+    which can fail, in a parsed sequence of regex elements.
+
+    :param pattern: A parsed sequence of regex elements.
+    :param can_fail_after: Whether the rest of the regex after the sequence
+    can fail to match.
+    :return: True if such a repeat is found.
+    """
+
+    items = list(pattern)
+
+    for i, (op, av) in enumerate(items):
+        after = can_fail_after or any(can_fail(pattern, item) for item in
+                                      items[i + 1:])
+
+        if op in REPEATS:
+            if av[1] == sre_parse.MAXREPEAT and after and \
+                    is_ambiguous(av[2]):
+                return True
+
+            if find_nested_repeat(av[2], after):
+                return True
+
+        elif op is sre_parse.SUBPATTERN:
+            if find_nested_repeat(av[-1], after):
+                return True
+
+        elif op is sre_parse.BRANCH:
+            if any(find_nested_repeat(alternative, after) for alternative in
+                   av[1]):
+                return True
+
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            # A lookaround stops at its first match.
+            if find_nested_repeat(av[1], False):
+                return True
+
+        elif op is getattr(sre_parse, 'ATOMIC_GROUP', None):
+            if find_nested_repeat(av, False):
+                return True
+
+        elif op is getattr(sre_parse, 'POSSESSIVE_REPEAT', None):
+            if find_nested_repeat(av[2], False):
+                return True
+
+    return False
+
+
+def is_ambiguous(pattern):
+    """
+    Check if the body of a repeat can match a string in one iteration which
+    it could also match in several iterations. This is the case if the body
+    consists of a repeat of a variable number of non-empty iterations (or a
+    group or alternative containing one), and of elements which can match
+    the empty string.
+
+    :param pattern: A parsed sequence of regex elements.
+    :return: True if the sequence is ambiguous.
+    """
+
+    items = list(pattern)
+    ambiguous = False
+
+    for op, av in items:
+        if op in REPEATS and av[1] > 1 and av[1] > av[0] and \
+                av[2].getwidth()[0] > 0:
+            # e.g. a+ or \d{1,3}
+            ambiguous = True
+
+        elif op is sre_parse.SUBPATTERN and is_ambiguous(av[-1]):
+            ambiguous = True
+
+        elif op is sre_parse.BRANCH and any(is_ambiguous(alternative) for
+                                            alternative in av[1]):
+            ambiguous = True
+
+        elif not is_nullable(pattern, (op, av)):
+            # The body cannot be split between iterations around this
+            # element.
+            return False
+
+    return ambiguous
+
+
+def is_nullable(pattern, item):
+    """
+    Check if a parsed regex element can match the empty string.
+
+    :param pattern: The parsed sequence which contains the element.
+    :param item: An (opcode, argument) tuple from the parser.
+    :return: True if the element can match the empty string.
+    """
+
+    return sre_parse.SubPattern(pattern.state, [item]).getwidth()[0] == 0
+
+
+def can_fail(pattern, item):
+    """
+    Check if a parsed regex element can fail to match.
+
+    :param pattern: The parsed sequence which contains the element.
+    :param item: An (opcode, argument) tuple from the parser.
+    :return: True if the element can fail to match.
+    """
+
+    return item[0] in ASSERTIONS or not is_nullable(pattern, item)
@@ -0,0 +1,706 @@
+import re
+import sys
+
+try:
+    # Python 3.11 and later.
+    from re import _parser as sre_parse
+
+except ImportError:
+    import sre_parse
+
+"""A backtracking regex matcher which counts the steps it takes, so that the
+cost of running a regex on a string can be measured deterministically rather
+than by timing it. Regexes are parsed with the parser of the re library and
+matched in the same order as the re library does (greedy, lazy and
+possessive repeats, alternation, groups, lookarounds and backreferences), so
+that catastrophic backtracking costs as many steps as it costs time. Each
+attempt to match a single element of the regex (a character, an assertion,
+an alternative or an iteration of a repeat) at a position of the string is
+one step."""
+
+# The largest number of steps counted for a single test case. Matching is
+# abandoned once this many steps have been taken, so that regexes with
+# catastrophic backtracking cost this many steps rather than running for
+# ever.
+MAX_STEPS = 100000
+
+# The number of stack frames used by the matching functions for each
+# character of the string and each level of nesting of the regex. Repeats
+# which are not single characters recurse once for each iteration, so the
+# recursion limit is raised in proportion to the length of the string.
+FRAMES_PER_CHARACTER = 10
+
+# The opcodes of elements which match a single character.
+CHARACTERS = (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.ANY,
+              sre_parse.IN)
+
+
+class StepLimitReached(Exception):
+    """
+    Raised when a match takes more than MAX_STEPS steps.
+    """
+    pass
+
+
+class StepCounter(object):
+    """
+    A regex compiled to a tree of matching functions which count their
+    steps.
+    """
+
+    def __init__(self, pattern, flags=0):
+        """
+        Parse a regex and compile it to matching functions.
+
+        :param pattern: The regex, as a string.
+        :param flags: The flags of the regex, e.g. re.IGNORECASE.
+        """
+
+        parsed = sre_parse.parse(pattern, flags)
+
+        self.flags = parsed.state.flags
+        self.ignore_case = bool(self.flags & re.IGNORECASE)
+        self.multiline = bool(self.flags & re.MULTILINE)
+        self.dot_all = bool(self.flags & re.DOTALL)
+
+        self.match = self.compile_sequence(list(parsed))
+        self.depth = get_depth(parsed)
+
+        # The string being searched, the text captured by each group, and
+        # the number of steps taken so far.
+        self.string, self.groups, self.steps = "", {}, 0
+
+    def count_steps(self, string):
+        """
+        Search a string for all matches of the regex in the same way as
+        re.finditer, and count the steps taken.
+
+        :param string: The string to be searched.
+        :return: The number of steps taken, at most MAX_STEPS.
+        """
+
+        self.string, self.steps = string, 0
+
+        # Make sure that the matching functions can recurse once for each
+        # character of the string.
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(recursion_limit + FRAMES_PER_CHARACTER *
+                              (self.depth + 1) * (len(string) + 1))
+
+        # Whether the next match must not be an empty match at the position
+        # where the previous match ended.
+        must_advance = False
+        start = 0
+
+        try:
+            while start <= len(string):
+                self.groups = {}
+
+                # The end of a match at the start position, as a list so
+                # that the continuation can set it.
+                end = []
+
+                def accept(position, start=start, must_advance=must_advance):
+                    if must_advance and position == start:
+                        return False
+                    end.append(position)
+                    return True
+
+                self.step()
+
+                if self.match(start, accept):
+                    must_advance = end[0] == start
+                    start = end[0]
+
+                else:
+                    must_advance = False
+                    start += 1
+
+        except StepLimitReached:
+            return MAX_STEPS
+
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+
+        return self.steps
+
+    def step(self):
+        """
+        Count a step.
+
+        :return: Nothing.
+        """
+
+        self.steps += 1
+
+        if self.steps >= MAX_STEPS:
+            raise StepLimitReached()
+
+    def compile_sequence(self, items):
+        """
+        Compile a sequence of parsed regex elements to a matching function.
+
+        A matching function takes a position in the string and a
+        continuation, which is called with the position after the match and
+        returns True if the rest of the regex matches from there. The
+        matching function returns True if the whole match succeeds.
+
+        :param items: A list of (opcode, argument) tuples from the parser.
+        :return: A matching function.
+        """
+
+        nodes = [self.compile_item(op, av) for op, av in items]
+
+        if not nodes:
+            return lambda position, k: k(position)
+
+        # Chain the elements from last to first, so that each element
+        # continues with the rest of the sequence.
+        sequence = nodes[-1]
+
+        for node in reversed(nodes[:-1]):
+            sequence = chain(node, sequence)
+
+        return sequence
+
+    def compile_item(self, op, av):
+        """
+        Compile a single parsed regex element to a matching function.
+
+        :param op: The opcode of the element.
+        :param av: The argument of the element.
+        :return: A matching function.
+        """
+
+        if op in CHARACTERS:
+            # A single character.
+            test = self.compile_character(op, av)
+
+            def character(position, k):
+                # Characters cannot backtrack on their own, so they are
+                # counted without checking the step limit.
+                self.steps += 1
+                return position < len(self.string) and \
+                    test(self.string[position]) and k(position + 1)
+
+            return character
+
+        elif op is sre_parse.AT:
+            test = self.compile_at(av)
+
+            def at(position, k):
+                self.step()
+                return test(position) and k(position)
+
+            return at
+
+        elif op is sre_parse.BRANCH:
+            alternatives = [self.compile_sequence(list(alternative)) for
+                            alternative in av[1]]
+
+            def branch(position, k):
+                for alternative in alternatives:
+                    self.step()
+                    if alternative(position, k):
+                        return True
+                return False
+
+            return branch
+
+        elif op is sre_parse.SUBPATTERN:
+            group, sub = av[0], self.compile_sequence(list(av[-1]))
+
+            if group is None:
+                # A non-capturing group.
+                return sub
+
+            def capture(position, k):
+                def close(after):
+                    previous = self.groups.get(group)
+                    self.groups[group] = (position, after)
+
+                    if k(after):
+                        return True
+
+                    # Undo the capture when backtracking.
+                    if previous is None:
+                        del self.groups[group]
+                    else:
+                        self.groups[group] = previous
+                    return False
+
+                return sub(position, close)
+
+            return capture
+
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) or \
+                op is getattr(sre_parse, 'POSSESSIVE_REPEAT', None):
+            return self.compile_repeat(op, av)
+
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            direction, sub = av[0], self.compile_sequence(list(av[1]))
+            width = av[1].getwidth()[0]
+            positive = op is sre_parse.ASSERT
+
+            def lookaround(position, k):
+                self.step()
+
+                if direction == 1:
+                    # A lookahead.
+                    found = sub(position, lambda after: True)
+
+                else:
+                    # A lookbehind, which has a fixed width.
+                    found = position >= width and \
+                        sub(position - width, lambda after: after == position)
+
+                return found == positive and k(position)
+
+            return lookaround
+
+        elif op is getattr(sre_parse, 'ATOMIC_GROUP', None):
+            sub = self.compile_sequence(list(av))
+
+            def atomic(position, k):
+                # The group matches once, without backtracking into it.
+                end = []
+                if sub(position, lambda after: end.append(after) or True):
+                    return k(end[0])
+                return False
+
+            return atomic
+
+        elif op is sre_parse.GROUPREF:
+
+            def reference(position, k):
+                self.step()
+
+                if av not in self.groups:
+                    return False
+
+                start, end = self.groups[av]
+                text = self.string[start:end]
+                after = position + len(text)
+
+                return self.equal(self.string[position:after], text) and \
+                    k(after)
+
+            return reference
+
+        elif op is sre_parse.GROUPREF_EXISTS:
+            group, yes = av[0], self.compile_sequence(list(av[1]))
+            no = self.compile_sequence(list(av[2]) if av[2] else [])
+
+            def conditional(position, k):
+                self.step()
+                if group in self.groups:
+                    return yes(position, k)
+                return no(position, k)
+
+            return conditional
+
+        else:
+            s = "fitness.regex.testing.RegexStepCounter.StepCounter." \
+                "compile_item\n" \
+                "Error: unsupported regex element %s." % op
+            raise Exception(s)
+
+    def compile_repeat(self, op, av):
+        """
+        Compile a greedy, lazy or possessive repeat to a matching function.
+
+        :param op: The opcode of the repeat.
+        :param av: A tuple of the minimum and maximum number of iterations
+        and the repeated sub-pattern.
+        :return: A matching function.
+        """
+
+        low, high, sub = av[0], av[1], self.compile_sequence(list(av[2]))
+
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and \
+                len(av[2]) == 1 and av[2][0][0] in CHARACTERS:
+            # Repeats of a single character (e.g. \d+ or .*?) are matched
+            # without recursion.
+            return self.compile_character_repeat(op, low, high,
+                                                 self.compile_character(
+                                                     *av[2][0]))
+
+        if op is sre_parse.MAX_REPEAT:
+
+            def greedy(position, k, count=0):
+                self.step()
+
+                # Try one more iteration, unless it would match the empty
+                # string once the minimum has been reached.
+                if count < high and sub(
+                        position, lambda after: (after != position or
+                                                 count < low) and
+                        greedy(after, k, count + 1)):
+                    return True
+
+                return count >= low and k(position)
+
+            return greedy
+
+        elif op is sre_parse.MIN_REPEAT:
+
+            def lazy(position, k, count=0):
+                self.step()
+
+                if count >= low and k(position):
+                    return True
+
+                return count < high and sub(
+                    position, lambda after: (after != position or
+                                             count < low) and
+                    lazy(after, k, count + 1))
+
+            return lazy
+
+        def possessive(position, k):
+            # Match as many iterations as possible, without backtracking
+            # into them.
+            count = 0
+
+            while count < high:
+                self.step()
+                end = []
+
+                if not sub(position,
+                           lambda after: end.append(after) or True) or \
+                        (end[0] == position and count >= low):
+                    break
+
+                position, count = end[0], count + 1
+
+            return count >= low and k(position)
+
+        return possessive
+
+    def compile_character_repeat(self, op, low, high, test):
+        """
+        Compile a greedy or lazy repeat of a single character to a matching
+        function. The characters are matched in a loop rather than by
+        recursion, but in the same order and with the same steps as any
+        other repeat.
+
+        :param op: The opcode of the repeat.
+        :param low: The minimum number of iterations.
+        :param high: The maximum number of iterations.
+        :param test: A function of a character which returns True if it
+        matches.
+        :return: A matching function.
+        """
+
+        if op is sre_parse.MAX_REPEAT:
+
+            def greedy(position, k):
+                count = 0
+
+                # Match as many characters as possible.
+                while count < high:
+                    self.step()
+                    self.steps += 1
+
+                    if position + count < len(self.string) and \
+                            test(self.string[position + count]):
+                        count += 1
+
+                    else:
+                        break
+
+                else:
+                    self.step()
+
+                # Give characters back until the rest of the regex matches.
+                while count >= low:
+                    if k(position + count):
+                        return True
+                    count -= 1
+
+                return False
+
+            return greedy
+
+        def lazy(position, k):
+            count = 0
+
+            # Match as few characters as possible.
+            while True:
+                self.step()
+
+                if count >= low and k(position + count):
+                    return True
+
+                if count >= high:
+                    return False
+
+                self.steps += 1
+
+                if position + count < len(self.string) and \
+                        test(self.string[position + count]):
+                    count += 1
+
+                else:
+                    return False
+
+        return lazy
+
+    def compile_character(self, op, av):
+        """
+        Compile a parsed regex element which matches a single character to
+        a test of a character.
+
+        :param op: The opcode of the element.
+        :param av: The argument of the element.
+        :return: A function of a character which returns True if it matches.
+        """
+
+        test = self.compile_set(op, av)
+
+        # The same characters are tested many times, so the result of each
+        # test is kept.
+        results = {}
+
+        def cached(c):
+            result = results.get(c)
+            if result is None:
+                result = results[c] = test(c)
+            return result
+
+        return cached
+
+    def compile_set(self, op, av):
+        """
+        Compile a parsed regex element which matches a single character to
+        a test of a character, without caching.
+
+        :param op: The opcode of the element.
+        :param av: The argument of the element.
+        :return: A function of a character which returns True if it matches.
+        """
+
+        if op is sre_parse.LITERAL:
+            return lambda c: self.equal(c, chr(av))
+
+        elif op is sre_parse.NOT_LITERAL:
+            return lambda c: not self.equal(c, chr(av))
+
+        elif op is sre_parse.ANY:
+            return lambda c: self.dot_all or c != "\n"
+
+        tests, negate = [], False
+
+        for set_op, set_av in av:
+            if set_op is sre_parse.NEGATE:
+                negate = True
+
+            elif set_op is sre_parse.LITERAL:
+                tests.append(lambda c, l=chr(set_av): self.equal(c, l))
+
+            elif set_op is sre_parse.RANGE:
+                tests.append(lambda c, r=set_av: self.in_range(c, *r))
+
+            elif set_op is sre_parse.CATEGORY:
+                tests.append(self.compile_category(set_av))
+
+            else:
+                s = "fitness.regex.testing.RegexStepCounter.StepCounter." \
+                    "compile_set\n" \
+                    "Error: unsupported character set element %s." % set_op
+                raise Exception(s)
+
+        return lambda c: any(test(c) for test in tests) != negate
+
+    @staticmethod
+    def compile_category(category):
+        """
+        Compile a character category (e.g. \\d) to a test of a character.
+
+        :param category: The category code from the parser.
+        :return: A function of a character which returns True if it is in
+        the category.
+        """
+
+        categories = {
+            sre_parse.CATEGORY_DIGIT: str.isdecimal,
+            sre_parse.CATEGORY_SPACE: str.isspace,
+            sre_parse.CATEGORY_WORD: is_word,
+        }
+
+        negated = {
+            sre_parse.CATEGORY_NOT_DIGIT: sre_parse.CATEGORY_DIGIT,
+            sre_parse.CATEGORY_NOT_SPACE: sre_parse.CATEGORY_SPACE,
+            sre_parse.CATEGORY_NOT_WORD: sre_parse.CATEGORY_WORD,
+        }
+
+        if category in categories:
+            return categories[category]
+
+        elif category in negated:
+            test = categories[negated[category]]
+            return lambda c: not test(c)
+
+        s = "fitness.regex.testing.RegexStepCounter.StepCounter." \
+            "compile_category\n" \
+            "Error: unsupported character category %s." % category
+        raise Exception(s)
+
+    def compile_at(self, at):
+        """
+        Compile a zero-width assertion (e.g. ^ or \\b) to a test of a
+        position in the string.
+
+        :param at: The assertion code from the parser.
+        :return: A function of a position which returns True if the
+        assertion holds there.
+        """
+
+        def beginning(position):
+            return position == 0 or (self.multiline and
+                                     self.string[position - 1] == "\n")
+
+        def end(position):
+            n = len(self.string)
+            return position == n or (self.string[position] == "\n" and
+                                     (self.multiline or position == n - 1))
+
+        def boundary(position):
+            before = position > 0 and is_word(self.string[position - 1])
+            after = position < len(self.string) and \
+                is_word(self.string[position])
+            return before != after and len(self.string) > 0
+
+        assertions = {
+            sre_parse.AT_BEGINNING: beginning,
+            sre_parse.AT_BEGINNING_STRING: lambda position: position == 0,
+            sre_parse.AT_END: end,
+            sre_parse.AT_END_STRING:
+                lambda position: position == len(self.string),
+            sre_parse.AT_BOUNDARY: boundary,
+            sre_parse.AT_NON_BOUNDARY:
+                lambda position: len(self.string) > 0 and
+                not boundary(position),
+        }
+
+        if at not in assertions:
+            s = "fitness.regex.testing.RegexStepCounter.StepCounter." \
+                "compile_at\n" \
+                "Error: unsupported assertion %s." % at
+            raise Exception(s)
+
+        return assertions[at]
+
+    def equal(self, a, b):
+        """
+        Compare two strings, ignoring case if the regex does.
+
+        :param a: A string.
+        :param b: A string.
+        :return: True if the strings are equal.
+        """
+
+        if self.ignore_case:
+            return a.lower() == b.lower()
+
+        return a == b
+
+    def in_range(self, c, low, high):
+        """
+        Check if a character is in a range of a character set, ignoring case
+        if the regex does.
+
+        :param c: A character.
+        :param low: The code of the first character of the range.
+        :param high: The code of the last character of the range.
+        :return: True if the character is in the range.
+        """
+
+        if self.ignore_case:
+            return any(low <= ord(x) <= high for x in
+                       (c, c.lower(), c.upper()))
+
+        return low <= ord(c) <= high
+
+
+def chain(node, rest):
+    """
+    Chain two matching functions, so that the second one matches where the
+    first one ends.
+
+    :param node: A matching function.
+    :param rest: The matching function of the rest of the sequence.
+    :return: A matching function.
+    """
+
+    return lambda position, k: node(position,
+                                    lambda after: rest(after, k))
+
+
+def get_depth(pattern):
+    """
+    Returns the depth of nesting of groups, alternatives, repeats and
+    lookarounds in a parsed regex.
+
+    :param pattern: A parsed sequence of regex elements.
+    :return: The depth of nesting, which is 0 for a regex of single
+    characters and assertions.
+    """
+
+    depth = 0
+
+    for op, av in pattern:
+        if op is sre_parse.BRANCH:
+            subs = av[1]
+
+        elif op in (sre_parse.SUBPATTERN, sre_parse.MAX_REPEAT,
+                    sre_parse.MIN_REPEAT, sre_parse.ASSERT,
+                    sre_parse.ASSERT_NOT) or \
+                op is getattr(sre_parse, 'POSSESSIVE_REPEAT', None):
+            subs = [av[-1]]
+
+        elif op is getattr(sre_parse, 'ATOMIC_GROUP', None):
+            subs = [av]
+
+        elif op is sre_parse.GROUPREF_EXISTS:
+            subs = [sub for sub in av[1:] if sub]
+
+        else:
+            continue
+
+        depth = max([depth] + [get_depth(sub) + 1 for sub in subs])
+
+    return depth
+
+
+def is_word(c):
+    """
+    Check if a character is a word character (i.e. matched by \\w).
+
+    :param c: A character.
+    :return: True if the character is a word character.
+    """
+
+    return c.isalnum() or c == "_"
+
+
+def count_regex_test_case(compiled_regex, test_case, step_counter):
+    """
+    Run a single regex on a single test case, and count the steps it takes.
+    The matches are found with the re library; the step counter only
+    measures the cost of finding them.
+
+    :param compiled_regex: The regex, compiled with the re library.
+    :param test_case: A regex test case.
+    :param step_counter: The regex, compiled to a StepCounter.
+    :return: A list of the number of steps, the matches found, the number of
+    iterations (always 1) and the test case, in the same form as
+    time_regex_test_case.
+    """
+
+    search_string = test_case.search_string
+
+    matches = list(compiled_regex.finditer(search_string))
+    steps = step_counter.count_steps(search_string)
+
+    return [steps, matches, 1, test_case]
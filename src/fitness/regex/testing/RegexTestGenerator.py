@@ -1,7 +1,86 @@
+import json
 import re
+from hashlib import blake2b
+from multiprocessing import Pool
+from os import getpid, makedirs, path, replace
 
 from fitness.regex.testing.RegexTest import RegexTest
-from fitness.regex.testing.RegexTimer import time_regex_test_case
+
+# The version of the test suite generator. Change this whenever test suites
+# are generated differently, so that cached test suites are no longer used.
+GENERATOR_VERSION = 1
+
+# The characters substituted into matching strings to find strings which do
+# not match.
+REPLACEMENT_CHARS = [chr(a) for a in range(ord('0'), ord('9'))] + ['a', 'Z']
+
+# collect strings which identify the different regex
+# cache and reuse these (read/write to a file before/after GP)
+KNOWN_TEST_STRINGS = [
+    "5C0A5B634A82",
+    "Jan 12 06:26:20: ACCEPT service dns from 140.105.48.16 to firewall(pub-nic-dns), prefix: \"none\" (in: eth0 140.105.48.16(00:21:dd:bc:95:44):4263 -> 140.105.63.158(00:14:31:83:c6:8d):53 UDP len:76",
+    "Jan 12 06:27:09: DROP service 68->67(udp) from 216.34.211.83 to 216.34.253.94, prefix: \"spoof iana-0/8\" (in: eth0 213.92.153.78(00:1f:d6:19:0a:80):68 -> 69.43.177.110(00:30:fe:fd:d6:51):67 UDP le"
+    "Jan 12 06:26:19: ACCEPT service http from 119.63.193.196 to firewall(pub-nic), prefix: ",
+    "Jan 12 06:26:19: ACCEPT service http from 119.63.193.196 to firewall(pub-nic), prefix: ",
+    "26:19: ACCEPT service http from 119.63.193.196 to firewall(pub-nic), prefix: ",
+    " -> 140.105.63.164(50:j6:04:92:53:44):80 TCP flags: ****S* len:60 ttl:32)sdkfjhaklsjdhfglksjhdfgk",
+    " -> 140.105.63.16(50:06:04:9r:53:44):80 TCP flags: ****S* len:60 ttl:32)ssjdhfglksjhdfgk",
+    "Jan 12 06:26:20: ACCEPT service dns from 140.105.48.16 to firewall(pub-nic-dns), prefix: ",
+    "Jan 12 06:27:09: DROP service 68->67(udp) from 216.34.211.83 to 216.34.253.94, prefix: ",
+    "105.63.1650:06:04:92:53:44:80",
+    " -> 140.105.63.164(50:06:g4:92:53:44):80 TCP flags: ****S* len:60 ttl:32)",
+    " -> 140.105.63.164(50:06:54:92:r3:44):80 TCP flags: ****S* len:60 ttl:32)",
+    "1,2,3,4,5,6,7,8,9,10,11,12,13777,5P,5,5,6,5P",
+    "1,2,3,4,5,6,7,8,9,10,11,12,13777,24,5P",
+    "1,2,3,4,5,6,7,8,9,10,11,12,13777,243,3P",
+    "1,2,3,4,5,6,7,8,9,10,11,12,13777,P",
+    "1,2,3,4,5,6,7,8,9,10,11,12,P",
+    "1,2,3,4,5,6,7,8,9,10,11,P",
+    "1,2,3,4,5,6,7,8,9,10,11,3P",
+    "1,2,3,4,5,6,7,8,9,10,P",
+    "codykenny@gmailcom",
+    "2016-12-09T08:21:15.9+00:00",
+    "2016-12-09T08:21:15.9+00:0",
+    "2016-22-09T08:21:15.9+00:00000000000",
+    "2016-22-09T08:21:15.9+00:00",
+    "1911-02-19T22:35:42.3+08:43",
+    "2016-09-05T15:22:26.286Z",
+    "230.234E-10",
+    "971.829E+26",
+    "3566",
+    "4",
+    "-7",
+    "+94",
+    "            36",
+    "78      ",
+    "87465.345345",
+    "2346.533",
+    "0.045e-10",
+    "3566.",
+    ".3456",
+    "<string> ::= <letter>|<letter><string>",
+    "hryxioXcXXdornct",
+    "bbbbXcyXXaaa",
+    "230.234E-10",
+    "971.829E+26",
+    "3566",
+    "4",
+    "-7",
+    "+94",
+    "            36",
+    "78      ",
+    "87465.345345",
+    "2346.533",
+    "  3566.   ",
+    " .3456  ",
+    "a46b  ",
+    "0.045e-10",
+    "aXXXXas",
+    "<s_char>        ::= !|\"#\"|$|%|&|\(|\)|*|+|,|-|.|\/|:|;|\"<\"|=|\">\"|?|@|\[|\\|\]|^|_|\"`\"|{|}|~|\"|\"|'\"'|\"'\"|\" \""
+    "!|\"#\"|$|%|&|\(|\)|*|+|,|-|.|\/|:|;|\"<\"|=|\">\"|?|@|\[|\\|\]|^|_|\"`\"|{|}|~|\"|\"|'\"'|\"'\"|\" \"",
+    "<A_Z>           ::= A|B|C|D|E|F|G|H|I|J|K|L|M|N|O|P|Q|R|S|T|U|V|W|X|Y|Z",
+    "A|B|C|D|E|F|G|H|I|J|K|L|M|N|O|P|Q|R|S|T|U|V|W|X|Y|Z",
+]
 
 
 def generate_equivalence_test_suite_replacement(a_match, compiled_regex):
@@ -24,15 +103,12 @@ def generate_equivalence_test_suite_replacement(a_match, compiled_regex):
     # compiled_regex = re.compile(a_regex)
     if len(a_match.matches) > 0:
         for i in range(0, len(a_match.search_string)):
-            for char in [a for a in range(ord('0'), ord('9'))] + \
-                        [ord('a'), ord('Z')]:
+            for char in REPLACEMENT_CHARS:
                 new_search_string = a_match.search_string[:i] + \
-                                    chr(char) + \
+                                    char + \
                                     a_match.search_string[i + 1:]
                 a_test_case_string = RegexTest(new_search_string)
-                vals = time_regex_test_case(compiled_regex, a_test_case_string,
-                                            1)
-                if len(list(vals[1])) == 0:
+                if len(find_matches(compiled_regex, new_search_string)) == 0:
                     test_cases.append(a_test_case_string)
     return test_cases
 
@@ -81,16 +157,33 @@ def add_test_case_if_fails(new_search_string, compiled_regex, test_cases):
     :return:
     """
     a_test_case_string = RegexTest(new_search_string)
-    vals = time_regex_test_case(compiled_regex, a_test_case_string, 1)
-    if len(list(vals[1])) == 0:
+    if len(find_matches(compiled_regex, new_search_string)) == 0:
         test_cases.append(a_test_case_string)
 
 
-def generate_test_suite(regex_string):
+def find_matches(compiled_regex, search_string):
     """
-    
+    Find all matches of a regex in a string. Test suite generation only
+    needs the matches of each candidate string, not the time taken to find
+    them.
+
+    :param compiled_regex:
+    :param search_string:
+    :return: A list of match objects.
+    """
+
+    return list(compiled_regex.finditer(search_string))
+
+
+def generate_test_suite(regex_string, processes=1):
+    """
+    Generate the test suite of a regex. The test cases generated from each
+    known test string do not depend on each other, so they can be generated
+    by several processes at once.
+
     :param regex_string:
-    :return:
+    :param processes: The number of processes used to generate the suite.
+    :return: A list of RegexTest test cases.
     """
 
     # do some test generation
@@ -98,84 +191,110 @@ def generate_test_suite(regex_string):
     # find the minimal variant of this string which does not match
     # test strategies - length, values
 
-    # collect strings which identify the different regex
-    # cache and reuse these (read/write to a file before/after GP)
-    known_test_strings = [
-        "5C0A5B634A82",
-        "Jan 12 06:26:20: ACCEPT service dns from 140.105.48.16 to firewall(pub-nic-dns), prefix: \"none\" (in: eth0 140.105.48.16(00:21:dd:bc:95:44):4263 -> 140.105.63.158(00:14:31:83:c6:8d):53 UDP len:76",
-        "Jan 12 06:27:09: DROP service 68->67(udp) from 216.34.211.83 to 216.34.253.94, prefix: \"spoof iana-0/8\" (in: eth0 213.92.153.78(00:1f:d6:19:0a:80):68 -> 69.43.177.110(00:30:fe:fd:d6:51):67 UDP le"
-        "Jan 12 06:26:19: ACCEPT service http from 119.63.193.196 to firewall(pub-nic), prefix: ",
-        "Jan 12 06:26:19: ACCEPT service http from 119.63.193.196 to firewall(pub-nic), prefix: ",
-        "26:19: ACCEPT service http from 119.63.193.196 to firewall(pub-nic), prefix: ",
-        " -> 140.105.63.164(50:j6:04:92:53:44):80 TCP flags: ****S* len:60 ttl:32)sdkfjhaklsjdhfglksjhdfgk",
-        " -> 140.105.63.16(50:06:04:9r:53:44):80 TCP flags: ****S* len:60 ttl:32)ssjdhfglksjhdfgk",
-        "Jan 12 06:26:20: ACCEPT service dns from 140.105.48.16 to firewall(pub-nic-dns), prefix: ",
-        "Jan 12 06:27:09: DROP service 68->67(udp) from 216.34.211.83 to 216.34.253.94, prefix: ",
-        "105.63.1650:06:04:92:53:44:80",
-        " -> 140.105.63.164(50:06:g4:92:53:44):80 TCP flags: ****S* len:60 ttl:32)",
-        " -> 140.105.63.164(50:06:54:92:r3:44):80 TCP flags: ****S* len:60 ttl:32)",
-        "1,2,3,4,5,6,7,8,9,10,11,12,13777,5P,5,5,6,5P",
-        "1,2,3,4,5,6,7,8,9,10,11,12,13777,24,5P",
-        "1,2,3,4,5,6,7,8,9,10,11,12,13777,243,3P",
-        "1,2,3,4,5,6,7,8,9,10,11,12,13777,P",
-        "1,2,3,4,5,6,7,8,9,10,11,12,P",
-        "1,2,3,4,5,6,7,8,9,10,11,P",
-        "1,2,3,4,5,6,7,8,9,10,11,3P",
-        "1,2,3,4,5,6,7,8,9,10,P",
-        "codykenny@gmailcom",
-        "2016-12-09T08:21:15.9+00:00",
-        "2016-12-09T08:21:15.9+00:0",
-        "2016-22-09T08:21:15.9+00:00000000000",
-        "2016-22-09T08:21:15.9+00:00",
-        "1911-02-19T22:35:42.3+08:43",
-        "2016-09-05T15:22:26.286Z",
-        "230.234E-10",
-        "971.829E+26",
-        "3566",
-        "4",
-        "-7",
-        "+94",
-        "            36",
-        "78      ",
-        "87465.345345",
-        "2346.533",
-        "0.045e-10",
-        "3566.",
-        ".3456",
-        "<string> ::= <letter>|<letter><string>",
-        "hryxioXcXXdornct",
-        "bbbbXcyXXaaa",
-        "230.234E-10",
-        "971.829E+26",
-        "3566",
-        "4",
-        "-7",
-        "+94",
-        "            36",
-        "78      ",
-        "87465.345345",
-        "2346.533",
-        "  3566.   ",
-        " .3456  ",
-        "a46b  ",
-        "0.045e-10",
-        "aXXXXas",
-        "<s_char>        ::= !|\"#\"|$|%|&|\(|\)|*|+|,|-|.|\/|:|;|\"<\"|=|\">\"|?|@|\[|\\|\]|^|_|\"`\"|{|}|~|\"|\"|'\"'|\"'\"|\" \""
-        "!|\"#\"|$|%|&|\(|\)|*|+|,|-|.|\/|:|;|\"<\"|=|\">\"|?|@|\[|\\|\]|^|_|\"`\"|{|}|~|\"|\"|'\"'|\"'\"|\" \"",
-        "<A_Z>           ::= A|B|C|D|E|F|G|H|I|J|K|L|M|N|O|P|Q|R|S|T|U|V|W|X|Y|Z",
-        "A|B|C|D|E|F|G|H|I|J|K|L|M|N|O|P|Q|R|S|T|U|V|W|X|Y|Z",
-    ]
+    # if we don't have any known test strings, see if the regex matches it.
+    tasks = [(regex_string, test_string) for test_string in
+             KNOWN_TEST_STRINGS + [regex_string]]
+
+    if processes > 1:
+        with Pool(processes) as pool:
+            search_strings = pool.starmap(generate_test_strings, tasks)
+
+    else:
+        search_strings = [generate_test_strings(*task) for task in tasks]
+
+    test_cases = build_test_suite(
+        regex_string, [s for strings in search_strings for s in strings])
+
+    print("Number of test cases in suite:", len(test_cases))
+
+    return test_cases
+
+
+def generate_test_strings(regex_string, test_string):
+    """
+    Generate the test cases of a regex from a single known test string.
+    Match objects cannot be sent between processes, so only the search
+    strings of the test cases are returned.
+
+    :param regex_string:
+    :param test_string:
+    :return: A list of the search strings of the test cases.
+    """
+
+    compiled_regex = re.compile(regex_string)
+
+    return [test_case.search_string for test_case in
+            generate_tests_if_string_match(compiled_regex, test_string)]
+
+
+def build_test_suite(regex_string, search_strings):
+    """
+    Build the test cases of a regex from their search strings. The expected
+    matches of each test case are the matches of the regex, which are found
+    again here: passing test cases are the strings in which the regex finds
+    matches, and failing test cases are strings in which it finds none.
+
+    :param regex_string:
+    :param search_strings:
+    :return: A list of RegexTest test cases.
+    """
 
     compiled_regex = re.compile(regex_string)
     test_cases = []
-    for test_string in known_test_strings:
-        test_cases += generate_tests_if_string_match(compiled_regex,
-                                                     test_string)
 
-    # if we don't have any known test strings, see if the regex matches it.
-    test_cases += generate_tests_if_string_match(compiled_regex, regex_string)
+    for search_string in search_strings:
+        test_case = RegexTest(search_string)
+        add_re_match_to_test(find_matches(compiled_regex, search_string),
+                             test_case)
+        test_cases.append(test_case)
 
-    print("Number of test cases in suite:", len(test_cases))
+    return test_cases
+
+
+def load_test_suite(regex_string, cache_dir=None, processes=1):
+    """
+    Returns the test suite of a regex. If a cache directory is given, the
+    search strings of the suite are saved there once generated, and later
+    runs load them rather than generate the suite again. Cache files are
+    named by a digest of the regex and of the settings of the generator, so
+    a cache file is never used for a different suite.
+
+    :param regex_string:
+    :param cache_dir: The directory of cached test suites, or None.
+    :param processes: The number of processes used to generate the suite.
+    :return: A list of RegexTest test cases.
+    """
+
+    if not cache_dir:
+        return generate_test_suite(regex_string, processes)
+
+    digest = blake2b(digest_size=16)
+    digest.update(repr((GENERATOR_VERSION, regex_string, REPLACEMENT_CHARS,
+                        KNOWN_TEST_STRINGS)).encode())
+
+    cache_file = path.join(cache_dir, "regex_tests.%s.json" %
+                           digest.hexdigest())
+
+    if path.isfile(cache_file):
+        with open(cache_file) as f:
+            test_cases = build_test_suite(regex_string, json.load(f))
+
+        print("Number of test cases in suite:", len(test_cases))
+
+        return test_cases
+
+    test_cases = generate_test_suite(regex_string, processes)
+
+    makedirs(cache_dir, exist_ok=True)
+
+    # Write the cache file under a temporary name first, so that other runs
+    # never read a partly written file.
+    temp_file = "%s.%d.tmp" % (cache_file, getpid())
+
+    with open(temp_file, "w") as f:
+        json.dump([test_case.search_string for test_case in test_cases], f)
+
+    replace(temp_file, cache_file)
 
     return test_cases
 
@@ -206,10 +325,10 @@ def generate_tests_if_string_match(compiled_regex, test_string):
 
     test_cases = []
     a_test_candidate = RegexTest(test_string)
-    vals = time_regex_test_case(compiled_regex, a_test_candidate, 1)
+    matches = find_matches(compiled_regex, test_string)
 
-    if len(list(vals[1])) > 0:  # the regex found a match, add it
-        a_positive_test = add_re_match_to_test(vals[1], a_test_candidate)
+    if len(matches) > 0:  # the regex found a match, add it
+        a_positive_test = add_re_match_to_test(matches, a_test_candidate)
         test_cases.append(a_positive_test)
 
         # now find regex which negate
@@ -27,3 +27,23 @@ class string_match(base_ff):
                 # Imperfect match, find ASCII distance to match.
                 fitness -= 1 / (1 + (abs(ord(t_p) - ord(g_p))))
         return fitness
+
+    def evaluate_batch(self, individuals, **kwargs):
+        """
+        Evaluate a batch of individuals at once. Fitness only depends on the
+        phenotype, so each distinct phenotype in the batch is only evaluated
+        once.
+
+        :param individuals: A list of individuals to be evaluated.
+        :param kwargs: Optional extra arguments.
+        :return: A list of the fitnesses of the individuals, in order.
+        """
+
+        fitnesses = {}
+
+        for ind in individuals:
+            if ind.phenotype not in fitnesses:
+                # Evaluate each distinct phenotype.
+                fitnesses[ind.phenotype] = self(ind, **kwargs)
+
+        return [fitnesses[ind.phenotype] for ind in individuals]
@@ -26,6 +26,9 @@ class boolean_problem(supervised_learning):
 
     """
 
+    # Each variable is stored as a row of the input data.
+    sample_axis = 1
+
     def __init__(self):
         # Don't call super().__init__() because it reads the training
         # (and test) data from files. We'll do everything else it
@@ -59,6 +62,15 @@ class boolean_problem(supervised_learning):
         # In Boolean problems we don't want a separate test set
         assert not params['DATASET_TEST']
 
+    def get_data_files(self):
+        """
+        The fitness cases are generated rather than read from dataset files.
+
+        :return: An empty list.
+        """
+
+        return []
+
 
 # Some target functions. Each just accepts a single instance, eg
 # nparity([False, False, True]) -> True
@@ -43,6 +43,9 @@ class if_else_classifier(supervised_learning):
 
     """
 
+    # Each variable is stored as a row of the input data.
+    sample_axis = 1
+
     def __init__(self):
         # Don't call super().__init__() because it reads the training
         # (and test) data from files. We'll do everything else it
@@ -77,6 +80,15 @@ class if_else_classifier(supervised_learning):
         assert not params['DATASET_TEST']
         assert not params['OPTIMIZE_CONSTANTS']
 
+    def get_data_files(self):
+        """
+        The fitness cases are generated rather than read from dataset files.
+
+        :return: An empty list.
+        """
+
+        return []
+
 
 def target_classifier(n_vars, n_is, n_os):
     def target(x):
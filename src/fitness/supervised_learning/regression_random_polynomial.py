@@ -33,6 +33,9 @@ class regression_random_polynomial(regression):
 
     """
 
+    # Each variable is stored as a row of the input data.
+    sample_axis = 1
+
     def __init__(self):
         # Don't call super().__init__() because it reads the training
         # (and test) data from files. We'll do everything else it
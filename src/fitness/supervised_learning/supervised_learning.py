@@ -1,11 +1,19 @@
+from math import ceil
+
 import numpy as np
 
 np.seterr(all="raise")
 
 from algorithm.parameters import params
-from utilities.fitness.get_data import get_data
+from utilities.fitness.code_cache import compile_cached
+from utilities.fitness.expression_dag import ExpressionDAG
+from utilities.fitness.get_data import get_data, get_data_files
 from utilities.fitness.math_functions import *
 from utilities.fitness.optimize_constants import optimize_constants
+from utilities.fitness.sampling import get_sample_indexes, get_sample_seed, \
+    get_sample_size
+from utilities.fitness.shared_data import attach_state, share_state
+from utilities.fitness.stack_eval import stack_eval
 
 from fitness.base_ff_classes.base_ff import base_ff
 
@@ -26,6 +34,21 @@ class supervised_learning(base_ff):
     should not be instantiated.
     """
 
+    # The axis of the input data along which the fitness cases are stored.
+    # Subclasses which store each variable as a row of the input data (i.e.
+    # grammars use x[0] rather than x[:, 0]) set this to 1.
+    sample_axis = 0
+
+    # The sample of the training data used in the current generation, the
+    # seed with which it was chosen (None if all training data are used),
+    # and the generation for which it was chosen.
+    sample_in, sample_exp, sample_seed, sample_generation = [None] * 4
+
+    # The fitness which individuals must be able to reach to be evaluated on
+    # all training data when racing evaluation is used (None if all
+    # individuals are evaluated on all training data).
+    racing_bound = None
+
     def __init__(self):
         # Initialise base fitness function class.
         super().__init__()
@@ -41,6 +64,210 @@ class supervised_learning(base_ff):
         if params['DATASET_TEST']:
             self.training_test = True
 
+    def check_streaming(self):
+        """
+        Checks that streaming evaluation can be used with the current
+        parameters. Streaming needs an error metric which sums the errors of
+        individual fitness cases (see utilities.fitness.error_metric), and
+        evaluates each phenotype on its own, so it cannot be used when
+        phenotypes are evaluated together as an expression DAG or when
+        constants are optimised.
+
+        :return: Nothing.
+        """
+
+        if not hasattr(params['ERROR_METRIC'], "case_errors"):
+            s = "fitness.supervised_learning.supervised_learning." \
+                "check_streaming\n" \
+                "Error: STREAMING_CHUNK_SIZE cannot be used with the error " \
+                "metric %s." % params['ERROR_METRIC'].__name__
+            raise Exception(s)
+
+        if params['OPTIMIZE_CONSTANTS'] or params['DAG_EVALUATION'] or \
+                params['SEMANTIC_CACHE_SIZE']:
+            s = "fitness.supervised_learning.supervised_learning." \
+                "check_streaming\n" \
+                "Error: STREAMING_CHUNK_SIZE cannot be used with constant " \
+                "optimisation or DAG evaluation."
+            raise Exception(s)
+
+    def get_data_files(self):
+        """
+        Returns the paths of the training and test dataset files.
+
+        :return: A list of paths to the dataset files.
+        """
+
+        return [filename for filename in
+                get_data_files(params['DATASET_TRAIN'], params['DATASET_TEST'])
+                if filename]
+
+    def check_sampling(self):
+        """
+        Checks that sampling of the training data can be used with the
+        current parameters. Fitness values depend on the sample of each
+        generation, so they cannot be shared between generations by a
+        cache, and multicore workers would not see the current sample.
+
+        :return: Nothing.
+        """
+
+        if params['MULTICORE']:
+            s = "fitness.supervised_learning.supervised_learning." \
+                "check_sampling\n" \
+                "Error: TRAINING_SAMPLE_SIZE cannot be used with multi-core " \
+                "evaluation."
+            raise Exception(s)
+
+        if (params['CACHE'] and params['LOOKUP_FITNESS']) or \
+                params['PERSISTENT_CACHE']:
+            s = "fitness.supervised_learning.supervised_learning." \
+                "check_sampling\n" \
+                "Error: TRAINING_SAMPLE_SIZE cannot be used to look up " \
+                "fitnesses in a cache, as fitnesses depend on the sample of " \
+                "training data used in each generation."
+            raise Exception(s)
+
+    def set_generation(self, generation):
+        """
+        Choose the rows of the training data used in the current generation.
+        If params['TRAINING_SAMPLE_SIZE'] is specified, a new sample of rows is
+        chosen in each generation (see utilities.fitness.sampling) and shared
+        by the whole population, except in every
+        params['FULL_EVALUATION_INTERVAL']th generation, in which all rows are
+        used.
+
+        :param generation: The current generation.
+        :return: Nothing.
+        """
+
+        if params['STREAMING_CHUNK_SIZE']:
+            # Check the parameters before each generation is evaluated.
+            self.check_streaming()
+
+        if not params['TRAINING_SAMPLE_SIZE'] or \
+                generation == self.sample_generation:
+            return
+
+        if self.sample_generation is None:
+            # Check the parameters the first time a sample is chosen.
+            self.check_sampling()
+
+        self.sample_generation = generation
+
+        size = get_sample_size(len(self.training_exp))
+        interval = params['FULL_EVALUATION_INTERVAL']
+
+        if size == len(self.training_exp) or \
+                (interval and generation % interval == 0):
+            # Use all rows of the training data.
+            self.sample_in, self.sample_exp = None, None
+            self.sample_seed = None
+
+        else:
+            # Choose a new sample of rows.
+            self.sample_seed = get_sample_seed(generation)
+            indexes = get_sample_indexes(
+                self.training_exp, size, params['TRAINING_SAMPLE_METHOD'],
+                self.sample_seed)
+            self.sample_in = np.take(self.training_in, indexes,
+                                     axis=self.sample_axis)
+            self.sample_exp = self.training_exp[indexes]
+
+    def get_training_sample(self):
+        """
+        Returns the training data used in the current generation.
+
+        :return: The input and expected output of the sample of the training
+        data if one is being used, otherwise all training data.
+        """
+
+        if self.sample_seed is None:
+            return self.training_in, self.training_exp
+
+        return self.sample_in, self.sample_exp
+
+    def check_racing(self):
+        """
+        Checks that racing evaluation can be used with the current
+        parameters. Racing needs an error metric which sums the errors of
+        individual fitness cases (see utilities.fitness.error_metric), and
+        evaluates each phenotype on its own, so it cannot be used when
+        phenotypes are evaluated together as an expression DAG, when
+        constants are optimised, or by multicore workers, which would not see
+        the current bound.
+
+        :return: Nothing.
+        """
+
+        if not hasattr(params['ERROR_METRIC'], "case_errors"):
+            s = "fitness.supervised_learning.supervised_learning." \
+                "check_racing\n" \
+                "Error: RACING_QUANTILE cannot be used with the error " \
+                "metric %s." % params['ERROR_METRIC'].__name__
+            raise Exception(s)
+
+        if params['MULTICORE'] or params['OPTIMIZE_CONSTANTS'] or \
+                params['DAG_EVALUATION'] or params['SEMANTIC_CACHE_SIZE']:
+            s = "fitness.supervised_learning.supervised_learning." \
+                "check_racing\n" \
+                "Error: RACING_QUANTILE cannot be used with multi-core " \
+                "evaluation, constant optimisation or DAG evaluation."
+            raise Exception(s)
+
+    def set_population(self, individuals):
+        """
+        Set the bound for racing evaluation from the fitnesses of the
+        current population. If params['RACING_QUANTILE'] is specified, the
+        bound is the fitness of the individual at that quantile of the
+        current population, ranked from best to worst (e.g. 1 gives the
+        fitness of the worst individual). New individuals which cannot reach
+        the bound are not evaluated on all training data.
+
+        :param individuals: The current population.
+        :return: Nothing.
+        """
+
+        if not params['RACING_QUANTILE']:
+            return
+
+        if self.racing_bound is None:
+            # Check the parameters the first time a bound is set.
+            self.check_racing()
+
+        fitnesses = np.sort([ind.fitness for ind in individuals if not
+                             np.isnan(ind.fitness)])
+
+        if len(fitnesses):
+            self.racing_bound = fitnesses[max(1, ceil(
+                params['RACING_QUANTILE'] * len(fitnesses))) - 1]
+
+        else:
+            # No individual has a valid fitness.
+            self.racing_bound = None
+
+    def __getstate__(self):
+        """
+        Returns the state of the fitness function for pickling (e.g. when it
+        is sent to multicore workers). Datasets in shared memory are
+        replaced by descriptors rather than being copied.
+
+        :return: A dictionary of the attributes of the fitness function.
+        """
+
+        return share_state(self.__dict__)
+
+    def __setstate__(self, state):
+        """
+        Restores the state of an unpickled fitness function, attaching to any
+        datasets in shared memory.
+
+        :param state: A dictionary of the attributes of the fitness function.
+        :return: Nothing.
+        """
+
+        self.__dict__.update(attach_state(state))
+
     def evaluate(self, ind, **kwargs):
         """
         Note that math functions used in the solutions are imported from either
@@ -49,7 +276,9 @@ class supervised_learning(base_ff):
         :param ind: An individual to be evaluated.
         :param kwargs: An optional parameter for problems with training/test
         data. Specifies the distribution (i.e. training or test) upon which
-        evaluation is to be performed.
+        evaluation is to be performed. The training distribution is the
+        sample of the training data for the current generation; "full" is
+        all of the training data.
         :return: The fitness of the evaluated individual.
         """
 
@@ -57,6 +286,10 @@ class supervised_learning(base_ff):
 
         if dist == "training":
             # Set training datasets.
+            x, y = self.get_training_sample()
+
+        elif dist == "full":
+            # Set all training data, even if a sample is being used.
             x = self.training_in
             y = self.training_exp
 
@@ -87,7 +320,11 @@ at https://github.com/PonyGE/PonyGE2/issues/130."""
                 phen = ind.phenotype_consec_consts
                 c = ind.opt_consts
                 # phen will refer to x (ie test_in), and possibly to c
-                yhat = eval(phen)
+                if params['STACK_EVALUATION']:
+                    # Evaluate without the nesting limit of eval().
+                    yhat = stack_eval(phen, globals(), locals())
+                else:
+                    yhat = eval(compile_cached(phen))
                 assert np.isrealobj(yhat)
                 # check whether yhat is a constant or an array (see below).
                 if np.ndim(yhat) != 0: 
@@ -100,7 +337,23 @@ at https://github.com/PonyGE/PonyGE2/issues/130."""
 
         else:
             # phenotype won't refer to C
-            yhat = eval(ind.phenotype)
+            if dist == "training" and self.racing_bound is not None and \
+                    'prediction' not in kwargs:
+                # Stop evaluating the individual once it cannot reach the
+                # racing bound.
+                return self.evaluate_chunks(ind, x, y, self.racing_bound)
+            elif params['STREAMING_CHUNK_SIZE']:
+                # Evaluate the individual one chunk of rows at a time.
+                return self.evaluate_chunks(ind, x, y)
+            elif 'prediction' in kwargs:
+                # The phenotype has already been evaluated, e.g. as part of
+                # an expression DAG of the whole population.
+                yhat = kwargs['prediction']()
+            elif params['STACK_EVALUATION']:
+                # Evaluate without the nesting limit of eval().
+                yhat = stack_eval(ind.phenotype, globals(), locals())
+            else:
+                yhat = eval(compile_cached(ind.phenotype))
             assert np.isrealobj(yhat)
             # Phenotypes that don't refer to x are constants, ie will
             # return a single value (not an array). That will work
@@ -116,3 +369,190 @@ at https://github.com/PonyGE/PonyGE2/issues/130."""
             # let's always call the error function with the true
             # values first, the estimate second
             return params['ERROR_METRIC'](y, yhat)
+
+    def evaluate_chunks(self, ind, data_in, data_exp, bound=None):
+        """
+        Evaluate an individual on consecutive chunks of rows of a dataset,
+        keeping a running total of the errors of the cases evaluated so far
+        (see the incremental error metric interface in
+        utilities.fitness.error_metric).
+
+        If params['STREAMING_CHUNK_SIZE'] is specified, chunks of that many
+        rows are used and the error metric is computed from the total, so
+        only one chunk of the dataset and of the outputs of the individual is
+        held in memory at a time. Datasets larger than memory can be
+        evaluated if they are memory-mapped (see params['DATASET_CACHE_DIR']).
+        Otherwise, chunks of params['RACING_CHUNK_SIZE'] rows (by default, a
+        tenth of the dataset) are used, and the error metric is computed over
+        the outputs for all rows, exactly as if the individual had been
+        evaluated in one go.
+
+        If a racing bound is given, errors of cases are never negative, so
+        the total gives a lower bound on the final error. As soon as that
+        lower bound is worse than the racing bound the evaluation stops, the
+        lower bound is returned as the fitness, and ind.truncated is set.
+
+        Phenotypes must compute the output of each row from that row alone,
+        as supervised learning grammars do.
+
+        :param ind: An individual to be evaluated.
+        :param data_in: The input data.
+        :param data_exp: The expected output data.
+        :param bound: The racing bound, or None to evaluate all rows.
+        :return: The fitness of the individual, or a lower bound on it if
+        the evaluation was stopped.
+        """
+
+        metric = params['ERROR_METRIC']
+        n = len(data_exp)
+
+        streaming = bool(params['STREAMING_CHUNK_SIZE'])
+        chunk_size = params['STREAMING_CHUNK_SIZE'] or \
+            params['RACING_CHUNK_SIZE'] or ceil(n / 10)
+
+        if params['STACK_EVALUATION']:
+            phen = None
+        else:
+            phen = compile_cached(ind.phenotype)
+
+        if bound is not None:
+            ind.truncated = False
+
+        outputs, total = [], 0
+
+        for start in range(0, n, chunk_size):
+            # Select the rows of the chunk. The phenotype refers to x.
+            rows = [slice(None)] * np.ndim(data_in)
+            rows[self.sample_axis] = slice(start, start + chunk_size)
+            x, y = data_in[tuple(rows)], data_exp[start:start + chunk_size]
+
+            if params['STACK_EVALUATION']:
+                # Evaluate without the nesting limit of eval().
+                yhat = stack_eval(ind.phenotype, globals(), locals())
+            else:
+                yhat = eval(phen)
+            assert np.isrealobj(yhat)
+
+            if np.ndim(yhat) == 0 and not streaming:
+                # The phenotype is a constant, so there is nothing to gain
+                # from evaluating it in chunks.
+                return metric(data_exp, yhat)
+
+            elif np.ndim(yhat) != 0 and y.shape != yhat.shape:
+                raise ValueError("Shape mismatch between y and yhat. Please "
+                                 "check that your grammar uses the `x[:, 0]` "
+                                 "style, not `x[0]`. Please see change at "
+                                 "https://github.com/PonyGE/PonyGE2/issues/"
+                                 "130.")
+
+            if not streaming:
+                outputs.append(yhat)
+
+            total += np.sum(metric.case_errors(y, yhat))
+
+            if bound is not None and start + chunk_size < n and \
+                    metric.from_total(total, n) > bound:
+                # The individual cannot reach the racing bound.
+                ind.truncated = True
+                return metric.from_total(total, n)
+
+        if streaming:
+            return metric.from_total(total, n)
+
+        return metric(data_exp, np.concatenate(outputs))
+
+    def evaluate_batch(self, individuals, **kwargs):
+        """
+        Evaluate a batch of individuals at once. If params['DAG_EVALUATION']
+        is specified, the phenotypes of all individuals are merged into a
+        single expression DAG (utilities.fitness.expression_dag), so that
+        every distinct subexpression in the batch is computed only once over
+        the dataset, and the error metric is then applied to the output of
+        each individual. If params['SEMANTIC_CACHE_SIZE'] is specified, the
+        DAG is used and the outputs of subexpressions are also cached across
+        batches (utilities.fitness.semantic_cache). Otherwise each distinct
+        phenotype in the batch is evaluated once. If constants are being
+        optimised, each individual is evaluated individually as normal, as
+        optimisation changes the individual.
+
+        :param individuals: A list of individuals to be evaluated.
+        :param kwargs: An optional parameter for problems with training/test
+        data. Specifies the distribution (i.e. training or test) upon which
+        evaluation is to be performed.
+        :return: A list of the fitnesses of the individuals, in order.
+        """
+
+        if params['OPTIMIZE_CONSTANTS']:
+            # Constants are optimised separately for each individual.
+            return super().evaluate_batch(individuals, **kwargs)
+
+        elif not (params['DAG_EVALUATION'] or params['SEMANTIC_CACHE_SIZE']):
+            # Evaluate each distinct phenotype once.
+            fitnesses, first = [], {}
+
+            for i, ind in enumerate(individuals):
+                if ind.phenotype in first:
+                    # Copy the results of the earlier evaluation.
+                    j = first[ind.phenotype]
+                    ind.runtime_error = individuals[j].runtime_error
+                    ind.truncated = individuals[j].truncated
+                    fitnesses.append(fitnesses[j])
+
+                else:
+                    first[ind.phenotype] = i
+                    fitnesses.append(self(ind, **kwargs))
+
+            return fitnesses
+
+        dist = kwargs.get('dist', 'training')
+
+        # The name of the data used, for the semantic cache.
+        split = dist
+
+        if dist == "training":
+            # Set training datasets.
+            x = self.get_training_sample()[0]
+
+            if self.sample_seed is not None:
+                split = "training sample %d" % self.sample_seed
+
+        elif dist == "full":
+            # Set all training data, even if a sample is being used.
+            x = self.training_in
+            split = "training"
+
+        elif dist == "test":
+            # Set test datasets.
+            x = self.test_in
+
+        else:
+            raise ValueError("Unknown dist: " + dist)
+
+        dag, indexes = ExpressionDAG(), []
+
+        for ind in individuals:
+            try:
+                # Add the phenotype to the DAG.
+                indexes.append(dag.add_expression(ind.phenotype))
+
+            except ValueError:
+                # The phenotype can't be parsed, evaluate it individually.
+                indexes.append(None)
+
+        # Evaluate all distinct subexpressions, using the semantic cache of
+        # subexpression outputs if it is switched on.
+        dag.evaluate(globals(), {'x': x},
+                     split if params['SEMANTIC_CACHE_SIZE'] else None)
+
+        fitnesses = []
+
+        for ind, index in zip(individuals, indexes):
+            if index is None:
+                fitnesses.append(self(ind, **kwargs))
+
+            else:
+                # Compute the error of the output of the individual.
+                fitnesses.append(self(ind, prediction=lambda: dag.get_value(
+                    index), **kwargs))
+
+        return fitnesses
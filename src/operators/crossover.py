@@ -2,6 +2,7 @@ from random import choice, randint, random, sample
 
 from algorithm.parameters import params
 from representation import individual
+from representation.flat_tree import FlatTree
 from representation.latent_tree import latent_tree_crossover, \
     latent_tree_repair
 from utilities.representation.check_methods import check_ind
@@ -19,6 +20,11 @@ def crossover(parents):
     :return: A population of fully crossed over individuals.
     """
 
+    if params['BATCH_MAPPING'] and \
+            params['CROSSOVER'].representation == "linear":
+        # Map all children of linear crossover together in batches.
+        return batch_crossover(parents)
+
     # Initialise an empty population.
     cross_pop = []
 
@@ -42,6 +48,60 @@ def crossover(parents):
     return cross_pop
 
 
+def batch_crossover(parents):
+    """
+    Perform linear crossover on a population of individuals, mapping all
+    children together in a single batch rather than one at a time. Any
+    pairs of children which fail the crossover checks are discarded and
+    replaced by a new batch, exactly as in operators.crossover.crossover().
+
+    :param parents: A population of parent individuals on which crossover is
+    to be performed.
+    :return: A population of fully crossed over individuals.
+    """
+
+    # Initialise an empty population.
+    cross_pop = []
+
+    while len(cross_pop) < params['GENERATION_SIZE']:
+
+        # Initialise a batch of un-mapped pairs of children.
+        batch = []
+
+        # Each crossover event creates two children.
+        remaining = params['GENERATION_SIZE'] - len(cross_pop)
+
+        for _ in range((remaining + 1) // 2):
+
+            # Randomly choose two parents from the parent population.
+            inds_in = sample(parents, 2)
+
+            # Crossover cannot be performed on invalid individuals.
+            if not params['INVALID_SELECTION'] and \
+                    (inds_in[0].invalid or inds_in[1].invalid):
+                s = "operators.crossover.batch_crossover\nError: invalid " \
+                    "individuals selected for crossover."
+                raise Exception(s)
+
+            # Perform crossover on copies of the chosen parents without
+            # mapping the children.
+            batch.append(params['CROSSOVER'](inds_in[0].deep_copy(),
+                                             inds_in[1].deep_copy(),
+                                             map_ind=False))
+
+        # Map all children in the batch together.
+        individual.map_individuals([ind for inds in batch for ind in inds])
+
+        for inds in batch:
+            # Check each individual is ok (i.e. does not violate specified
+            # limits).
+            if not any([check_ind(ind, "crossover") for ind in inds]):
+                # Crossover was successful, extend the new population.
+                cross_pop.extend(inds)
+
+    return cross_pop
+
+
 def crossover_inds(parent_0, parent_1):
     """
     Perform crossover on two selected individuals.
@@ -78,7 +138,7 @@ def crossover_inds(parent_0, parent_1):
         return inds
 
 
-def variable_onepoint(p_0, p_1):
+def variable_onepoint(p_0, p_1, map_ind=True):
     """
     Given two individuals, create two children using one-point crossover and
     return them. A different point is selected on each genome for crossover
@@ -89,6 +149,8 @@ def variable_onepoint(p_0, p_1):
     
     :param p_0: Parent 0
     :param p_1: Parent 1
+    :param map_ind: A boolean flag that indicates whether or not the
+    children need to be mapped.
     :return: A list of crossed-over individuals.
     """
 
@@ -105,17 +167,26 @@ def variable_onepoint(p_0, p_1):
     if random() < params['CROSSOVER_PROBABILITY']:
         c_0 = genome_0[:pt_0] + genome_1[pt_1:]
         c_1 = genome_1[:pt_1] + genome_0[pt_0:]
+
+        # Set the first changed codon of each chromosome.
+        first_0, first_1 = pt_0, pt_1
     else:
         c_0, c_1 = genome_0[:], genome_1[:]
 
-    # Put the new chromosomes into new individuals.
-    ind_0 = individual.Individual(c_0, None)
-    ind_1 = individual.Individual(c_1, None)
+        # The chromosomes are unchanged.
+        first_0, first_1 = len(c_0), len(c_1)
+
+    # Put the new chromosomes into new individuals. Mapping can resume from
+    # any parent checkpoints before the first changed codon.
+    ind_0 = individual.Individual(c_0, None, map_ind,
+                                  p_0.get_checkpoints(first_0))
+    ind_1 = individual.Individual(c_1, None, map_ind,
+                                  p_1.get_checkpoints(first_1))
 
     return [ind_0, ind_1]
 
 
-def fixed_onepoint(p_0, p_1):
+def fixed_onepoint(p_0, p_1, map_ind=True):
     """
     Given two individuals, create two children using one-point crossover and
     return them. The same point is selected on both genomes for crossover
@@ -125,6 +196,8 @@ def fixed_onepoint(p_0, p_1):
 
     :param p_0: Parent 0
     :param p_1: Parent 1
+    :param map_ind: A boolean flag that indicates whether or not the
+    children need to be mapped.
     :return: A list of crossed-over individuals.
     """
 
@@ -141,17 +214,26 @@ def fixed_onepoint(p_0, p_1):
     if random() < params['CROSSOVER_PROBABILITY']:
         c_0 = genome_0[:pt] + genome_1[pt:]
         c_1 = genome_1[:pt] + genome_0[pt:]
+
+        # Set the first changed codon of each chromosome.
+        first_0, first_1 = pt, pt
     else:
         c_0, c_1 = genome_0[:], genome_1[:]
 
-    # Put the new chromosomes into new individuals.
-    ind_0 = individual.Individual(c_0, None)
-    ind_1 = individual.Individual(c_1, None)
+        # The chromosomes are unchanged.
+        first_0, first_1 = len(c_0), len(c_1)
+
+    # Put the new chromosomes into new individuals. Mapping can resume from
+    # any parent checkpoints before the first changed codon.
+    ind_0 = individual.Individual(c_0, None, map_ind,
+                                  p_0.get_checkpoints(first_0))
+    ind_1 = individual.Individual(c_1, None, map_ind,
+                                  p_1.get_checkpoints(first_1))
 
     return [ind_0, ind_1]
 
 
-def fixed_twopoint(p_0, p_1):
+def fixed_twopoint(p_0, p_1, map_ind=True):
     """
     Given two individuals, create two children using two-point crossover and
     return them. The same points are selected on both genomes for crossover
@@ -161,6 +243,8 @@ def fixed_twopoint(p_0, p_1):
 
     :param p_0: Parent 0
     :param p_1: Parent 1
+    :param map_ind: A boolean flag that indicates whether or not the
+    children need to be mapped.
     :return: A list of crossed-over individuals.
     """
 
@@ -177,17 +261,26 @@ def fixed_twopoint(p_0, p_1):
     if random() < params['CROSSOVER_PROBABILITY']:
         c_0 = genome_0[:pt_0] + genome_1[pt_0:pt_1] + genome_0[pt_1:]
         c_1 = genome_1[:pt_0] + genome_0[pt_0:pt_1] + genome_1[pt_1:]
+
+        # Set the first changed codon of each chromosome.
+        first_0, first_1 = pt_0, pt_0
     else:
         c_0, c_1 = genome_0[:], genome_1[:]
 
-    # Put the new chromosomes into new individuals.
-    ind_0 = individual.Individual(c_0, None)
-    ind_1 = individual.Individual(c_1, None)
+        # The chromosomes are unchanged.
+        first_0, first_1 = len(c_0), len(c_1)
+
+    # Put the new chromosomes into new individuals. Mapping can resume from
+    # any parent checkpoints before the first changed codon.
+    ind_0 = individual.Individual(c_0, None, map_ind,
+                                  p_0.get_checkpoints(first_0))
+    ind_1 = individual.Individual(c_1, None, map_ind,
+                                  p_1.get_checkpoints(first_1))
 
     return [ind_0, ind_1]
 
 
-def variable_twopoint(p_0, p_1):
+def variable_twopoint(p_0, p_1, map_ind=True):
     """
     Given two individuals, create two children using two-point crossover and
     return them. Different points are selected on both genomes for crossover
@@ -197,6 +290,8 @@ def variable_twopoint(p_0, p_1):
 
     :param p_0: Parent 0
     :param p_1: Parent 1
+    :param map_ind: A boolean flag that indicates whether or not the
+    children need to be mapped.
     :return: A list of crossed-over individuals.
     """
 
@@ -215,12 +310,21 @@ def variable_twopoint(p_0, p_1):
     if random() < params['CROSSOVER_PROBABILITY']:
         c_0 = genome_0[:pt_0] + genome_1[pt_2:pt_3] + genome_0[pt_1:]
         c_1 = genome_1[:pt_2] + genome_0[pt_0:pt_1] + genome_1[pt_3:]
+
+        # Set the first changed codon of each chromosome.
+        first_0, first_1 = pt_0, pt_2
     else:
         c_0, c_1 = genome_0[:], genome_1[:]
 
-    # Put the new chromosomes into new individuals.
-    ind_0 = individual.Individual(c_0, None)
-    ind_1 = individual.Individual(c_1, None)
+        # The chromosomes are unchanged.
+        first_0, first_1 = len(c_0), len(c_1)
+
+    # Put the new chromosomes into new individuals. Mapping can resume from
+    # any parent checkpoints before the first changed codon.
+    ind_0 = individual.Individual(c_0, None, map_ind,
+                                  p_0.get_checkpoints(first_0))
+    ind_1 = individual.Individual(c_1, None, map_ind,
+                                  p_1.get_checkpoints(first_1))
 
     return [ind_0, ind_1]
 
@@ -255,6 +359,20 @@ def subtree(p_0, p_1):
         # intersecting non-terminals.
         crossover_choice = choice(shared_nodes)
 
+        if params['COPY_ON_WRITE_TREES'] and not isinstance(tree0, FlatTree):
+            # Find the paths to all nodes in both trees that match the
+            # chosen crossover node.
+            paths_0 = tree0.get_target_paths(target=[crossover_choice])
+            paths_1 = tree1.get_target_paths(target=[crossover_choice])
+
+            # Randomly pick a node.
+            path_0, path_1 = choice(paths_0), choice(paths_1)
+
+            # Swap over the subtrees by copying only the paths to the
+            # crossover nodes. All other nodes are shared.
+            return tree0.replace_path(path_0, path_1[-1][1]), \
+                   tree1.replace_path(path_1, path_0[-1][1])
+
         # Find all nodes in both trees that match the chosen crossover node.
         nodes_0 = tree0.get_target_nodes([], target=[crossover_choice])
         nodes_1 = tree1.get_target_nodes([], target=[crossover_choice])
@@ -262,6 +380,12 @@ def subtree(p_0, p_1):
         # Randomly pick a node.
         t0, t1 = choice(nodes_0), choice(nodes_1)
 
+        if isinstance(tree0, FlatTree):
+            # Nodes of flat trees are indexes. Swap over copies of the
+            # subtrees by splicing them into new trees.
+            return tree0.replace_subtree(t0, tree1.get_subtree(t1)), \
+                   tree1.replace_subtree(t1, tree0.get_subtree(t0))
+
         # Check the parents of both chosen subtrees.
         p0 = t0.parent
         p1 = t1.parent
@@ -9,6 +9,8 @@ from representation.individual import Individual
 from representation.latent_tree import latent_tree_random_ind
 from representation.tree import Tree
 from scripts import GE_LR_parser
+from utilities.representation.phenotype_key import get_phenotype_key, \
+    intern_phenotype
 from utilities.representation.python_filter import python_filter
 
 
@@ -138,7 +140,8 @@ def rvd(size):
     phenotypes = set()
     while len(population) < size:
         ind = individual.Individual(sample_genome(), None)
-        if ind.invalid or ind.phenotype in phenotypes:
+        key = None if ind.invalid else get_phenotype_key(ind.phenotype)
+        if ind.invalid or key in phenotypes:
             tries += 1
             if tries > maxtries:
                 s = f"""
@@ -148,7 +151,7 @@ individuals."""
                 raise RuntimeError(s)
             pass
         else:
-            phenotypes.add(ind.phenotype)
+            phenotypes.add(key)
             population.append(ind)
     return population
 
@@ -337,7 +340,7 @@ def generate_ind_tree(max_depth, method):
     ind = individual.Individual(genome, ind_tree, map_ind=False)
 
     # Set individual parameters
-    ind.phenotype, ind.nodes = phenotype, nodes
+    ind.phenotype, ind.nodes = intern_phenotype(phenotype), nodes
     ind.depth, ind.used_codons, ind.invalid = depth, used_cod, invalid
 
     # Generate random tail for genome.
@@ -374,7 +377,7 @@ def generate_PI_ind_tree(max_depth):
     ind = individual.Individual(genome, ind_tree, map_ind=False)
 
     # Set individual parameters
-    ind.phenotype, ind.nodes = phenotype, nodes
+    ind.phenotype, ind.nodes = intern_phenotype(phenotype), nodes
     ind.depth, ind.used_codons, ind.invalid = depth, used_cod, invalid
 
     # Generate random tail for genome.
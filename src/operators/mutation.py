@@ -3,6 +3,8 @@ from random import choice, randint, random
 from algorithm.parameters import params
 from representation import individual
 from representation.derivation import generate_tree
+from representation.flat_tree import FlatTree
+from representation.tree import Tree
 from representation.latent_tree import latent_tree_mutate, latent_tree_repair
 from utilities.representation.check_methods import check_ind
 
@@ -16,6 +18,12 @@ def mutation(pop):
     :return: A fully mutated population.
     """
 
+    if params['BATCH_MAPPING'] and \
+            params['MUTATION'].representation == "linear":
+        # Map all individuals generated by linear mutation together in
+        # batches.
+        return batch_mutation(pop)
+
     # Initialise empty pop for mutated individuals.
     new_pop = []
 
@@ -53,7 +61,59 @@ def mutation(pop):
     return new_pop
 
 
-def int_flip_per_codon(ind):
+def batch_mutation(pop):
+    """
+    Perform linear mutation on a population of individuals, mapping all
+    mutated individuals together in a single batch rather than one at a
+    time. Individuals which fail the mutation checks are mutated again and
+    re-mapped in a new batch until they pass, exactly as in
+    operators.mutation.mutation().
+
+    :param pop: A population of individuals to be mutated.
+    :return: A fully mutated population.
+    """
+
+    # Initialise empty pop for mutated individuals.
+    new_pop = [None] * len(pop)
+
+    # Initially all individuals need to be mutated.
+    remaining = list(range(len(pop)))
+
+    while remaining:
+
+        # Initialise a batch of un-mapped mutated individuals.
+        batch = []
+
+        for i in remaining:
+            ind = pop[i]
+
+            # If individual has no genome, default to subtree mutation.
+            if not ind.genome and params['NO_MUTATION_INVALIDS']:
+                new_pop[i] = subtree(ind)
+
+            else:
+                # Perform mutation without mapping.
+                new_pop[i] = params['MUTATION'](ind, map_ind=False)
+
+                if new_pop[i] is not ind:
+                    # Only newly created individuals need to be mapped. Take
+                    # a copy of the genome now, as the same original
+                    # individual may be mutated again before mapping.
+                    new_pop[i].genome = list(new_pop[i].genome)
+                    batch.append(new_pop[i])
+
+        # Map all mutated individuals in the batch together.
+        individual.map_individuals(batch)
+
+        # Check inds do not violate specified limits. Any failed individuals
+        # are mutated again.
+        remaining = [i for i in remaining if
+                     check_ind(new_pop[i], "mutation")]
+
+    return new_pop
+
+
+def int_flip_per_codon(ind, map_ind=True):
     """
     Mutate the genome of an individual by randomly choosing a new int with
     probability p_mut. Works per-codon. Mutation is performed over the
@@ -61,6 +121,8 @@ def int_flip_per_codon(ind):
     within_used=False switches this off.
 
     :param ind: An individual to be mutated.
+    :param map_ind: A boolean flag that indicates whether or not the
+    mutated individual needs to be mapped.
     :return: A mutated individual.
     """
 
@@ -78,19 +140,28 @@ def int_flip_per_codon(ind):
         # Default is 1 divided by genome length.
         p_mut = 1.0 / eff_length
 
+    # Keep track of the first mutated codon.
+    first = len(ind.genome)
+
     # Mutation probability works per-codon over the portion of the
     # genome as defined by the within_used flag.
     for i in range(eff_length):
         if random() < p_mut:
             ind.genome[i] = randint(0, params['CODON_SIZE'])
+            first = min(first, i)
+
+    # The genome of the original individual has been changed, so only
+    # checkpoints before the first mutated codon remain valid.
+    ind.checkpoints = ind.get_checkpoints(first)
 
     # Re-build a new individual with the newly mutated genetic information.
-    new_ind = individual.Individual(ind.genome, None)
+    new_ind = individual.Individual(ind.genome, None, map_ind,
+                                    ind.checkpoints)
 
     return new_ind
 
 
-def int_flip_per_ind(ind):
+def int_flip_per_ind(ind, map_ind=True):
     """
     Mutate the genome of an individual by randomly choosing a new int with
     probability p_mut. Works per-individual. Mutation is performed over the
@@ -98,6 +169,8 @@ def int_flip_per_ind(ind):
     provided to limit mutation to only the effective length of the genome.
 
     :param ind: An individual to be mutated.
+    :param map_ind: A boolean flag that indicates whether or not the
+    mutated individual needs to be mapped.
     :return: A mutated individual.
     """
 
@@ -108,12 +181,21 @@ def int_flip_per_ind(ind):
         # Linear mutation cannot be performed on this individual.
         return ind
 
+    # Keep track of the first mutated codon.
+    first = len(ind.genome)
+
     for _ in range(params['MUTATION_EVENTS']):
         idx = randint(0, eff_length - 1)
         ind.genome[idx] = randint(0, params['CODON_SIZE'])
+        first = min(first, idx)
+
+    # The genome of the original individual has been changed, so only
+    # checkpoints before the first mutated codon remain valid.
+    ind.checkpoints = ind.get_checkpoints(first)
 
     # Re-build a new individual with the newly mutated genetic information.
-    new_ind = individual.Individual(ind.genome, None)
+    new_ind = individual.Individual(ind.genome, None, map_ind,
+                                    ind.checkpoints)
 
     return new_ind
 
@@ -138,13 +220,38 @@ def subtree(ind):
         :return: The full mutated tree and the associated genome.
         """
 
+        # Copy-on-write trees are mutated by copying the path to the
+        # mutated node.
+        copy_path = params['COPY_ON_WRITE_TREES'] and \
+            not isinstance(ind_tree, FlatTree)
+
         # Find the list of nodes we can mutate from.
-        targets = ind_tree.get_target_nodes([], target=params[
-            'BNF_GRAMMAR'].non_terminals)
+        if copy_path:
+            targets = ind_tree.get_target_paths(target=params[
+                'BNF_GRAMMAR'].non_terminals)
+
+        else:
+            targets = ind_tree.get_target_nodes([], target=params[
+                'BNF_GRAMMAR'].non_terminals)
 
         # Pick a node.
         new_tree = choice(targets)
 
+        if copy_path:
+            # Generate the new subtree from a new root node. The depth of
+            # the node is the length of the path to it.
+            path = new_tree
+            new_tree = Tree(path[-1][1].root, None)
+            new_tree.depth = len(path)
+
+        elif isinstance(ind_tree, FlatTree):
+            # Nodes of flat trees are indexes. Generate the new subtree
+            # from a new root node, and splice it into a new tree.
+            index = new_tree
+            new_tree = Tree(params['BNF_GRAMMAR'].compiled.symbols[
+                                ind_tree.symbols[index]], None)
+            new_tree.depth = ind_tree.depths[index]
+
         # Set the depth limits for the new subtree.
         if params['MAX_TREE_DEPTH']:
             # Set the limit to the tree depth.
@@ -157,6 +264,15 @@ def subtree(ind):
         # Mutate a new subtree.
         generate_tree(new_tree, [], [], "random", 0, 0, 0, max_depth)
 
+        if copy_path:
+            # Replace the mutated node in a copy of the path.
+            return ind_tree.replace_path(path, new_tree)
+
+        elif isinstance(ind_tree, FlatTree):
+            # Splice the new subtree into the flat tree.
+            return ind_tree.replace_subtree(index,
+                                            FlatTree.from_tree(new_tree))
+
         return ind_tree
 
     if ind.invalid:
@@ -87,6 +87,9 @@ def steady_state(individuals):
             # Mutate the new population.
             new_pop = mutation(cross_pop)
 
+            # Let the fitness function see the current population.
+            params['FITNESS_FUNCTION'].set_population(individuals)
+
             # Evaluate the fitness of the new population.
             new_pop = evaluate_fitness(new_pop)
 
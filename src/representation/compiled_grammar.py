@@ -0,0 +1,114 @@
+class CompiledGrammar(object):
+    """
+    Integer-indexed compiled form of a representation.grammar.Grammar
+    instance. All symbols in the grammar are given integer IDs, and all
+    production choices are stored in flat arrays. This allows for mapping
+    without any dict-of-dict lookups or string comparisons.
+
+    Non-terminals are given IDs 0 to n_nts - 1, in the order in which they
+    are defined in the grammar file (the start rule always has ID 0).
+    Terminals are given IDs from n_nts upwards. A symbol ID can therefore be
+    identified as a non-terminal simply by checking if it is less than n_nts.
+
+    The production choices for a non-terminal with ID nt are found at the
+    indexes choice_offset[nt] to choice_offset[nt] + no_choices[nt] - 1 of
+    all flat production arrays.
+    """
+
+    def __init__(self, grammar):
+        """
+        Compile a given grammar into integer-indexed production tables.
+
+        :param grammar: An instance of the representation.grammar.Grammar
+        class.
+        """
+
+        # Initialise the list of all symbol strings. The index of each symbol
+        # in this list is its integer ID.
+        self.symbols = list(grammar.rules.keys())
+        self.n_nts = len(self.symbols)
+
+        # Initialise the mapping from symbol strings to integer IDs.
+        self.nt_ids = {nt: i for i, nt in enumerate(self.symbols)}
+        self.t_ids = {}
+
+        # Set the ID of the start rule.
+        self.start_id = self.nt_ids[grammar.start_rule["symbol"]]
+
+        # Initialise per non-terminal arrays.
+        self.no_choices, self.choice_offset = [], []
+
+        # Initialise flat production arrays.
+        self.productions = []
+        self.reversed_productions = []
+        self.arities = []
+        self.nt_counts = []
+        self.node_counts = []
+
+        for nt in grammar.rules:
+            # Iterate over all non-terminals in the grammar.
+            choices = grammar.rules[nt]['choices']
+
+            # Set the index of the first production choice for this NT.
+            self.choice_offset.append(len(self.productions))
+            self.no_choices.append(len(choices))
+
+            for choice in choices:
+                # Convert all symbols in the production choice to IDs.
+                production = tuple(self.get_symbol_id(sym) for sym in
+                                   choice['choice'])
+
+                # Count the number of non-terminals in this production.
+                nt_count = sum([1 for sym in production if sym < self.n_nts])
+
+                self.productions.append(production)
+
+                # Productions are pushed onto the derivation stack in
+                # reverse order so that the leftmost symbol is popped first.
+                self.reversed_productions.append(production[::-1])
+                self.arities.append(len(production))
+                self.nt_counts.append(nt_count)
+
+                # A production with no non-terminals terminates the branch,
+                # which counts as a single node.
+                self.node_counts.append(nt_count if nt_count else 1)
+
+        # Freeze all tables so they can be safely shared.
+        self.symbols = tuple(self.symbols)
+        self.no_choices = tuple(self.no_choices)
+        self.choice_offset = tuple(self.choice_offset)
+        self.productions = tuple(self.productions)
+        self.reversed_productions = tuple(self.reversed_productions)
+        self.arities = tuple(self.arities)
+        self.nt_counts = tuple(self.nt_counts)
+        self.node_counts = tuple(self.node_counts)
+
+    def get_symbol_id(self, symbol):
+        """
+        Return the integer ID of a given grammar symbol dict, assigning a new
+        terminal ID if the symbol has not been encountered yet.
+
+        :param symbol: A symbol dict from the representation.grammar.Grammar
+        class, e.g. {"symbol": "<e>", "type": "NT"}.
+        :return: The integer ID of the symbol.
+        """
+
+        if symbol["type"] == "NT":
+            return self.nt_ids[symbol["symbol"]]
+
+        if symbol["symbol"] not in self.t_ids:
+            # Add a new terminal.
+            self.t_ids[symbol["symbol"]] = len(self.symbols)
+            self.symbols.append(symbol["symbol"])
+
+        return self.t_ids[symbol["symbol"]]
+
+    def is_nt(self, symbol_id):
+        """
+        Check if a given symbol ID is a non-terminal.
+
+        :param symbol_id: An integer symbol ID.
+        :return: True if the symbol is a non-terminal.
+        """
+
+        return symbol_id < self.n_nts
@@ -9,7 +9,11 @@ from utilities.representation.check_methods import get_nodes_and_depth, \
 def generate_tree(tree, genome, output, method, nodes, depth, max_depth,
                   depth_limit):
     """
-    Recursive function to derive a tree using a given method.
+    Derive a tree using a given method. The tree is derived depth-first
+    with an explicit stack rather than recursion, so there is no limit on
+    the depth of the tree. Nodes are derived in exactly the same order
+    (and so with exactly the same random choices) as a recursive
+    depth-first derivation.
     
     :param tree: An instance of the Tree class.
     :param genome: The list of all codons in a tree.
@@ -18,73 +22,100 @@ def generate_tree(tree, genome, output, method, nodes, depth, max_depth,
     :param method: A string of the desired tree derivation method,
     e.g. "full" or "random".
     :param nodes: The total number of nodes in the tree.
-    :param depth: The depth of the current node.
+    :param depth: The depth of the parent of the current node.
     :param max_depth: The maximum depth of any node in the tree.
     :param depth_limit: The maximum depth the tree can expand to.
     :return: genome, output, nodes, depth, max_depth.
     """
 
-    # Increment nodes and depth, set depth of current node.
-    nodes += 1
-    depth += 1
-    tree.depth = depth
+    # Each frame on the stack is a node which is currently being derived:
+    # [node, node depth, chosen production, index of next symbol in the
+    # production].
+    frames = []
 
-    # Find the productions possible from the current root.
-    productions = params['BNF_GRAMMAR'].rules[tree.root]
+    # Set the next node to be derived.
+    expand = tree
 
-    if depth_limit:
-        # Set remaining depth.
-        remaining_depth = depth_limit - depth
+    while True:
 
-    else:
-        remaining_depth = depth_limit
+        if expand is not None:
+            # Derive a new node.
 
-    # Find which productions can be used based on the derivation method.
-    available = legal_productions(method, remaining_depth, tree.root,
-                                  productions['choices'])
+            # Increment nodes and depth, set depth of current node.
+            nodes += 1
+            depth += 1
+            expand.depth = depth
 
-    # Randomly pick a production choice and make a codon with it.
-    chosen_prod = choice(available)
-    codon = generate_codon(chosen_prod, productions)
-    
-    # Set the codon for the current node and append codon to the genome.
-    tree.codon = codon
-    genome.append(codon)
+            # Find the productions possible from the current root.
+            productions = params['BNF_GRAMMAR'].rules[expand.root]
+
+            if depth_limit:
+                # Set remaining depth.
+                remaining_depth = depth_limit - depth
+
+            else:
+                remaining_depth = depth_limit
+
+            # Find which productions can be used based on the derivation
+            # method.
+            available = legal_productions(method, remaining_depth,
+                                          expand.root,
+                                          productions['choices'])
 
-    # Initialise empty list of children for current node.
-    tree.children = []
+            # Randomly pick a production choice and make a codon with it.
+            chosen_prod = choice(available)
+            codon = generate_codon(chosen_prod, productions)
 
-    for symbol in chosen_prod['choice']:
-        # Iterate over all symbols in the chosen production.
-        if symbol["type"] == "T":
-            # The symbol is a terminal. Append new node to children.
-            tree.children.append(Tree(symbol["symbol"], tree))
+            # Set the codon for the current node and append codon to the
+            # genome.
+            expand.codon = codon
+            genome.append(codon)
 
-            # Append the terminal to the output list.
-            output.append(symbol["symbol"])
+            # Initialise empty list of children for current node.
+            expand.children = []
 
-        elif symbol["type"] == "NT":
-            # The symbol is a non-terminal. Append new node to children.
-            tree.children.append(Tree(symbol["symbol"], tree))
+            frames.append([expand, depth, chosen_prod['choice'], 0])
+            expand = None
 
-            # recurse on the new node.
-            genome, output, nodes, d, max_depth = \
-                generate_tree(tree.children[-1], genome, output, method,
-                              nodes, depth, max_depth, depth_limit)
+        frame = frames[-1]
+        node, depth, symbols, position = frame
+
+        if position < len(symbols):
+            # Add the next symbol in the chosen production.
+            symbol = symbols[position]
+            frame[3] += 1
+
+            # Append new node to children.
+            node.children.append(Tree(symbol["symbol"], node))
+
+            if symbol["type"] == "T":
+                # The symbol is a terminal. Append the terminal to the
+                # output list.
+                output.append(symbol["symbol"])
+
+            elif symbol["type"] == "NT":
+                # The symbol is a non-terminal. Derive the new node next.
+                expand = node.children[-1]
+
+        else:
+            # All children of the current node have been derived.
+            frames.pop()
 
-    NT_kids = [kid for kid in tree.children if kid.root in
-               params['BNF_GRAMMAR'].non_terminals]
+            NT_kids = [kid for kid in node.children if kid.root in
+                       params['BNF_GRAMMAR'].non_terminals]
 
-    if not NT_kids:
-        # Then the branch terminates here
-        depth += 1
-        nodes += 1
+            if not NT_kids:
+                # Then the branch terminates here
+                depth += 1
+                nodes += 1
 
-    if depth > max_depth:
-        # Set new maximum depth
-        max_depth = depth
+            if depth > max_depth:
+                # Set new maximum depth
+                max_depth = depth
 
-    return genome, output, nodes, depth, max_depth
+            if not frames:
+                # The whole tree has been derived.
+                return genome, output, nodes, depth, max_depth
 
 
 def generate_codon(chosen_prod, productions):
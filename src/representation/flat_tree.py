@@ -0,0 +1,329 @@
+from array import array
+
+from algorithm.parameters import params
+from representation.tree import Tree
+
+
+class FlatTree(object):
+    """
+    A derivation tree stored as parallel arrays in preorder, as an
+    alternative to the linked node objects of representation.tree.Tree.
+
+    For the node at index i:
+        symbols[i] is the integer ID of the node symbol in the compiled
+            grammar (representation.compiled_grammar.CompiledGrammar),
+        codons[i] is the codon used to expand the node (-1 if the node was
+            not expanded, e.g. terminals),
+        depths[i] is the depth of the node (the root has depth 1),
+        parents[i] is the index of the parent of the node (-1 for the root),
+        sizes[i] is the number of nodes in the subtree rooted at the node.
+
+    Since nodes are stored in preorder, the subtree rooted at node i is the
+    contiguous slice i:i + sizes[i] of all arrays. Subtree crossover and
+    mutation are therefore slice splices, and the phenotype is a linear scan
+    over the leaves of the tree. All operations return new trees; a FlatTree
+    is never modified in place once built.
+    """
+
+    def __init__(self, symbols, codons, depths, parents, sizes):
+        """
+        Initialise an instance of the flat tree class from its arrays.
+
+        :param symbols: An array of the symbol IDs of all nodes.
+        :param codons: An array of the codons of all nodes.
+        :param depths: An array of the depths of all nodes.
+        :param parents: An array of the parent indexes of all nodes.
+        :param sizes: An array of the subtree sizes of all nodes.
+        """
+
+        self.symbols = symbols
+        self.codons = codons
+        self.depths = depths
+        self.parents = parents
+        self.sizes = sizes
+
+    @classmethod
+    def from_lists(cls, symbols, codons, depths, parents):
+        """
+        Build a flat tree from preorder lists of node information. Subtree
+        sizes are computed from the parent indexes.
+
+        :param symbols: A list of the symbol IDs of all nodes.
+        :param codons: A list of the codons of all nodes.
+        :param depths: A list of the depths of all nodes.
+        :param parents: A list of the parent indexes of all nodes.
+        :return: An instance of the flat tree class.
+        """
+
+        # Accumulate subtree sizes from the leaves up.
+        sizes = [1] * len(symbols)
+        for i in range(len(symbols) - 1, 0, -1):
+            sizes[parents[i]] += sizes[i]
+
+        return cls(array('i', symbols), array('l', codons),
+                   array('i', depths), array('i', parents), array('i', sizes))
+
+    @classmethod
+    def from_tree(cls, tree):
+        """
+        Convert an instance of the representation.tree.Tree class into a
+        flat tree.
+
+        :param tree: An instance of the representation.tree.Tree class.
+        :return: An instance of the flat tree class.
+        """
+
+        grammar = params['BNF_GRAMMAR'].compiled
+        nt_ids, t_ids = grammar.nt_ids, grammar.t_ids
+
+        symbols, codons, depths, parents = [], [], [], []
+
+        # Traverse the tree in preorder with a stack of nodes and the
+        # indexes of their parents.
+        stack = [(tree, -1)]
+
+        while stack:
+            node, parent = stack.pop()
+
+            symbols.append(nt_ids[node.root] if node.root in nt_ids else
+                           t_ids[node.root])
+            codons.append(-1 if node.codon is None else node.codon)
+            depths.append(depths[parent] + 1 if parent >= 0 else 1)
+            parents.append(parent)
+
+            # Push children in reverse so the leftmost child is next.
+            index = len(symbols) - 1
+            stack.extend([(child, index) for child in
+                          reversed(node.children)])
+
+        return cls.from_lists(symbols, codons, depths, parents)
+
+    def to_tree(self):
+        """
+        Convert the flat tree into an instance of the
+        representation.tree.Tree class.
+
+        :return: The root node of an equivalent tree.
+        """
+
+        symbol_strings = params['BNF_GRAMMAR'].compiled.symbols
+
+        nodes = []
+
+        for i, symbol in enumerate(self.symbols):
+            parent = nodes[self.parents[i]] if i else None
+
+            # Create a new node and attach it to its parent.
+            node = Tree(symbol_strings[symbol], parent)
+            node.codon = None if self.codons[i] < 0 else self.codons[i]
+            node.depth = self.depths[i]
+            nodes.append(node)
+
+            if parent is not None:
+                parent.children.append(node)
+
+        return nodes[0]
+
+    def __len__(self):
+        """
+        :return: The number of nodes in the tree.
+        """
+
+        return len(self.symbols)
+
+    def __str__(self):
+        """
+        Builds a string of the current tree, in the same format as
+        representation.tree.Tree.
+
+        :return: A string of the current tree.
+        """
+
+        return str(self.to_tree())
+
+    def __copy__(self):
+        """
+        Creates a new unique copy of self.
+
+        :return: A new unique copy of self.
+        """
+
+        return FlatTree(self.symbols[:], self.codons[:], self.depths[:],
+                        self.parents[:], self.sizes[:])
+
+    def __eq__(self, other):
+        """
+        Set the definition for comparison of two flat trees. Returns True if
+        both trees have the same nodes in the same structure.
+
+        :param other: Another instance of the flat tree class.
+        :return: True if self == other.
+        """
+
+        return isinstance(other, FlatTree) and \
+            self.symbols == other.symbols and \
+            self.codons == other.codons and \
+            self.parents == other.parents
+
+    def get_target_nodes(self, array, target=None):
+        """
+        Returns the indexes of all NT nodes which match the target NT list,
+        in preorder. This is the same order in which
+        representation.tree.Tree.get_target_nodes returns nodes.
+
+        :param array: The list of indexes of all nodes that match the target.
+        :param target: The target nodes to match.
+        :return: The list of indexes of all nodes that match the target.
+        """
+
+        nt_ids = params['BNF_GRAMMAR'].compiled.nt_ids
+        target_ids = set([nt_ids[nt] for nt in target if nt in nt_ids])
+
+        array.extend([i for i, symbol in enumerate(self.symbols) if
+                      symbol in target_ids])
+
+        return array
+
+    def get_node_labels(self, labels):
+        """
+        Adds the symbol strings of all nodes in the tree to a set.
+
+        :param labels: The set of roots of all nodes in the tree.
+        :return: The set of roots of all nodes in the tree.
+        """
+
+        symbol_strings = params['BNF_GRAMMAR'].compiled.symbols
+
+        labels.update([symbol_strings[symbol] for symbol in
+                       set(self.symbols)])
+
+        return labels
+
+    def get_tree_info(self, nt_keys, genome, output, invalid=False,
+                      max_depth=0, nodes=0):
+        """
+        Scans the tree once and returns all necessary information on a tree
+        required to generate an individual. Returns the same information as
+        representation.tree.Tree.get_tree_info, except that codons with a
+        value of 0 are kept in the genome.
+
+        :param nt_keys: The list of all non-terminals in the grammar. Not
+        used, as non-terminals are identified by their symbol IDs. Kept for
+        compatibility with representation.tree.Tree.
+        :param genome: The list of all codons in the tree.
+        :param output: The list of all terminal nodes in the tree. This is
+        joined to become the phenotype.
+        :param invalid: A boolean flag for whether a tree is fully expanded.
+        True if invalid (unexpanded).
+        :param max_depth: The maximum depth of any node in the tree.
+        :param nodes: The number of nodes in the tree.
+        :return: genome, output, invalid, max_depth, nodes.
+        """
+
+        grammar = params['BNF_GRAMMAR'].compiled
+        n_nts, symbol_strings = grammar.n_nts, grammar.symbols
+        symbols, codons = self.symbols, self.codons
+        depths, parents, sizes = self.depths, self.parents, self.sizes
+
+        # Find all nodes which have non-terminal children.
+        nt_parents = set([parents[i] for i in range(1, len(symbols)) if
+                          symbols[i] < n_nts])
+
+        for i, symbol in enumerate(symbols):
+
+            if i and sizes[i] == 1:
+                # The current node is a leaf. Append it to the phenotype
+                # output.
+                output.append(symbol_strings[symbol])
+
+                if symbol < n_nts:
+                    # Current non-terminal node has no children; invalid tree.
+                    invalid = True
+
+                continue
+
+            # Increment number of nodes in tree.
+            nodes += 1
+
+            if depths[i] > max_depth:
+                # Set new max tree depth.
+                max_depth = depths[i]
+
+            if codons[i] >= 0:
+                # If the current node has a codon, append it to the genome.
+                genome.append(codons[i])
+
+            if i not in nt_parents:
+                # The current node has only terminal children, increment
+                # number of tree nodes.
+                nodes += 1
+
+                # Terminal children increase the current node depth by one.
+                if depths[i] + 1 > max_depth:
+                    # Set new max tree depth.
+                    max_depth = depths[i] + 1
+
+            if symbol < n_nts and sizes[i] == 1:
+                # Current NT has no children. Invalid tree.
+                invalid = True
+
+        return genome, output, invalid, max_depth, nodes
+
+    def get_subtree(self, index):
+        """
+        Returns a copy of the subtree rooted at a given node as a new flat
+        tree, with the root of the subtree at depth 1.
+
+        :param index: The index of the root node of the subtree.
+        :return: A new instance of the flat tree class.
+        """
+
+        end = index + self.sizes[index]
+        offset = self.depths[index] - 1
+
+        return FlatTree(self.symbols[index:end], self.codons[index:end],
+                        array('i', [depth - offset for depth in
+                                    self.depths[index:end]]),
+                        array('i', [-1] + [parent - index for parent in
+                                           self.parents[index + 1:end]]),
+                        self.sizes[index:end])
+
+    def replace_subtree(self, index, subtree):
+        """
+        Returns a new flat tree where the subtree rooted at a given node has
+        been replaced by another subtree. The original tree is not changed.
+
+        :param index: The index of the root node of the subtree to be
+        replaced.
+        :param subtree: An instance of the flat tree class (with its root at
+        depth 1) to be spliced in.
+        :return: A new instance of the flat tree class.
+        """
+
+        end = index + self.sizes[index]
+        delta = len(subtree) - self.sizes[index]
+        offset = self.depths[index] - 1
+        parent = self.parents[index]
+
+        # Splice in the new subtree, shifting the depths and parent indexes
+        # of the new subtree into place.
+        symbols = self.symbols[:index] + subtree.symbols + self.symbols[end:]
+        codons = self.codons[:index] + subtree.codons + self.codons[end:]
+        depths = self.depths[:index] + \
+            array('i', [depth + offset for depth in subtree.depths]) + \
+            self.depths[end:]
+        sizes = self.sizes[:index] + subtree.sizes + self.sizes[end:]
+
+        # Parent indexes of nodes after the replaced subtree are shifted if
+        # their parent is also after the replaced subtree.
+        parents = self.parents[:index] + \
+            array('i', [parent] + [i + index for i in subtree.parents[1:]]) + \
+            array('i', [i if i < index else i + delta for i in
+                        self.parents[end:]])
+
+        while parent >= 0:
+            # Update the subtree sizes of all ancestors.
+            sizes[parent] += delta
+            parent = parents[parent]
+
+        return FlatTree(symbols, codons, depths, parents, sizes)
@@ -3,6 +3,7 @@ from re import DOTALL, MULTILINE, finditer, match
 from sys import maxsize
 
 from algorithm.parameters import params
+from representation.compiled_grammar import CompiledGrammar
 
 
 class Grammar(object):
@@ -64,6 +65,10 @@ class Grammar(object):
         # Enables faster tree operations.
         self.set_grammar_properties()
 
+        # Compile the grammar into integer-indexed production tables for
+        # fast genome mapping.
+        self.compiled = CompiledGrammar(self)
+
         # Calculate the total number of derivation tree permutations and
         # combinations that can be created by a grammar at a range of depths.
         self.check_permutations()
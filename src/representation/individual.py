@@ -1,7 +1,9 @@
 import numpy as np
 
-from algorithm.mapper import mapper
+from algorithm.mapper import map_genomes, mapper
 from algorithm.parameters import params
+from representation.flat_tree import FlatTree
+from representation.tree import Tree
 
 
 class Individual(object):
@@ -9,7 +11,7 @@ class Individual(object):
     A GE individual.
     """
 
-    def __init__(self, genome, ind_tree, map_ind=True):
+    def __init__(self, genome, ind_tree, map_ind=True, checkpoints=None):
         """
         Initialise an instance of the individual class (i.e. create a new
         individual).
@@ -19,13 +21,29 @@ class Individual(object):
         of the representation.tree.Tree class.
         :param map_ind: A boolean flag that indicates whether or not an
         individual needs to be mapped.
+        :param checkpoints: An optional list of mapping checkpoints which
+        are valid for the given genome (e.g. as returned by
+        Individual.get_checkpoints() on a parent individual).
         """
 
+        if params['MAPPING_CHECKPOINTS'] and params['GENOME_OPERATIONS']:
+            # Each individual has its own list of mapping checkpoints,
+            # starting with any valid checkpoints from its parent.
+            self.checkpoints = list(checkpoints) if checkpoints else []
+
+        else:
+            self.checkpoints = None
+
+        if params['FLAT_TREES'] and isinstance(ind_tree, Tree):
+            # Store the derivation tree as an array-backed flat tree.
+            ind_tree = FlatTree.from_tree(ind_tree)
+
         if map_ind:
             # The individual needs to be mapped from the given input
             # parameters.
             self.phenotype, self.genome, self.tree, self.nodes, self.invalid, \
-            self.depth, self.used_codons = mapper(genome, ind_tree)
+            self.depth, self.used_codons = mapper(genome, ind_tree,
+                                                  self.checkpoints)
 
         else:
             # The individual does not need to be mapped.
@@ -33,6 +51,7 @@ class Individual(object):
 
         self.fitness = params['FITNESS_FUNCTION'].default_fitness
         self.runtime_error = False
+        self.truncated = False
         self.name = None
 
     def __lt__(self, other):
@@ -96,12 +115,17 @@ class Individual(object):
         :return: A unique copy of the individual.
         """
 
-        if not params['GENOME_OPERATIONS']:
-            # Create a new unique copy of the tree.
-            new_tree = self.tree.__copy__()
+        if params['GENOME_OPERATIONS']:
+            new_tree = None
+
+        elif params['COPY_ON_WRITE_TREES'] or isinstance(self.tree, FlatTree):
+            # Trees are never modified in place, so they can be shared.
+            # Subtree operators copy only the nodes they change.
+            new_tree = self.tree
 
         else:
-            new_tree = None
+            # Create a new unique copy of the tree.
+            new_tree = self.tree.__copy__()
 
         # Create a copy of self by initialising a new individual.
         new_ind = Individual(self.genome.copy(), new_tree, map_ind=False)
@@ -113,8 +137,32 @@ class Individual(object):
         new_ind.used_codons = self.used_codons
         new_ind.runtime_error = self.runtime_error
 
+        # Checkpoints are never modified in place once an individual has
+        # been mapped, so they can be shared.
+        new_ind.checkpoints = self.checkpoints
+
         return new_ind
 
+    def get_checkpoints(self, index):
+        """
+        Return all mapping checkpoints of this individual which are valid
+        for a new genome which shares the first index codons of this
+        individual's genome, e.g. a child created by linear crossover or
+        mutation where index is the first changed codon.
+
+        :param index: The index of the first codon which differs from this
+        individual's genome.
+        :return: A list of valid mapping checkpoints, or None if mapping
+        checkpoints are not being used.
+        """
+
+        if not self.checkpoints:
+            # No checkpoints are available.
+            return None
+
+        return [checkpoint for checkpoint in self.checkpoints if
+                checkpoint[0] <= index]
+
     def evaluate(self):
         """
         Evaluates phenotype in using the fitness function set in the params
@@ -131,3 +179,24 @@ class Individual(object):
 
         if params['MULTICORE']:
             return self
+
+
+def map_individuals(individuals):
+    """
+    Map a list of un-mapped individuals (i.e. individuals created with
+    map_ind=False) together in a single batch using
+    algorithm.mapper.map_genomes(). Individuals are mapped in place.
+
+    :param individuals: A list of individuals with genomes but no mapped
+    phenotypes.
+    :return: Nothing.
+    """
+
+    # Map all genomes together.
+    mapped = map_genomes([ind.genome for ind in individuals],
+                         [ind.checkpoints for ind in individuals])
+
+    for ind, output in zip(individuals, mapped):
+        # Set the mapped attributes of each individual.
+        ind.phenotype, ind.genome, ind.tree, ind.nodes, ind.invalid, \
+        ind.depth, ind.used_codons = output
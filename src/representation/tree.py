@@ -26,26 +26,40 @@ class Tree:
         :return: A string of the current tree.
         """
 
-        # Initialise the output string.
-        result = "("
+        # Initialise the list of output strings.
+        result = []
 
-        # Append the root of the current node to the output string.
-        result += str(self.root)
+        # Traverse the tree with an explicit stack rather than recursion.
+        # Each item on the stack is either a node to be opened, or a string
+        # to be appended to the output.
+        stack = [self]
 
-        for child in self.children:
-            # Iterate across all children.
+        while stack:
+            item = stack.pop()
 
-            if len(child.children) > 0:
-                # Recurse through all children.
-                result += " " + str(child)
+            if isinstance(item, str):
+                # Append a terminal or a closing bracket to the output.
+                result.append(item)
+                continue
 
-            else:
-                # Child is a terminal, append root to string.
-                result += " " + str(child.root)
+            # Open the current node and append its root.
+            result.append("(" + str(item.root))
 
-        result += ")"
+            # Push the closing bracket and all children in reverse order.
+            stack.append(")")
 
-        return result
+            for child in reversed(item.children):
+
+                if len(child.children) > 0:
+                    # Child has children, open it as a new node.
+                    stack.append(child)
+                    stack.append(" ")
+
+                else:
+                    # Child is a terminal, append root to string.
+                    stack.append(" " + str(child.root))
+
+        return "".join(result)
 
     def __copy__(self):
         """
@@ -62,15 +76,24 @@ class Tree:
 
         tree_copy.snippet = self.snippet
 
-        for child in self.children:
-            # Recurse through all children.
-            new_child = child.__copy__()
+        # Copy all nodes using an explicit stack of original nodes and
+        # their copies.
+        stack = [(self, tree_copy)]
 
-            # Set the parent of the copied child as the copied parent.
-            new_child.parent = tree_copy
+        while stack:
+            node, node_copy = stack.pop()
 
-            # Append the copied child to the copied parent.
-            tree_copy.children.append(new_child)
+            for child in node.children:
+                # Copy each child.
+                new_child = Tree(child.root, node_copy)
+                new_child.codon, new_child.depth = child.codon, child.depth
+                new_child.snippet = child.snippet
+
+                # Append the copied child to the copied parent.
+                node_copy.children.append(new_child)
+
+                # Copy the children of the child.
+                stack.append((child, new_child))
 
         return tree_copy
 
@@ -83,35 +106,33 @@ class Tree:
         :return: True if self == other.
         """
 
-        # Get attributes of self and other.
-        a_self, a_other = vars(self), vars(other)
-
         # Don't look at the children as they are class instances themselves.
         taboo = ["parent", "children", "snippet", "id"]
-        self_no_kids = {k: v for k, v in a_self.items() if k not in taboo}
-        other_no_kids = {k: v for k, v in a_other.items() if k not in taboo}
 
-        # Compare attributes
-        if self_no_kids != other_no_kids:
-            # Attributes are not the same.
-            return False
+        # Compare all pairs of nodes using an explicit stack.
+        stack = [(self, other)]
 
-        else:
-            # Attributes are the same
-            child_list = [self.children, other.children]
+        while stack:
+            node, other_node = stack.pop()
 
-            if len(list(filter(lambda x: x is not None, child_list))) % 2 != 0:
-                # One contains children, the other doesn't.
+            # Get attributes of both nodes.
+            a_self, a_other = vars(node), vars(other_node)
+            self_no_kids = {k: v for k, v in a_self.items() if k not in taboo}
+            other_no_kids = {k: v for k, v in a_other.items() if
+                             k not in taboo}
+
+            # Compare attributes
+            if self_no_kids != other_no_kids:
+                # Attributes are not the same.
                 return False
 
-            elif self.children and len(self.children) != len(other.children):
+            elif node.children and \
+                    len(node.children) != len(other_node.children):
                 # Number of children differs between self and other.
                 return False
 
-            elif self.children:
-                # Compare children recursively.
-                for i, child in enumerate(self.children):
-                    same = child.__eq__(other.children[i], same)
+            # Compare children.
+            stack.extend(zip(node.children, other_node.children))
 
         return same
 
@@ -125,45 +146,131 @@ class Tree:
         :return: The array of all nodes that match the target.
         """
 
-        if self.root in target:
-            # Check if the current node matches the target.
+        # Traverse the tree in preorder using an explicit stack.
+        stack = [self]
+
+        while stack:
+            node = stack.pop()
 
-            # Add the current node to the array.
-            array.append(self)
+            if node.root in target:
+                # Check if the current node matches the target.
 
-        # Find all non-terminal children of the current node.
-        NT_kids = [kid for kid in self.children if kid.root in
-                   params['BNF_GRAMMAR'].non_terminals]
+                # Add the current node to the array.
+                array.append(node)
 
-        for child in NT_kids:
-            if NT_kids:
-                # Recursively call function on any non-terminal children.
-                array = child.get_target_nodes(array, target=target)
+            # Find all non-terminal children of the current node, and push
+            # them in reverse so the leftmost child is next.
+            stack.extend([kid for kid in reversed(node.children) if
+                          kid.root in params['BNF_GRAMMAR'].non_terminals])
 
         return array
 
+    def get_target_paths(self, target):
+        """
+        Returns the paths to all NT nodes which match the target NT list in
+        a given tree, in the same order as Tree.get_target_nodes. Each path
+        is a tuple of all nodes from the root of the tree down to the
+        matching node, where each node is given as a tuple of (the index of
+        the node in the children of its parent, the node). Paths are needed
+        for copy-on-write trees, where subtrees may be shared between
+        several trees (or appear several times in the same tree), and so
+        parent pointers and stored node depths cannot be relied upon.
+
+        :param target: The target nodes to match.
+        :return: The list of paths to all nodes that match the target.
+        """
+
+        # Initialise the list of matching paths.
+        paths = []
+
+        # Traverse the tree in preorder, keeping track of the ancestors of
+        # the current node. Each item on the stack is a node, its index in
+        # the children of its parent, and the length of the path to it.
+        stack, path = [(self, None, 1)], []
+
+        while stack:
+            node, index, length = stack.pop()
+
+            # Set the path to the current node.
+            del path[length - 1:]
+            path.append((index, node))
+
+            if node.root in target:
+                # Check if the current node matches the target.
+                paths.append(tuple(path))
+
+            # Find all non-terminal children of the current node, and push
+            # them in reverse so the leftmost child is next.
+            stack.extend([(kid, i, length + 1) for i, kid in
+                          reversed(list(enumerate(node.children))) if
+                          kid.root in params['BNF_GRAMMAR'].non_terminals])
+
+        return paths
+
+    def replace_path(self, path, subtree):
+        """
+        Copy-on-write replacement of a subtree. Returns a new tree in which
+        the last node in the given path is replaced by a given subtree.
+        Only the nodes along the path are copied; all other nodes are
+        shared with the original tree, which is left unchanged. Parent
+        pointers of shared nodes are not updated.
+
+        :param path: A path from the root of this tree to the node to be
+        replaced, as returned by Tree.get_target_paths.
+        :param subtree: The subtree to be placed at the end of the path.
+        :return: The root of the new tree.
+        """
+
+        new_node = subtree
+
+        for i in range(len(path) - 2, -1, -1):
+            # Copy each ancestor of the replaced node, from the bottom up.
+            old_node, index = path[i][1], path[i + 1][0]
+
+            node_copy = Tree(old_node.root, None)
+            node_copy.codon, node_copy.depth = old_node.codon, old_node.depth
+            node_copy.snippet = old_node.snippet
+
+            # Share all children except the one on the path.
+            node_copy.children = list(old_node.children)
+            node_copy.children[index] = new_node
+
+            if new_node is not subtree:
+                # The copied child is not shared.
+                new_node.parent = node_copy
+
+            new_node = node_copy
+
+        return new_node
+
     def get_node_labels(self, labels):
         """
-        Recurses through a tree and appends all node roots to a set.
+        Traverses a tree and appends all node roots to a set.
         
         :param labels: The set of roots of all nodes in the tree.
         :return: The set of roots of all nodes in the tree.
         """
 
-        # Add the current root to the set of all labels.
-        labels.add(self.root)
+        # Traverse the tree using an explicit stack.
+        stack = [self]
+
+        while stack:
+            node = stack.pop()
+
+            # Add the current root to the set of all labels.
+            labels.add(node.root)
 
-        for child in self.children:
-            # Recurse on all children.
-            labels = child.get_node_labels(labels)
+            stack.extend(node.children)
 
         return labels
 
     def get_tree_info(self, nt_keys, genome, output, invalid=False,
-                      max_depth=0, nodes=0):
+                      max_depth=0, nodes=0, depth=1):
         """
-        Recurses through a tree and returns all necessary information on a
-        tree required to generate an individual.
+        Traverses a tree and returns all necessary information on a tree
+        required to generate an individual. The tree is traversed in
+        preorder with an explicit stack rather than recursion, so there is
+        no limit on the depth of the tree.
         
         :param genome: The list of all codons in a subtree.
         :param output: The list of all terminal nodes in a subtree. This is
@@ -173,65 +280,72 @@ class Tree:
         :param nt_keys: The list of all non-terminals in the grammar.
         :param nodes: the number of nodes in a tree.
         :param max_depth: The maximum depth of any node in the tree.
+        :param depth: The depth of the current node. The depth is passed
+        down from the root rather than taken from parent nodes, so that
+        copy-on-write trees with shared subtrees are handled correctly.
         :return: genome, output, invalid, max_depth, nodes.
         """
 
-        # Increment number of nodes in tree and set current node id.
-        nodes += 1
+        # Each item on the stack is either a tuple of a node to be visited
+        # and its depth, or a childless node whose root is to be output.
+        stack = [(self, depth)]
 
-        if self.parent:
-            # If current node has a parent, increment current depth from
-            # parent depth.
-            self.depth = self.parent.depth + 1
+        while stack:
+            item = stack.pop()
 
-        else:
-            # Current node is tree root, set depth to 1.
-            self.depth = 1
+            if not isinstance(item, tuple):
+                # If the current child has no children it is a terminal.
+                # Append it to the phenotype output.
+                output.append(item.root)
 
-        if self.depth > max_depth:
-            # Set new max tree depth.
-            max_depth = self.depth
+                if item.root in nt_keys:
+                    # Current non-terminal node has no children; invalid tree.
+                    invalid = True
 
-        if self.codon:
-            # If the current node has a codon, append it to the genome.
-            genome.append(self.codon)
+                continue
 
-        # Find all non-terminal children of current node.
-        NT_children = [child for child in self.children if child.root in
-                       nt_keys]
+            node, node.depth = item
 
-        if not NT_children:
-            # The current node has only terminal children, increment number
-            # of tree nodes.
+            # Increment number of nodes in tree.
             nodes += 1
 
-            # Terminal children increase the current node depth by one.
-            # Check the recorded max_depth.
-            if self.depth + 1 > max_depth:
+            if node.depth > max_depth:
                 # Set new max tree depth.
-                max_depth = self.depth + 1
+                max_depth = node.depth
 
-        if self.root in nt_keys and not self.children:
-            # Current NT has no children. Invalid tree.
-            invalid = True
+            if node.codon:
+                # If the current node has a codon, append it to the genome.
+                genome.append(node.codon)
 
-        for child in self.children:
-            # Recurse on all children.
+            # Find all non-terminal children of current node.
+            NT_children = [child for child in node.children if child.root in
+                           nt_keys]
 
-            if not child.children:
-                # If the current child has no children it is a terminal.
-                # Append it to the phenotype output.
-                output.append(child.root)
+            if not NT_children:
+                # The current node has only terminal children, increment
+                # number of tree nodes.
+                nodes += 1
 
-                if child.root in nt_keys:
-                    # Current non-terminal node has no children; invalid tree.
-                    invalid = True
+                # Terminal children increase the current node depth by one.
+                # Check the recorded max_depth.
+                if node.depth + 1 > max_depth:
+                    # Set new max tree depth.
+                    max_depth = node.depth + 1
+
+            if node.root in nt_keys and not node.children:
+                # Current NT has no children. Invalid tree.
+                invalid = True
 
-            else:
-                # The current child has children, recurse.
-                genome, output, invalid, max_depth, nodes = \
-                    child.get_tree_info(nt_keys, genome, output, invalid,
-                                        max_depth, nodes)
+            for child in reversed(node.children):
+                # Push all children in reverse so the leftmost child is next.
+
+                if not child.children:
+                    # The child is output when it is popped.
+                    stack.append(child)
+
+                else:
+                    # The child has children, visit it.
+                    stack.append((child, node.depth + 1))
 
         return genome, output, invalid, max_depth, nodes
 
@@ -242,12 +356,19 @@ class Tree:
         :return: Nothing.
         """
 
-        print(self.depth, "".join([" " for _ in range(self.depth)]), self.root)
+        # Traverse the tree in preorder using an explicit stack of nodes and
+        # the depths at which they are printed.
+        stack = [(self, self.depth)]
+
+        while stack:
+            node, depth = stack.pop()
+
+            print(depth, "".join([" " for _ in range(depth)]), node.root)
+
+            for child in reversed(node.children):
+                if not child.children:
+                    # Terminals are printed one level below their parent.
+                    stack.append((child, depth + 1))
 
-        for child in self.children:
-            if not child.children:
-                print(self.depth + 1,
-                      "".join([" " for _ in range(self.depth + 1)]),
-                      child.root)
-            else:
-                child.print_tree()
+                else:
+                    stack.append((child, child.depth))
@@ -5,6 +5,15 @@ import sys
 from queue import Empty
 from types import ModuleType
 
+# Requests are read from stdin as JSON, one per line, and one JSON response
+# is written to stdout for each request, except for definitions:
+#   {'script': ..., 'timeout': ..., 'variables': [...]} runs a whole script,
+#   {'define': id, 'data': ..., 'header': ..., 'footer': ...} defines a
+#       context: a dataset script, which is compiled once, and the code
+#       around the program,
+#   {'context': id, 'code': ..., 'timeout': ..., 'variables': [...]} runs
+#       the dataset of a context, then its header, code and footer.
+
 logging.basicConfig(filename='python_log.txt',
                     format='%(asctime)s:%(process)d:%(thread)d:%(message)s',
                     level=logging.INFO)  # set to DEBUG for debug info ;)
@@ -28,13 +37,26 @@ class Worker(mp.Process):
         except ValueError:
             pass # In MacOS Catalina and newer, setting the stack results in a ValueError.
         # END LINUX:
+        # compiled datasets and embed code of each defined context, so that
+        # requests only need to carry the code of the program
+        contexts = {}
         while True:
             exception = None
             self.stop.value = False
             script = self.consume.get()
+            if isinstance(script, dict) and 'define' in script:
+                contexts[script['define']] = (
+                    compile(script['data'], '<data>', 'exec'),
+                    script['header'], script['footer'])
+                continue
             if script:
                 help_globals = {'stop': self.stop}
                 try:
+                    if isinstance(script, dict):
+                        # run the dataset of the context, then the program
+                        data, header, footer = contexts[script['context']]
+                        exec(data, help_globals)
+                        script = header + script['code'] + footer
                     exec(script, help_globals)
                 except BaseException as e:
                     exc_type, exc_obj, exc_tb = sys.exc_info()
@@ -63,6 +85,9 @@ if __name__ == '__main__':
     produce = mp.Queue()
     p = Worker(consume, produce)
     p.start()
+    # definitions of contexts (a dataset and the code around the program),
+    # which are sent to every new worker
+    definitions = {}
     while True:
         try:
             message = input()
@@ -86,7 +111,15 @@ if __name__ == '__main__':
             logging.debug(message)
             print(json.dumps({'exception': exception}), flush=True)
             continue
-        consume.put(message_dict['script'])
+        if 'define' in message_dict:
+            # no response is sent to definitions
+            definitions[message_dict['define']] = message_dict
+            consume.put(message_dict)
+            continue
+        elif 'context' in message_dict:
+            consume.put(message_dict)
+        else:
+            consume.put(message_dict['script'])
         try:
             results = produce.get(block=True, timeout=message_dict['timeout'])
         except Empty:
@@ -105,6 +138,8 @@ if __name__ == '__main__':
                 produce = mp.Queue()
                 p = Worker(consume, produce)
                 p.start()
+                for definition in definitions.values():
+                    consume.put(definition)
                 logging.debug('terminated worker')
                 # END:
             print(json.dumps({'exception': 'Timeout occurred.'}), flush=True)
@@ -6,6 +6,7 @@ import numpy as np
 from algorithm.parameters import params
 from utilities.algorithm.NSGA2 import compute_pareto_metrics
 from utilities.algorithm.state import create_state
+from utilities.fitness import code_cache, persistent_cache, semantic_cache
 from utilities.stats import trackers
 from utilities.stats.file_io import save_best_ind_to_file, \
     save_first_front_to_file, save_stats_headers, save_stats_to_file
@@ -19,6 +20,8 @@ stats = {
     "regens": 0,
     "invalids": 0,
     "runtime_error": 0,
+    "truncated": 0,
+    "rejected_regexes": 0,
     "unique_inds": len(trackers.cache),
     "unused_search": 0,
     "ave_genome_length": 0,
@@ -88,6 +91,16 @@ def get_soo_stats(individuals, end):
     # Get best individual.
     best = max(individuals)
 
+    fitness_function = params['FITNESS_FUNCTION']
+
+    if params['TRAINING_SAMPLE_SIZE'] and \
+            getattr(fitness_function, 'sample_seed', None) is not None:
+        # The population was evaluated on a sample of the training data, so
+        # its fitnesses cannot be compared with those of other generations.
+        # Evaluate a copy of the best individual on all training data.
+        best = copy(best)
+        best.fitness = fitness_function(best, dist='full')
+
     if not trackers.best_ever or best > trackers.best_ever:
         # Save best individual in trackers.best_ever.
         trackers.best_ever = best
@@ -297,9 +310,27 @@ def update_stats(individuals, end):
     stats['total_inds'] = params['POPULATION_SIZE'] * (stats['gen'] + 1)
     stats['runtime_error'] = len(trackers.runtime_error_cache)
     if params['CACHE']:
-        stats['unique_inds'] = len(trackers.cache)
+        # Evicted phenotypes are still counted as unique individuals.
+        stats['unique_inds'] = trackers.cache.count_distinct()
         stats['unused_search'] = 100 - stats['unique_inds'] / \
                                  stats['total_inds'] * 100
+    if params['CACHE'] and trackers.cache.is_bounded():
+        stats['cache_size'] = len(trackers.cache)
+        stats['cache_evictions'] = trackers.cache.evictions
+    if params['CODE_CACHE_SIZE']:
+        stats['code_cache_hits'] = code_cache.hits
+        stats['code_cache_misses'] = code_cache.misses
+    if params['SEMANTIC_CACHE_SIZE']:
+        stats['semantic_cache_hits'] = semantic_cache.hits
+        stats['semantic_cache_misses'] = semantic_cache.misses
+    if params['PERSISTENT_CACHE']:
+        stats['persistent_cache_hits'] = persistent_cache.hits
+    if params['TRAINING_SAMPLE_SIZE']:
+        # Record the sample of the training data used in this generation.
+        sample_exp = params['FITNESS_FUNCTION'].get_training_sample()[1]
+        stats['training_sample_size'] = len(sample_exp)
+        stats['training_sample_seed'] = \
+            params['FITNESS_FUNCTION'].sample_seed
 
     # Genome Stats
     genome_lengths = [len(i.genome) for i in individuals]
@@ -327,7 +358,8 @@ def update_stats(individuals, end):
 
     if not hasattr(params['FITNESS_FUNCTION'], 'multi_objective'):
         # Fitness Stats
-        fitnesses = [i.fitness for i in individuals]
+        # Truncated individuals only have a lower bound on their fitness.
+        fitnesses = [i.fitness for i in individuals if not i.truncated]
         stats['ave_fitness'] = np.nanmean(fitnesses, axis=0)
         stats['best_fitness'] = trackers.best_ever.fitness
 
@@ -188,6 +188,109 @@ def parse_cmd_args(arguments):
                         help='Sets the maximum number of times the genome '
                              'mapping process can wrap over the length of the '
                              'genome. Requires int value.')
+    parser.add_argument('--compiled_grammar',
+                        dest='COMPILED_GRAMMAR',
+                        action='store_true',
+                        default=None,
+                        help='Uses integer-indexed compiled grammar tables '
+                             'for faster genome mapping. Only used with '
+                             'linear genome operators.')
+    parser.add_argument('--batch_mapping',
+                        dest='BATCH_MAPPING',
+                        action='store_true',
+                        default=None,
+                        help='Maps all individuals generated by linear '
+                             'crossover and mutation together in a single '
+                             'batch.')
+    parser.add_argument('--mapping_checkpoints',
+                        dest='MAPPING_CHECKPOINTS',
+                        type=int,
+                        help='Sets the interval (in codons) at which the '
+                             'mapping state is checkpointed, so that the '
+                             'children of linear crossover and mutation can '
+                             'resume mapping from their parent\'s '
+                             'checkpoints. Only used with linear genome '
+                             'operators.')
+    parser.add_argument('--flat_trees',
+                        dest='FLAT_TREES',
+                        action='store_true',
+                        default=None,
+                        help='Stores derivation trees as array-backed flat '
+                             'trees rather than linked node objects. Only '
+                             'used with subtree operators.')
+    parser.add_argument('--copy_on_write_trees',
+                        dest='COPY_ON_WRITE_TREES',
+                        action='store_true',
+                        default=None,
+                        help='Shares derivation trees between copies of '
+                             'individuals, and only copies the path to the '
+                             'modified node during subtree crossover and '
+                             'mutation. Only used with subtree operators.')
+    parser.add_argument('--stack_evaluation',
+                        dest='STACK_EVALUATION',
+                        action='store_true',
+                        default=None,
+                        help='Evaluates supervised learning phenotypes with '
+                             'an explicit stack rather than with eval(), so '
+                             'that very deep trees can be evaluated.')
+    parser.add_argument('--dag_evaluation',
+                        dest='DAG_EVALUATION',
+                        action='store_true',
+                        default=None,
+                        help='Evaluates all individuals in a generation '
+                             'together as a single expression DAG, so that '
+                             'each distinct subexpression is only computed '
+                             'once. Only used with supervised learning '
+                             'problems.')
+    parser.add_argument('--semantic_cache_size',
+                        dest='SEMANTIC_CACHE_SIZE',
+                        type=float,
+                        help='Caches the outputs of subexpressions across '
+                             'generations, up to the given total size in '
+                             'megabytes. Implies --dag_evaluation. Only '
+                             'used with supervised learning problems.')
+    parser.add_argument('--training_sample_size',
+                        dest='TRAINING_SAMPLE_SIZE',
+                        type=float,
+                        help='Evaluates each generation on a sample of the '
+                             'training data. Values below 1 are a fraction '
+                             'of the training data, other values are a '
+                             'number of rows. Only used with supervised '
+                             'learning problems.')
+    parser.add_argument('--training_sample_method',
+                        dest='TRAINING_SAMPLE_METHOD',
+                        type=str,
+                        help='Sets the method used to sample the training '
+                             'data, either "random" or "stratified".')
+    parser.add_argument('--full_evaluation_interval',
+                        dest='FULL_EVALUATION_INTERVAL',
+                        type=int,
+                        help='Evaluates every n-th generation on all '
+                             'training data when --training_sample_size is '
+                             'specified. Requires int value.')
+    parser.add_argument('--racing_quantile',
+                        dest='RACING_QUANTILE',
+                        action=FloatAction,
+                        help='Stops evaluating new individuals once they '
+                             'cannot reach the fitness of the individual at '
+                             'this quantile of the current population, '
+                             'ranked from best to worst. Requires float '
+                             'value between 0 and 1. Only used with '
+                             'supervised learning problems.')
+    parser.add_argument('--racing_chunk_size',
+                        dest='RACING_CHUNK_SIZE',
+                        type=int,
+                        help='Sets the number of rows of training data '
+                             'evaluated between checks of the racing bound. '
+                             'Requires int value.')
+    parser.add_argument('--streaming_chunk_size',
+                        dest='STREAMING_CHUNK_SIZE',
+                        type=int,
+                        help='Evaluates phenotypes on chunks of the given '
+                             'number of rows of data at a time, so that '
+                             'datasets larger than memory can be used with '
+                             '--dataset_cache_dir. Requires int value. Only '
+                             'used with supervised learning problems.')
     parser.add_argument('--permutation_ramps',
                         dest='PERMUTATION_RAMPS',
                         type=int,
@@ -325,6 +428,13 @@ def parse_cmd_args(arguments):
                         help='For use with problems that use a dataset. '
                              'Specifies the delimiter for the dataset. '
                              'Requires string such as "\\t".')
+    parser.add_argument('--dataset_cache_dir',
+                        dest='DATASET_CACHE_DIR',
+                        type=str,
+                        help='For use with problems that use a dataset. '
+                             'Caches parsed datasets as binary files in the '
+                             'given directory, e.g. "../datasets/cache", so '
+                             'that later runs load them without parsing.')
     parser.add_argument('--target',
                         dest='TARGET',
                         type=str,
@@ -354,6 +464,66 @@ def parse_cmd_args(arguments):
                         type=int,
                         help='Specify the number of cores to be used for '
                              'multi-core evaluation. Requires int.')
+    parser.add_argument('--multicore_chunk_size',
+                        dest='MULTICORE_CHUNK_SIZE',
+                        type=int,
+                        help='Specify the number of individuals sent to a '
+                             'worker at once for multi-core evaluation. '
+                             'Requires int.')
+    parser.add_argument('--shared_memory_data',
+                        dest='SHARED_MEMORY_DATA',
+                        action='store_true',
+                        default=None,
+                        help='Keeps the training and test datasets in shared '
+                             'memory for use by all multi-core workers.')
+    parser.add_argument('--progsys_evaluators',
+                        dest='PROGSYS_EVALUATORS',
+                        type=int,
+                        help='Sets the number of evaluation processes used '
+                             'to evaluate progsys programs concurrently. '
+                             'Requires int value.')
+    parser.add_argument('--regex_workers',
+                        dest='REGEX_WORKERS',
+                        type=int,
+                        help='Sets the number of worker processes used to '
+                             'evaluate regexes concurrently with the '
+                             'RegexEval fitness function. Requires int '
+                             'value.')
+    parser.add_argument('--regex_timeout',
+                        dest='REGEX_TIMEOUT',
+                        type=float,
+                        help='Sets the time limit in seconds for the '
+                             'evaluation of each regex with the RegexEval '
+                             'fitness function. Requires float value.')
+    parser.add_argument('--regex_cost',
+                        dest='REGEX_COST',
+                        type=str,
+                        help='Sets the cost of regexes with the RegexEval '
+                             'fitness function, either "time" for the '
+                             'time taken to run them, or "steps" for the '
+                             'number of steps taken to match them, which is '
+                             'deterministic. Requires string value.')
+    parser.add_argument('--regex_step_cost',
+                        dest='REGEX_STEP_COST',
+                        type=float,
+                        help='Sets the cost of each matching step when '
+                             'regexes are costed in steps with the '
+                             'RegexEval fitness function. Requires float '
+                             'value.')
+    parser.add_argument('--regex_backtracking_check',
+                        dest='REGEX_BACKTRACKING_CHECK',
+                        action='store_true',
+                        default=None,
+                        help='Gives regexes with catastrophic backtracking '
+                             'the default fitness without running them '
+                             'with the RegexEval fitness function.')
+    parser.add_argument('--regex_test_cache_dir',
+                        dest='REGEX_TEST_CACHE_DIR',
+                        type=str,
+                        help='Saves the test suites generated from seed '
+                             'regexes by the RegexEval fitness function in '
+                             'the given directory, so that later runs load '
+                             'them without generating them.')
 
     # REPLACEMENT
     parser.add_argument('--replacement',
@@ -555,6 +725,44 @@ def parse_cmd_args(arguments):
                                MUTATE_DUPLICATES=True,
                                help='Replaces duplicate individuals with '
                                     'mutated versions. Uses cache.')
+    parser.add_argument('--cache_size',
+                        dest='CACHE_SIZE',
+                        type=int,
+                        help='Bounds the number of phenotypes in the cache, '
+                             'requires int value.')
+    parser.add_argument('--cache_memory',
+                        dest='CACHE_MEMORY',
+                        type=float,
+                        help='Bounds the approximate memory use of the '
+                             'cache in megabytes, requires float value.')
+    parser.add_argument('--cache_eviction',
+                        dest='CACHE_EVICTION',
+                        type=str,
+                        help='Sets the eviction policy of a bounded cache: '
+                             'lru, lfu or age.')
+    parser.add_argument('--runtime_error_sample_size',
+                        dest='RUNTIME_ERROR_SAMPLE_SIZE',
+                        type=int,
+                        help='Sets the number of phenotypes which produced '
+                             'runtime errors to keep as a sample, requires '
+                             'int value.')
+    parser.add_argument('--phenotype_keys',
+                        dest='PHENOTYPE_KEYS',
+                        type=str,
+                        help='Sets the keys used for phenotypes in the '
+                             'cache: phenotype, digest or verified_digest.')
+    parser.add_argument('--code_cache_size',
+                        dest='CODE_CACHE_SIZE',
+                        type=int,
+                        help='Caches compiled phenotype code for up to the '
+                             'given number of phenotypes, requires int '
+                             'value.')
+    parser.add_argument('--persistent_cache',
+                        dest='PERSISTENT_CACHE',
+                        type=str,
+                        help='Stores fitnesses in the given SQLite file so '
+                             'that they can be reused by later or concurrent '
+                             'runs, requires string specifying a file path.')
 
     # Parse command line arguments using all above information.
     args, unknown = parser.parse_known_args(arguments)
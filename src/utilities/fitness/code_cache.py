@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+from algorithm.parameters import params
+
+"""Cache of compiled phenotype code, shared by all fitness functions which
+evaluate phenotype strings. Compiled code objects cannot be pickled, so the
+cache is kept here rather than in utilities.stats.trackers (which is saved
+with the state of a run)."""
+
+cache = OrderedDict()
+# This dict stores compiled code in least recently used order. The key for
+# each entry is a tuple of the compilation mode and the source string, the
+# value is the compiled code.
+
+hits = 0
+# The number of lookups of code which was already in the cache.
+
+misses = 0
+# The number of lookups of code which had to be compiled.
+
+
+def get_code(key, build):
+    """
+    Look up compiled code in the cache. If the code is not in the cache it is
+    built and added to the cache, and the least recently used code is
+    evicted if the cache is full. Nothing is cached if
+    params['CODE_CACHE_SIZE'] is not set.
+
+    :param key: A tuple of the compilation mode and the source string.
+    :param build: A function with no arguments which builds the compiled
+    code.
+    :return: The compiled code.
+    """
+
+    global hits, misses
+
+    if not params['CODE_CACHE_SIZE']:
+        # The cache is switched off.
+        return build()
+
+    if key in cache:
+        # Mark the code as most recently used.
+        hits += 1
+        cache.move_to_end(key)
+        return cache[key]
+
+    # Build the code. Errors (e.g. syntax errors) are raised before anything
+    # is cached.
+    misses += 1
+    code = cache[key] = build()
+
+    if len(cache) > params['CODE_CACHE_SIZE']:
+        # Evict the least recently used code.
+        cache.popitem(last=False)
+
+    return code
+
+
+def compile_cached(source, mode="eval"):
+    """
+    Compile a phenotype string into a code object which can be passed to
+    eval() or exec() in place of the string itself.
+
+    :param source: The source string, e.g. a phenotype.
+    :param mode: The compilation mode, "eval" or "exec".
+    :return: A code object.
+    """
+
+    return get_code((mode, source),
+                    lambda: compile(source, "<string>", mode))
@@ -0,0 +1,169 @@
+import warnings
+from hashlib import blake2b
+from itertools import islice
+from os import getpid, makedirs, path, remove, replace
+from shutil import copyfileobj
+
+import numpy as np
+from algorithm.parameters import params
+
+"""Binary cache of parsed datasets. Parsing large text datasets with
+np.genfromtxt takes much longer than the rest of the start of a run, and is
+repeated by every run which uses the same dataset. If
+params['DATASET_CACHE_DIR'] is specified, each dataset is parsed once and
+saved in that directory as a .npy file, which later runs memory-map rather
+than parse. Cache files are named by a digest of the contents of the
+dataset file and of the parsing options, so a cache file is never used once
+its dataset has changed; the dataset is simply parsed and cached again.
+Datasets are parsed into the cache a chunk of lines at a time, so datasets
+larger than memory can be cached and then evaluated out of core (see
+params['STREAMING_CHUNK_SIZE'])."""
+
+# The version of the cache file format. Change this whenever datasets are
+# parsed differently, so that existing cache files are no longer used.
+CACHE_VERSION = 1
+
+# The number of bytes of a dataset file read at a time when computing its
+# digest.
+BLOCK_SIZE = 1024 * 1024
+
+# The number of lines of a dataset file parsed at a time when it is cached.
+PARSE_CHUNK_LINES = 100000
+
+
+def get_cache_file(filename, delimiter, skip_header):
+    """
+    Returns the path of the cache file of a dataset. The name of the cache
+    file contains a digest of the contents of the dataset file and of the
+    options with which it is parsed.
+
+    :param filename: The file name of the dataset.
+    :param delimiter: The delimiter of the dataset.
+    :param skip_header: The number of header lines to skip.
+    :return: The path of the cache file.
+    """
+
+    digest = blake2b(digest_size=16)
+    digest.update(repr((CACHE_VERSION, delimiter, skip_header)).encode())
+
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+
+    name = path.splitext(path.basename(filename))[0]
+
+    return path.join(params['DATASET_CACHE_DIR'],
+                     "%s.%s.npy" % (name, digest.hexdigest()))
+
+
+def load_dataset(filename, delimiter, skip_header):
+    """
+    Returns the parsed contents of a dataset file. If
+    params['DATASET_CACHE_DIR'] is specified, the dataset is loaded from its
+    cache file as a read-only memory-mapped array, and is parsed and saved
+    to the cache first if it has not been cached yet. Otherwise the dataset
+    is parsed as normal.
+
+    :param filename: The file name of the dataset.
+    :param delimiter: The delimiter of the dataset.
+    :param skip_header: The number of header lines to skip.
+    :return: A numpy array of the contents of the dataset.
+    """
+
+    if not params['DATASET_CACHE_DIR']:
+        # Parse the dataset.
+        return np.genfromtxt(filename, skip_header=skip_header,
+                             delimiter=delimiter)
+
+    cache_file = get_cache_file(filename, delimiter, skip_header)
+
+    if path.isfile(cache_file):
+        try:
+            # Load the cached dataset.
+            return np.load(cache_file, mmap_mode="r")
+
+        except (OSError, ValueError):
+            # The cache file is damaged. Parse the dataset again.
+            pass
+
+    # Write the cache file under a temporary name first, so that other runs
+    # never load a partly written cache file.
+    makedirs(params['DATASET_CACHE_DIR'], exist_ok=True)
+    temp_file = "%s.%d.tmp" % (cache_file, getpid())
+    raw_file = "%s.%d.raw" % (cache_file, getpid())
+
+    try:
+        with open(raw_file, "wb") as raw:
+            # Parse the dataset into a file of raw values.
+            shape = parse_dataset(filename, delimiter, skip_header, raw)
+
+        with open(temp_file, "wb") as f, open(raw_file, "rb") as raw:
+            # Add the header of the .npy format to the raw values.
+            np.lib.format.write_array_header_1_0(
+                f, {'descr': np.lib.format.dtype_to_descr(np.dtype(float)),
+                    'fortran_order': False, 'shape': shape})
+            copyfileobj(raw, f, BLOCK_SIZE)
+
+        replace(temp_file, cache_file)
+
+    except OSError:
+        # The cache could not be written. Parse the dataset as normal.
+        return np.genfromtxt(filename, skip_header=skip_header,
+                             delimiter=delimiter)
+
+    finally:
+        for file in [raw_file, temp_file]:
+            if path.isfile(file):
+                remove(file)
+
+    return np.load(cache_file, mmap_mode="r")
+
+
+def parse_dataset(filename, delimiter, skip_header, out):
+    """
+    Parse a dataset file a chunk of PARSE_CHUNK_LINES lines at a time, and
+    write the parsed values to a binary file, so that the whole dataset is
+    never held in memory. The values and shape are the same as those given
+    by np.genfromtxt for the whole file.
+
+    :param filename: The file name of the dataset.
+    :param delimiter: The delimiter of the dataset.
+    :param skip_header: The number of header lines to skip.
+    :param out: A binary file to which the values are written, row by row.
+    :return: The shape of the parsed dataset.
+    """
+
+    rows, columns = 0, None
+
+    with open(filename) as f:
+        lines = islice(f, skip_header, None)
+
+        while True:
+            chunk = list(islice(lines, PARSE_CHUNK_LINES))
+
+            if not chunk:
+                break
+
+            with warnings.catch_warnings():
+                # Chunks which only hold comments or blank lines are empty.
+                warnings.simplefilter("ignore")
+                data = np.genfromtxt(chunk, delimiter=delimiter, ndmin=2)
+
+            if not data.size:
+                continue
+
+            elif columns is None:
+                columns = data.shape[1]
+
+            elif data.shape[1] != columns:
+                s = "utilities.fitness.dataset_cache.parse_dataset\n" \
+                    "Error: rows of dataset %s have different numbers of " \
+                    "columns (%d and %d)." % (filename, columns,
+                                              data.shape[1])
+                raise Exception(s)
+
+            data.astype(float).tofile(out)
+            rows += len(data)
+
+    # Like np.genfromtxt, return a single row or column as a 1D array.
+    return tuple(size for size in (rows, columns or 0) if size != 1)
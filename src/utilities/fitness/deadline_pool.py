@@ -0,0 +1,182 @@
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+from time import monotonic
+
+"""A pool of long-lived worker processes which run tasks with a deadline.
+Each worker is sent one task at a time. A worker which does not finish its
+task before the deadline is killed and replaced by a new worker, while the
+other workers carry on; workers are otherwise reused for as many tasks as
+needed, so that no process has to be started for each task."""
+
+
+class DeadlinePool(object):
+    """
+    A pool of worker processes which each run a function on one task at a
+    time, with a time limit for each task.
+    """
+
+    def __init__(self, function, size, timeout, initializer=None,
+                 initargs=()):
+        """
+        Start a pool of workers.
+
+        :param function: The function run on each task. Must be picklable.
+        :param size: The number of workers.
+        :param timeout: The time limit for each task, in seconds.
+        :param initializer: An optional function which is called by each
+        worker when it starts. Must be picklable.
+        :param initargs: The arguments of the initializer.
+        """
+
+        self.function = function
+        self.timeout = timeout
+        self.initializer = initializer
+        self.initargs = initargs
+
+        # The process and the connection to it of each worker.
+        self.workers = [self.start_worker() for _ in range(size)]
+
+        # The number of workers replaced after missing a deadline.
+        self.timeouts = 0
+
+    def start_worker(self):
+        """
+        Start a new worker process.
+
+        :return: A tuple of the process and the connection to it.
+        """
+
+        connection, worker_connection = Pipe()
+
+        process = Process(target=run_worker,
+                          args=(worker_connection, self.function,
+                                self.initializer, self.initargs),
+                          daemon=True)
+        process.start()
+
+        # The worker's end of the pipe belongs to the worker.
+        worker_connection.close()
+
+        return process, connection
+
+    def replace_worker(self, worker):
+        """
+        Kill a worker and start a new one in its place.
+
+        :param worker: The process of the worker and the connection to it.
+        :return: The new worker.
+        """
+
+        process, connection = worker
+        process.terminate()
+        process.join()
+        connection.close()
+
+        new_worker = self.start_worker()
+        self.workers[self.workers.index(worker)] = new_worker
+
+        return new_worker
+
+    def map(self, tasks):
+        """
+        Run the function on a list of tasks, keeping all workers busy.
+
+        :param tasks: A list of picklable tasks.
+        :return: A list of tuples of (finished, result) for each task, in
+        order. Tasks which missed their deadline, or whose worker died, are
+        not finished and have a result of None.
+        """
+
+        results = [(False, None)] * len(tasks)
+        waiting = list(range(len(tasks)))[::-1]
+        idle = list(self.workers)
+
+        # The index of the task of each busy worker and its deadline, by the
+        # connection to the worker.
+        busy = {}
+
+        while waiting or busy:
+
+            while waiting and idle:
+                # Give each idle worker a task.
+                worker = idle.pop()
+                i = waiting.pop()
+                worker[1].send(tasks[i])
+                busy[worker[1]] = (worker, i, monotonic() + self.timeout)
+
+            # Wait for a worker to finish, or for the earliest deadline.
+            earliest = min(deadline for _, _, deadline in busy.values())
+            ready = wait(list(busy), max(0, earliest - monotonic()))
+
+            for connection in ready:
+                worker, i, _ = busy.pop(connection)
+
+                try:
+                    results[i] = (True, connection.recv())
+                    idle.append(worker)
+
+                except (EOFError, OSError):
+                    # The worker died.
+                    idle.append(self.replace_worker(worker))
+
+            now = monotonic()
+
+            for connection, (worker, i, deadline) in list(busy.items()):
+                if now >= deadline:
+                    # The worker missed its deadline.
+                    del busy[connection]
+                    self.timeouts += 1
+                    idle.append(self.replace_worker(worker))
+
+        return results
+
+    def close(self):
+        """
+        Stop all workers of the pool.
+
+        :return: Nothing.
+        """
+
+        for process, connection in self.workers:
+            try:
+                connection.send(None)
+
+            except OSError:
+                # The worker has already exited.
+                pass
+
+            process.join(1)
+
+            if process.is_alive():
+                process.terminate()
+
+            connection.close()
+
+
+def run_worker(connection, function, initializer, initargs):
+    """
+    The main loop of a worker process: runs the function on each task
+    received, and sends back the result, until it receives None.
+
+    :param connection: The connection to the parent process.
+    :param function: The function run on each task.
+    :param initializer: An optional function called when the worker starts.
+    :param initargs: The arguments of the initializer.
+    :return: Nothing.
+    """
+
+    if initializer is not None:
+        initializer(*initargs)
+
+    while True:
+        try:
+            task = connection.recv()
+
+        except EOFError:
+            # The parent process has exited.
+            break
+
+        if task is None:
+            break
+
+        connection.send(function(task))
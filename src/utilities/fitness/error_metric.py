@@ -3,6 +3,14 @@ import warnings
 import numpy as np
 from sklearn.metrics import f1_score as sklearn_f1_score
 
+"""Error metrics for supervised learning. Metrics which are computed from
+the sum of non-negative errors of individual fitness cases can also be
+computed incrementally, a chunk of cases at a time, for streaming and racing
+evaluation. Such metrics have two extra attributes:
+    case_errors(y, yhat): the errors of the given cases, to be summed,
+    from_total(total, n): the metric, given the sum of the errors of all n
+        cases (or a lower bound on the metric, given a partial sum)."""
+
 
 def mae(y, yhat):
     """
@@ -19,6 +27,10 @@ def mae(y, yhat):
 # Set maximise attribute for mae error metric.
 mae.maximise = False
 
+# Set attributes for racing evaluation of mae error metric.
+mae.case_errors = lambda y, yhat: np.abs(y - yhat)
+mae.from_total = lambda total, n: total / n
+
 
 def rmse(y, yhat):
     """
@@ -35,6 +47,10 @@ def rmse(y, yhat):
 # Set maximise attribute for rmse error metric.
 rmse.maximise = False
 
+# Set attributes for racing evaluation of rmse error metric.
+rmse.case_errors = lambda y, yhat: np.square(y - yhat)
+rmse.from_total = lambda total, n: np.sqrt(total / n)
+
 
 def mse(y, yhat):
     """
@@ -51,6 +67,10 @@ def mse(y, yhat):
 # Set maximise attribute for mse error metric.
 mse.maximise = False
 
+# Set attributes for racing evaluation of mse error metric.
+mse.case_errors = lambda y, yhat: np.square(y - yhat)
+mse.from_total = lambda total, n: total / n
+
 
 def hinge(y, yhat):
     """
@@ -65,9 +85,10 @@ def hinge(y, yhat):
 
     # Deal with possibility of {-1, 1} or {0, 1} class label convention
     y_vals = set(y)
-    # convert from {0, 1} to {-1, 1}
+    # convert from {0, 1} to {-1, 1}. The dataset itself is not changed,
+    # as it may be read-only (e.g. memory-mapped or in shared memory).
     if 0 in y_vals:
-        y[y == 0] = -1
+        y = np.where(y == 0, -1, y)
 
     # Our definition of hinge loss cannot be used for multi-class
     assert len(y_vals) == 2
@@ -104,9 +125,10 @@ def f1_score(y, yhat):
     # convention elsewhere and/or create user parameter to control it?
     # See https://github.com/PonyGE/PonyGE2/issues/113.
     y_vals = set(y)
-    # convert from {-1, 1} to {0, 1}
+    # convert from {-1, 1} to {0, 1}. The dataset itself is not changed,
+    # as it may be read-only (e.g. memory-mapped or in shared memory).
     if -1 in y_vals:
-        y[y == -1] = 0
+        y = np.where(y == -1, 0, y)
 
     # We binarize with a threshold, so this cannot be used for multi-class
     assert len(y_vals) == 2
@@ -137,3 +159,7 @@ def Hamming_error(y, yhat):
 
 
 Hamming_error.maximise = False
+
+# Set attributes for racing evaluation of Hamming error metric.
+Hamming_error.case_errors = lambda y, yhat: y != yhat
+Hamming_error.from_total = lambda total, n: total
@@ -0,0 +1,283 @@
+import json
+from collections import deque
+from queue import Empty, Queue
+from subprocess import PIPE, Popen, TimeoutExpired
+from threading import Thread
+
+"""A pool of evaluator subprocesses which each read JSON requests from
+stdin and write one JSON response per request to stdout, one per line (e.g.
+scripts/python_script_evaluation.py). Requests are shared out between the
+evaluators by one dispatcher thread per evaluator, which keeps several
+requests in flight on its evaluator at once so that the evaluator never
+waits for the next request. Evaluators which crash or whose output cannot
+be parsed are restarted, and their unanswered requests are sent again.
+Setup requests (e.g. definitions of datasets), which have no response, are
+sent to every evaluator when it is started."""
+
+# The number of times a request is sent again after its evaluator crashed
+# before it is given up on, and the number of times an evaluator which
+# fails to restart is tried again.
+MAX_RETRIES = 2
+
+# The response given to requests which could not be evaluated because their
+# evaluator crashed.
+CRASHED = {'exception': 'Evaluator crashed.'}
+
+
+class Evaluator(object):
+    """
+    A single evaluator subprocess.
+    """
+
+    def __init__(self, command, setup=None):
+        """
+        Start an evaluator subprocess.
+
+        :param command: The command which starts the evaluator, as a list.
+        :param setup: An optional list of requests without responses which
+        are sent to the evaluator whenever it is started.
+        """
+
+        self.command = command
+        self.setup = setup or []
+        self.start()
+
+    def start(self):
+        """
+        Start the evaluator subprocess and send it the setup requests.
+
+        :return: Nothing.
+        """
+
+        self.process = Popen(self.command, stdin=PIPE, stdout=PIPE)
+
+        for request in self.setup:
+            self.send(request)
+
+    def send(self, request):
+        """
+        Send a request to the evaluator.
+
+        :param request: A JSON-serialisable request.
+        :return: Nothing.
+        """
+
+        self.process.stdin.write((json.dumps(request) + '\n').encode())
+        self.process.stdin.flush()
+
+    def receive(self):
+        """
+        Read the response to the oldest unanswered request.
+
+        :return: The response, parsed from JSON.
+        """
+
+        line = self.process.stdout.readline()
+
+        if not line:
+            # The evaluator has exited.
+            raise EOFError("Evaluator exited.")
+
+        return json.loads(line.decode())
+
+    def close(self, timeout=5):
+        """
+        Stop the evaluator. It is asked to exit by closing its stdin, and is
+        killed if it has not exited within the timeout.
+
+        :param timeout: The number of seconds to wait for the evaluator.
+        :return: Nothing.
+        """
+
+        try:
+            self.process.stdin.close()
+
+        except OSError:
+            # The evaluator has already exited.
+            pass
+
+        try:
+            self.process.wait(timeout)
+
+        except TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+        self.process.stdout.close()
+
+    def restart(self):
+        """
+        Stop the evaluator and start a new one in its place.
+
+        :return: Nothing.
+        """
+
+        self.close(timeout=1)
+        self.start()
+
+
+class EvaluatorPool(object):
+    """
+    A pool of evaluator subprocesses which evaluate lists of requests
+    concurrently.
+    """
+
+    def __init__(self, command, size, depth=2, restart_on=None, setup=None):
+        """
+        Start a pool of evaluators.
+
+        :param command: The command which starts an evaluator, as a list.
+        :param size: The number of evaluators.
+        :param depth: The largest number of requests in flight on each
+        evaluator. Evaluators only take more than one request at a time
+        while there are more requests waiting than there are evaluators, so
+        that no evaluator is left idle.
+        :param restart_on: An optional function of a response which returns
+        True if the evaluator which sent it should be restarted.
+        :param setup: An optional list of requests without responses which
+        are sent to each evaluator whenever it is started.
+        """
+
+        self.depth = depth
+        self.restart_on = restart_on
+        self.evaluators = [Evaluator(command, setup) for _ in range(size)]
+
+        # The number of evaluators restarted so far.
+        self.restarts = 0
+
+    def evaluate(self, requests):
+        """
+        Evaluate a list of requests using all evaluators of the pool.
+
+        :param requests: A list of JSON-serialisable requests.
+        :return: A list of the responses to the requests, in order.
+        """
+
+        tasks = Queue()
+        for i in range(len(requests)):
+            tasks.put(i)
+
+        responses = [None] * len(requests)
+
+        threads = [Thread(target=self.dispatch, args=(evaluator, requests,
+                                                      tasks, responses))
+                   for evaluator in self.evaluators]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        # Requests are left unanswered if all evaluators failed to restart.
+        return [CRASHED if response is None else response for response in
+                responses]
+
+    def dispatch(self, evaluator, requests, tasks, responses):
+        """
+        Send requests to a single evaluator and collect its responses until
+        no requests are left. Run by one thread per evaluator.
+
+        :param evaluator: An evaluator of the pool.
+        :param requests: The list of all requests.
+        :param tasks: A queue of the indexes of requests which have not been
+        sent to an evaluator yet.
+        :param responses: The list of all responses, filled in place.
+        :return: Nothing.
+        """
+
+        # The indexes of the requests sent to the evaluator which have not
+        # been answered yet, oldest first, and the number of times each
+        # request has been retried.
+        in_flight, retries = deque(), {}
+
+        # Whether the requests in flight must be sent again to a restarted
+        # evaluator.
+        resend = False
+
+        while True:
+            try:
+                if resend:
+                    resend = False
+                    for i in in_flight:
+                        evaluator.send(requests[i])
+
+                while len(in_flight) < self.depth:
+                    # Keep the evaluator busy, but leave the last requests
+                    # to evaluators which may be idle.
+                    if in_flight and tasks.qsize() <= len(self.evaluators):
+                        break
+
+                    try:
+                        i = tasks.get_nowait()
+
+                    except Empty:
+                        break
+
+                    in_flight.append(i)
+                    evaluator.send(requests[i])
+
+                if not in_flight:
+                    # All requests have been answered.
+                    return
+
+                response = evaluator.receive()
+                responses[in_flight.popleft()] = response
+
+                if self.restart_on and self.restart_on(response):
+                    # Restart the evaluator and send it all unanswered
+                    # requests again.
+                    if not self.restart(evaluator):
+                        break
+                    resend = True
+
+            except (OSError, EOFError, ValueError):
+                # The evaluator crashed or its output could not be parsed.
+                # The oldest unanswered request may be to blame, so it is
+                # only retried a limited number of times.
+                if in_flight:
+                    i = in_flight[0]
+                    retries[i] = retries.get(i, 0) + 1
+
+                    if retries[i] > MAX_RETRIES:
+                        responses[i] = CRASHED
+                        in_flight.popleft()
+
+                if not self.restart(evaluator):
+                    break
+                resend = True
+
+        # The evaluator could not be restarted, so its unanswered requests
+        # are given up on. Other evaluators carry on with the rest.
+        for i in in_flight:
+            responses[i] = CRASHED
+
+    def restart(self, evaluator):
+        """
+        Restart an evaluator of the pool, trying again if it fails to start.
+
+        :param evaluator: An evaluator of the pool.
+        :return: True if the evaluator was restarted.
+        """
+
+        for _ in range(MAX_RETRIES + 1):
+            try:
+                evaluator.restart()
+                self.restarts += 1
+                return True
+
+            except OSError:
+                # The evaluator could not be stopped or started.
+                pass
+
+        return False
+
+    def close(self):
+        """
+        Stop all evaluators of the pool.
+
+        :return: Nothing.
+        """
+
+        for evaluator in self.evaluators:
+            evaluator.close()
@@ -0,0 +1,366 @@
+import ast
+import operator
+
+from utilities.fitness import semantic_cache
+from utilities.fitness.code_cache import get_code
+from utilities.fitness.stack_eval import apply_instruction, compile_postfix, \
+    get_arity
+
+# The functions which apply each Python AST operator. These are the same
+# functions as are used by utilities.fitness.stack_eval, so expressions
+# parsed either way give the same DAG nodes.
+AST_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod, ast.Pow: operator.pow,
+    ast.MatMult: operator.matmul, ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift, ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor, ast.BitAnd: operator.and_,
+    ast.Lt: operator.lt, ast.Gt: operator.gt, ast.LtE: operator.le,
+    ast.GtE: operator.ge, ast.Eq: operator.eq, ast.NotEq: operator.ne,
+    ast.USub: operator.neg, ast.UAdd: operator.pos,
+    ast.Invert: operator.invert}
+
+
+class ExpressionDAG(object):
+    """
+    A hash-consed directed acyclic graph of expressions. Expressions (e.g.
+    the phenotypes of a whole population) are parsed into postfix programs
+    of the form used by utilities.fitness.stack_eval and merged into a
+    single graph, in which every distinct subexpression is a single node.
+    Evaluating the graph computes each distinct subexpression exactly once,
+    no matter how many expressions share it.
+
+    Nodes are numbered in the order they are created, so the children of a
+    node always have lower numbers than the node itself and nodes can be
+    evaluated in order.
+    """
+
+    def __init__(self):
+        """
+        Initialise an empty expression DAG.
+        """
+
+        # The ID of each node, keyed by its instruction and argument, and the
+        # IDs of its children if it has any.
+        self.ids = {}
+
+        # The instruction, argument and children of each node.
+        self.nodes = []
+
+        # The node ID of the root of each distinct expression string.
+        self.expressions = {}
+
+        # The node ID of the root of each expression added to the DAG.
+        self.roots = []
+
+        # The values and errors of all nodes, set by evaluate().
+        self.values, self.errors = [], []
+
+    def add_expression(self, expr):
+        """
+        Add an expression to the DAG. Raises a ValueError if the expression
+        is not supported by utilities.fitness.stack_eval.
+
+        :param expr: A Python expression string.
+        :return: The index of the expression in the DAG.
+        """
+
+        if expr in self.expressions:
+            # The whole expression is already in the DAG.
+            self.roots.append(self.expressions[expr])
+            return len(self.roots) - 1
+
+        # Compile the expression, using the compiled code cache.
+        program = get_code(("dag", expr), lambda: compile_dag_program(expr))
+
+        ids, nodes, stack = self.ids, self.nodes, []
+
+        for key, instruction, argument, arity in program:
+
+            if arity:
+                # Take the IDs of the children of the node from the stack.
+                children = tuple(stack[-arity:])
+                del stack[-arity:]
+                key = (key, children)
+
+            else:
+                children = ()
+
+            node = ids.get(key)
+
+            if node is None:
+                # This is a new subexpression.
+                node = ids[key] = len(nodes)
+                nodes.append((instruction, argument, children))
+
+            stack.append(node)
+
+        self.expressions[expr] = stack[-1]
+        self.roots.append(stack[-1])
+
+        return len(self.roots) - 1
+
+    def evaluate(self, global_vars, local_vars, split=None):
+        """
+        Evaluate all nodes in the DAG. The value of a node is freed as soon
+        as all nodes which use it have been evaluated, unless it is the root
+        of an expression.
+
+        If a dataset split is given, the outputs of subexpressions are looked
+        up in (and added to) the semantic cache of
+        utilities.fitness.semantic_cache, so that subexpressions which were
+        computed for earlier DAGs over the same split are not computed again.
+
+        If evaluating a node raises an exception, the exception is stored and
+        passed on to all nodes which use it, instead of being raised. Errors
+        are passed on from the first child with an error, so each expression
+        gets the same error as eval() would raise for it.
+
+        :param global_vars: A dictionary of global variables.
+        :param local_vars: A dictionary of local variables.
+        :param split: The name of the dataset split given in the variables,
+        e.g. "training", or None if the semantic cache is not to be used.
+        :return: Nothing.
+        """
+
+        nodes = self.nodes
+
+        # The canonical text of each node, if the semantic cache is used.
+        texts = [] if split is not None else None
+
+        # Find the last node which uses each node. Roots are never freed.
+        last_use = [-1] * len(nodes)
+        for i, (_, _, children) in enumerate(nodes):
+            for child in children:
+                last_use[child] = i
+        for root in self.roots:
+            last_use[root] = len(nodes)
+
+        values = self.values = [None] * len(nodes)
+        errors = self.errors = [None] * len(nodes)
+
+        for i, (instruction, argument, children) in enumerate(nodes):
+
+            if texts is not None:
+                texts.append(get_canonical_text(
+                    instruction, argument, [texts[child] for child in
+                                            children]))
+
+            for child in children:
+                if errors[child] is not None:
+                    # Pass on the error of the first child with an error.
+                    errors[i] = errors[child]
+                    break
+
+            else:
+                if texts is not None and children:
+                    # Look up the output of the subexpression.
+                    values[i] = semantic_cache.get_output((split, texts[i]))
+
+                if values[i] is None:
+                    try:
+                        values[i] = apply_instruction(
+                            instruction, argument,
+                            [values[child] for child in children],
+                            global_vars, local_vars)
+
+                    except Exception as err:
+                        errors[i] = err
+
+                    else:
+                        if texts is not None and children:
+                            # Cache the output of the subexpression.
+                            semantic_cache.add_output((split, texts[i]),
+                                                      values[i])
+
+            for child in children:
+                if last_use[child] == i:
+                    # Free the values of children which are no longer needed.
+                    values[child] = None
+
+    def get_value(self, index):
+        """
+        Returns the value of an expression after the DAG has been evaluated,
+        or raises the error which evaluating the expression produced.
+
+        :param index: The index of the expression in the DAG.
+        :return: The value of the expression.
+        """
+
+        root = self.roots[index]
+
+        if self.errors[root] is not None:
+            raise self.errors[root]
+
+        return self.values[root]
+
+
+def parse_postfix(expr):
+    """
+    Parse an expression into a postfix program in the format of
+    utilities.fitness.stack_eval.compile_postfix. Python's own parser is
+    used where possible as it is much faster; expressions which are too
+    deeply nested for Python's parser are parsed by compile_postfix instead.
+    Raises a ValueError if the expression is not supported.
+
+    :param expr: A Python expression string.
+    :return: A postfix program.
+    """
+
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+
+    except (SyntaxError, RecursionError, MemoryError):
+        # The expression is too deep for Python's parser (or is invalid).
+        return compile_postfix(expr)
+
+    program = []
+
+    # Traverse the syntax tree in postorder using an explicit stack. Each
+    # item on the stack is either a node to be visited, or an instruction to
+    # be added to the program once all of its operands have been visited.
+    stack = [tree.body]
+
+    while stack:
+        node = stack.pop()
+
+        if type(node) is tuple:
+            # All operands of the instruction have been added, or the node
+            # is a missing part of a slice.
+            program.append(node)
+            continue
+
+        kind = type(node)
+
+        if kind is ast.Constant and \
+                type(node.value) in (int, float, complex, bool, type(None)):
+            program.append(("const", node.value))
+            continue
+
+        elif kind is ast.Name or kind is ast.Attribute:
+            # Find all parts of a (possibly dotted) name.
+            parts = []
+            while type(node) is ast.Attribute:
+                parts.append(node.attr)
+                node = node.value
+            if type(node) is not ast.Name:
+                raise ValueError("Unsupported attribute in %s." % expr)
+            parts.append(node.id)
+            program.append(("name", tuple(reversed(parts))))
+            continue
+
+        elif kind is ast.BinOp and type(node.op) in AST_OPS:
+            instruction = ("binary", AST_OPS[type(node.op)])
+            operands = [node.left, node.right]
+
+        elif kind is ast.UnaryOp and type(node.op) in AST_OPS:
+            instruction = ("unary", AST_OPS[type(node.op)])
+            operands = [node.operand]
+
+        elif kind is ast.Compare and len(node.ops) == 1 and \
+                type(node.ops[0]) in AST_OPS:
+            instruction = ("binary", AST_OPS[type(node.ops[0])])
+            operands = [node.left, node.comparators[0]]
+
+        elif kind is ast.Call and not node.keywords and \
+                not any(type(arg) is ast.Starred for arg in node.args):
+            instruction = ("call", len(node.args))
+            operands = [node.func] + node.args
+
+        elif kind is ast.Subscript:
+            instruction = ("subscript", None)
+            operands = [node.value, node.slice]
+
+        elif kind is ast.Slice:
+            instruction = ("slice", 3)
+            operands = [("const", None) if part is None else part for
+                        part in (node.lower, node.upper, node.step)]
+
+        elif kind is ast.Tuple and not any(type(item) is ast.Starred for
+                                           item in node.elts):
+            instruction = ("tuple", len(node.elts))
+            operands = node.elts
+
+        else:
+            raise ValueError("Unsupported syntax in %s." % expr)
+
+        # Visit the operands from left to right, then add the instruction.
+        stack.append(instruction)
+        stack.extend(reversed(operands))
+
+    return program
+
+
+def get_canonical_text(instruction, argument, children):
+    """
+    Returns the canonical text of a node of an expression DAG, which is the
+    same for all subexpressions which compute the same thing in the same way,
+    however they are written (e.g. with different spacing or brackets).
+
+    :param instruction: The name of the instruction of the node.
+    :param argument: The argument of the instruction.
+    :param children: A list of the canonical texts of the children of the
+    node.
+    :return: A string.
+    """
+
+    if instruction == "const":
+        # Constants of different types are different.
+        return "%s:%r" % (type(argument).__name__, argument)
+
+    elif instruction == "name":
+        return ".".join(argument)
+
+    elif instruction in ("unary", "binary"):
+        # The argument is an operator function.
+        return "%s(%s)" % (argument.__name__, ",".join(children))
+
+    else:
+        return "%s(%s)" % (instruction, ",".join(children))
+
+
+def compile_dag_program(expr):
+    """
+    Compile an expression into a postfix program for adding to an expression
+    DAG. Each instruction of the program is a tuple of the key of the
+    instruction, the name and argument of the instruction, and the number of
+    its operands. The key of an instruction is its name and argument;
+    constants which compare equal (e.g. 1 and 1.0) only have the same key if
+    they have the same type.
+
+    Slices and tuples of constants (e.g. the index of x[:, 0]) are folded
+    into single constants, so that they do not add nodes to the DAG.
+
+    :param expr: A Python expression string.
+    :return: A postfix program.
+    """
+
+    program = []
+
+    for instruction, argument in parse_postfix(expr):
+        arity = get_arity(instruction, argument)
+
+        if instruction in ("slice", "tuple") and \
+                all(item[1] == "const" for item in
+                    program[len(program) - arity:]):
+            # Fold the slice or tuple into a single constant.
+            operands = program[len(program) - arity:]
+            del program[len(program) - arity:]
+
+            key = (instruction, argument,
+                   tuple(item[0] for item in operands))
+            argument = apply_instruction(instruction, argument,
+                                         [item[2] for item in operands],
+                                         {}, {})
+            instruction, arity = "const", 0
+
+        elif instruction == "const":
+            key = (instruction, type(argument), argument)
+
+        else:
+            key = (instruction, argument)
+
+        program.append((key, instruction, argument, arity))
+
+    return program
@@ -1,14 +1,16 @@
 from os import path
 
-import numpy as np
 from algorithm.parameters import params
+from utilities.fitness import dataset_cache, shared_data
 
 
 def get_Xy_train_test_separate(train_filename, test_filename, skip_header=0):
     """
     Read in training and testing data files, and split each into X
     (all columns up to last) and y (last column). The data files should
-    contain one row per training example.
+    contain one row per training example. If params['DATASET_CACHE_DIR']
+    is specified, parsed datasets are cached in binary form (see
+    utilities.fitness.dataset_cache).
     
     :param train_filename: The file name of the training dataset.
     :param test_filename: The file name of the testing dataset.
@@ -53,8 +55,8 @@ def get_Xy_train_test_separate(train_filename, test_filename, skip_header=0):
         f.close()
 
     # Read in all training data.
-    train_Xy = np.genfromtxt(train_filename, skip_header=skip_header,
-                             delimiter=delimiter)
+    train_Xy = dataset_cache.load_dataset(train_filename, delimiter,
+                                          skip_header)
 
     try:
         # Separate out input (X) and output (y) data.
@@ -69,8 +71,8 @@ def get_Xy_train_test_separate(train_filename, test_filename, skip_header=0):
 
     if test_filename:
         # Read in all testing data.
-        test_Xy = np.genfromtxt(test_filename, skip_header=skip_header,
-                                delimiter=delimiter)
+        test_Xy = dataset_cache.load_dataset(test_filename, delimiter,
+                                             skip_header)
 
         # Separate out input (X) and output (y) data.
         test_X = test_Xy[:, :-1] # all columns but last
@@ -82,13 +84,14 @@ def get_Xy_train_test_separate(train_filename, test_filename, skip_header=0):
     return train_X, train_y, test_X, test_y
 
 
-def get_data(train, test):
+def get_data_files(train, test):
     """
-    Return the training and test data for the current experiment.
-    
+    Return the paths of the dataset files which are read by get_data.
+
     :param train: The desired training dataset.
     :param test: The desired testing dataset.
-    :return: The parsed data contained in the dataset files.
+    :return: The paths to the training and testing dataset files. The path
+    to the testing dataset is None if there is no testing dataset.
     """
 
     # Get the path to the training dataset.
@@ -102,8 +105,32 @@ def get_data(train, test):
         # There is no testing dataset used.
         test_set = None
 
+    return train_set, test_set
+
+
+def get_data(train, test):
+    """
+    Return the training and test data for the current experiment. If
+    params['SHARED_MEMORY_DATA'] is specified, the data are copied into
+    shared memory (see utilities.fitness.shared_data) so that multicore
+    workers can use them without copies of their own.
+    
+    :param train: The desired training dataset.
+    :param test: The desired testing dataset.
+    :return: The parsed data contained in the dataset files.
+    """
+
+    # Get the paths to the training and testing datasets.
+    train_set, test_set = get_data_files(train, test)
+
     # Read in the training and testing datasets from the specified files.
     training_in, training_out, test_in, \
     test_out = get_Xy_train_test_separate(train_set, test_set, skip_header=1)
 
+    if params['SHARED_MEMORY_DATA']:
+        # Publish the datasets to shared memory.
+        training_in, training_out, test_in, test_out = [
+            shared_data.publish(data) for data in
+            [training_in, training_out, test_in, test_out]]
+
     return training_in, training_out, test_in, test_out
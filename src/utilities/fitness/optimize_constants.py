@@ -2,6 +2,7 @@ import re
 
 import scipy
 from algorithm.parameters import params
+from utilities.fitness.code_cache import compile_cached
 from utilities.fitness.math_functions import *
 
 
@@ -27,7 +28,7 @@ def optimize_constants(x, y, ind):
     ind.phenotype_consec_consts = s
 
     # Eval the phenotype.
-    f = eval("lambda x, c: " + s)
+    f = eval(compile_cached("lambda x, c: " + s))
 
     # Pre-load the error metric fitness function.
     loss = params['ERROR_METRIC']
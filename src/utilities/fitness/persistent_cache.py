@@ -0,0 +1,252 @@
+import hashlib
+import inspect
+import pickle
+import sqlite3
+import sys
+from os import path
+
+import numpy as np
+from algorithm.parameters import params
+
+"""Persistent fitness cache, shared by all runs which use the same cache file.
+Unlike utilities.stats.trackers.cache, which only lasts for a single run,
+fitnesses are stored in an SQLite database on disk so that phenotypes which
+were evaluated by earlier runs (e.g. other seeds of the same experiment) do
+not have to be evaluated again. SQLite locks the database file, so any number
+of runs can use the same cache at once."""
+
+connection = None
+# The connection to the cache database, opened on first use.
+
+fingerprint = None
+# The fingerprint of the fitness function, data files and error metric used in
+# this run. Fitnesses are only shared between runs with the same fingerprint.
+
+pending = {}
+# This dict stores new fitnesses which have not been written to the database
+# yet. The key for each entry is the phenotype, the value is its fitness.
+
+hits = 0
+# The number of individuals whose fitness was read from the database.
+
+# The parameters which change the fitness of a phenotype, in addition to the
+# fitness function, error metric and data files.
+FINGERPRINT_PARAMS = ['DATASET_DELIMITER', 'TARGET', 'EXTRA_PARAMETERS',
+                      'GRAMMAR_FILE', 'SUT', 'STRATEGY_FILE', 'REGEX_COST',
+                      'REGEX_STEP_COST', 'REGEX_BACKTRACKING_CHECK']
+
+# The packages whose modules are fingerprinted when they are imported by the
+# modules of a fitness function.
+FINGERPRINT_PACKAGES = ('fitness.', 'utilities.fitness.')
+
+# The maximum number of phenotypes looked up with a single query. Older
+# versions of SQLite allow no more than 999 variables per query.
+LOOKUP_CHUNK_SIZE = 500
+
+
+def get_source_modules(fitness_function):
+    """
+    Finds the modules whose source code determines the fitness of a
+    phenotype: the modules of all classes which the fitness function inherits
+    from, and the modules of FINGERPRINT_PACKAGES which they import, directly
+    or indirectly.
+
+    :param fitness_function: A fitness function instance.
+    :return: A list of modules, sorted by name.
+    """
+
+    modules = {}
+    stack = [inspect.getmodule(cls) for cls in type(fitness_function).__mro__
+             if cls is not object]
+
+    while stack:
+        module = stack.pop()
+        if module is None or module.__name__ in modules:
+            continue
+        modules[module.__name__] = module
+
+        for value in vars(module).values():
+            # Follow imported modules, and the modules of imported classes
+            # and functions.
+            if inspect.ismodule(value):
+                imported = value
+            elif inspect.isclass(value) or inspect.isfunction(value):
+                imported = sys.modules.get(getattr(value, '__module__', None))
+            else:
+                continue
+
+            if imported is not None and \
+                    imported.__name__.startswith(FINGERPRINT_PACKAGES):
+                stack.append(imported)
+
+    return [modules[name] for name in sorted(modules)]
+
+
+def get_fingerprint():
+    """
+    Builds a fingerprint of everything which determines the fitness of a
+    phenotype: the fitness function classes and the source code of the
+    modules they use, the error metric, the contents of the files which
+    fitness functions read (e.g. datasets), the seed individuals, and any
+    other parameters which fitness functions use.
+
+    :return: A hex digest string.
+    """
+
+    digest = hashlib.sha256()
+
+    fitness_function = params['FITNESS_FUNCTION']
+    if hasattr(fitness_function, 'multi_objective'):
+        # Fingerprint all fitness functions of a multi-objective problem.
+        fitness_functions = fitness_function.fitness_functions
+    else:
+        fitness_functions = [fitness_function]
+
+    for ff in fitness_functions:
+        # Add the name of each fitness function and the source code of the
+        # modules it uses, so that changes to the fitness function are
+        # detected.
+        digest.update(("%s.%s" % (type(ff).__module__,
+                                  type(ff).__name__)).encode())
+
+        for module in get_source_modules(ff):
+            digest.update(module.__name__.encode())
+            source_file = inspect.getsourcefile(module)
+            if source_file:
+                with open(source_file, "rb") as f:
+                    digest.update(f.read())
+
+        for filename in ff.get_data_files():
+            # Add the contents of the files read by the fitness function.
+            if not path.isfile(filename):
+                s = "utilities.fitness.persistent_cache.get_fingerprint\n" \
+                    "Error: file %s read by fitness function %s does " \
+                    "not exist." % (filename, type(ff).__name__)
+                raise Exception(s)
+
+            digest.update(filename.encode())
+            with open(filename, "rb") as f:
+                digest.update(f.read())
+
+    if params.get('ERROR_METRIC'):
+        # Add the name of the error metric.
+        digest.update(str(getattr(params['ERROR_METRIC'], '__name__',
+                                  params['ERROR_METRIC'])).encode())
+
+    for param in FINGERPRINT_PARAMS:
+        # Add all other parameters which fitness functions use.
+        digest.update(("%s=%r" % (param, params.get(param))).encode())
+
+    for ind in params['SEED_INDIVIDUALS']:
+        # Add the phenotypes of the seed individuals, from which some
+        # fitness functions (e.g. RegexEval) generate their test cases.
+        digest.update(("SEED=%s" % ind.phenotype).encode())
+
+    return digest.hexdigest()
+
+
+def open_cache():
+    """
+    Opens the cache database given by params['PERSISTENT_CACHE'], creating
+    it if it does not exist, and sets the fingerprint of the current run.
+
+    :return: The connection to the cache database.
+    """
+
+    global connection, fingerprint
+
+    if connection is not None:
+        return connection
+
+    if params['OPTIMIZE_CONSTANTS']:
+        s = "utilities.fitness.persistent_cache.open_cache\n" \
+            "Error: PERSISTENT_CACHE cannot be used with " \
+            "OPTIMIZE_CONSTANTS, as optimised constants are stored on " \
+            "individuals rather than in the cache."
+        raise Exception(s)
+
+    fingerprint = get_fingerprint()
+
+    # Other runs may be writing to the database. Wait for their locks to be
+    # released rather than failing.
+    connection = sqlite3.connect(params['PERSISTENT_CACHE'], timeout=600)
+
+    # Write-ahead logging allows runs to read the cache while another run
+    # is writing to it.
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+
+    with connection:
+        connection.execute("CREATE TABLE IF NOT EXISTS fitness ("
+                           "fingerprint TEXT NOT NULL, "
+                           "phenotype TEXT NOT NULL, "
+                           "fitness BLOB NOT NULL, "
+                           "PRIMARY KEY (fingerprint, phenotype))")
+
+    return connection
+
+
+def lookup(phenotypes):
+    """
+    Looks up the stored fitnesses of a list of phenotypes.
+
+    :param phenotypes: A list of phenotype strings.
+    :return: A dict of the fitnesses of all phenotypes which are in the
+    cache, keyed by phenotype.
+    """
+
+    db = open_cache()
+
+    phenotypes = list(set(phenotypes))
+    stored = {}
+
+    for i in range(0, len(phenotypes), LOOKUP_CHUNK_SIZE):
+        # Look up the phenotypes in chunks.
+        chunk = phenotypes[i:i + LOOKUP_CHUNK_SIZE]
+        query = "SELECT phenotype, fitness FROM fitness WHERE " \
+                "fingerprint = ? AND phenotype IN (%s)" % \
+                ", ".join(["?"] * len(chunk))
+
+        for phenotype, fitness in db.execute(query, [fingerprint] + chunk):
+            stored[phenotype] = pickle.loads(fitness)
+
+    return stored
+
+
+def add(phenotype, fitness):
+    """
+    Adds the fitness of a phenotype to the cache. Fitnesses are kept in
+    memory until flush() is called. NaN fitnesses are not cached.
+
+    :param phenotype: A phenotype string.
+    :param fitness: The fitness of the phenotype.
+    :return: Nothing.
+    """
+
+    if (isinstance(fitness, list) and not
+            any([np.isnan(i) for i in fitness])) or \
+            (not isinstance(fitness, list) and not np.isnan(fitness)):
+        # All fitnesses are valid.
+        pending[phenotype] = fitness
+
+
+def flush():
+    """
+    Writes all pending fitnesses to the cache database in a single
+    transaction. Phenotypes which another run has already added are
+    ignored.
+
+    :return: Nothing.
+    """
+
+    if not pending:
+        return
+
+    db = open_cache()
+
+    with db:
+        db.executemany("INSERT OR IGNORE INTO fitness VALUES (?, ?, ?)",
+                       [(fingerprint, phenotype, pickle.dumps(fitness))
+                        for phenotype, fitness in pending.items()])
+
+    pending.clear()
@@ -0,0 +1,88 @@
+import numpy as np
+from algorithm.parameters import params
+
+# The number of strata used for stratified sampling of continuous outputs.
+# Outputs with no more than this many distinct values (e.g. class labels)
+# are stratified by value instead.
+N_STRATA = 10
+
+
+def get_sample_size(n_rows):
+    """
+    Returns the number of rows of training data to evaluate in each
+    generation, given by params['TRAINING_SAMPLE_SIZE']. Values below 1 are
+    a fraction of all rows, other values are a number of rows.
+
+    :param n_rows: The total number of rows of training data.
+    :return: The number of rows to sample.
+    """
+
+    size = params['TRAINING_SAMPLE_SIZE']
+
+    if size < 1:
+        # The sample size is a fraction of all rows.
+        size = size * n_rows
+
+    return min(n_rows, max(1, int(round(size))))
+
+
+def get_sample_seed(generation):
+    """
+    Returns the seed of the random number generator used to sample the
+    training data for a given generation. The training data are sampled with
+    their own random number generator, so that sampling does not change the
+    random numbers used by the rest of the run, and so that the sample of
+    any generation can be reproduced from the seed of the run.
+
+    :param generation: The current generation.
+    :return: An integer seed.
+    """
+
+    return (params['RANDOM_SEED'] * 1000003 + generation) % (2 ** 32)
+
+
+def get_sample_indexes(y, size, method, seed):
+    """
+    Choose a sample of rows of a dataset, without replacement.
+
+    :param y: The expected outputs of all rows of the dataset.
+    :param size: The number of rows to choose.
+    :param method: "random" to choose rows uniformly at random, or
+    "stratified" to choose the same proportion of rows from each class (for
+    classification) or from each range of output values (for regression).
+    :param seed: The seed of the random number generator.
+    :return: A sorted array of the indexes of the chosen rows.
+    """
+
+    rng = np.random.RandomState(seed)
+
+    if method == "random":
+        return np.sort(rng.choice(len(y), size, replace=False))
+
+    elif method != "stratified":
+        s = "utilities.fitness.sampling.get_sample_indexes\n" \
+            "Error: unknown sampling method '%s'.\n" \
+            "Valid methods are 'random' and 'stratified'." % method
+        raise Exception(s)
+
+    values, strata = np.unique(y, return_inverse=True)
+
+    if len(values) > N_STRATA:
+        # Divide continuous outputs into ranges of equal numbers of rows.
+        strata = np.argsort(np.argsort(y, kind="mergesort")) * N_STRATA // \
+            len(y)
+
+    counts = np.bincount(strata)
+
+    # Give each stratum its proportion of the sample, then give the rows left
+    # over to the strata with the largest remainders.
+    shares = counts * size / len(y)
+    allocation = np.floor(shares).astype(int)
+    left_over = size - np.sum(allocation)
+    allocation[np.argsort(allocation - shares, kind="mergesort")[
+               :left_over]] += 1
+
+    indexes = [rng.choice(np.flatnonzero(strata == stratum), n, replace=False)
+               for stratum, n in enumerate(allocation) if n]
+
+    return np.sort(np.concatenate(indexes))
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+
+import numpy as np
+from algorithm.parameters import params
+
+"""Cache of the outputs of subexpressions (i.e. the semantics of subtrees)
+over a dataset, shared by all evaluations of a run. Regression populations
+contain the same subtrees (e.g. np.sin(x[:, 2])) in many individuals over
+many generations; with this cache each subtree is computed over the dataset
+only once for as long as its output stays in the cache. Outputs are arrays,
+which cannot be usefully saved with the state of a run, so the cache is kept
+here rather than in utilities.stats.trackers."""
+
+cache = OrderedDict()
+# This dict stores subexpression outputs in least recently used order. The
+# key for each entry is a tuple of the dataset split (e.g. "training") and
+# the canonical text of the subexpression, the value is its output array.
+
+size = 0
+# The total number of bytes of all arrays in the cache.
+
+hits = 0
+# The number of lookups of outputs which were already in the cache.
+
+misses = 0
+# The number of lookups of outputs which had to be computed.
+
+
+def get_output(key):
+    """
+    Look up the output of a subexpression in the cache.
+
+    :param key: A tuple of the dataset split and the canonical text of the
+    subexpression.
+    :return: The output array, or None if it is not in the cache.
+    """
+
+    global hits, misses
+
+    output = cache.get(key)
+
+    if output is None:
+        misses += 1
+
+    else:
+        # Mark the output as most recently used.
+        hits += 1
+        cache.move_to_end(key)
+
+    return output
+
+
+def add_output(key, output):
+    """
+    Add the output of a subexpression to the cache, evicting the least
+    recently used outputs until the total size of all arrays in the cache is
+    within params['SEMANTIC_CACHE_SIZE'] megabytes. Only arrays which own
+    their data are cached; views of other arrays (e.g. x[:, 0]) are cheap to
+    compute and would keep the whole of the other array alive. Cached arrays
+    are made read-only, as they may be shared by many individuals.
+
+    :param key: A tuple of the dataset split and the canonical text of the
+    subexpression.
+    :param output: The output of the subexpression.
+    :return: Nothing.
+    """
+
+    global size
+
+    if type(output) is not np.ndarray or output.base is not None or \
+            key in cache:
+        return
+
+    limit = params['SEMANTIC_CACHE_SIZE'] * 1024 * 1024
+
+    if output.nbytes > limit:
+        # The array would not fit in the cache on its own.
+        return
+
+    output.flags.writeable = False
+    cache[key] = output
+    size += output.nbytes
+
+    while size > limit:
+        # Evict the least recently used output.
+        _, evicted = cache.popitem(last=False)
+        size -= evicted.nbytes
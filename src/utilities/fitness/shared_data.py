@@ -0,0 +1,176 @@
+import atexit
+
+import numpy as np
+
+"""Datasets in shared memory, so that all multicore workers use a single copy
+of the training and test data rather than holding one copy each. Arrays are
+published to shared memory once by the main process; fitness functions which
+are sent to workers (e.g. on Windows, where workers are spawned rather than
+forked) are pickled with a SharedArray descriptor in place of each published
+array, and workers attach to the shared memory without copying the data."""
+
+published = {}
+# This dict stores all arrays published or attached by this process. The key
+# for each entry is the id() of the shared array, the value is a tuple of
+# its SharedArray descriptor, the array and the shared memory block, which
+# must be kept open for as long as the array is used.
+
+
+class SharedArray(object):
+    """
+    A descriptor of an array in shared memory, which can be pickled and
+    sent to other processes in place of the array itself.
+    """
+
+    def __init__(self, name, shape, dtype):
+        """
+        Initialise a shared array descriptor.
+
+        :param name: The name of the shared memory block.
+        :param shape: The shape of the array.
+        :param dtype: The data type of the array, as a string.
+        """
+
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+
+def get_shared_memory():
+    """
+    Returns the SharedMemory class of the multiprocessing library, which is
+    only available from Python 3.8 onwards.
+
+    :return: The multiprocessing.shared_memory.SharedMemory class.
+    """
+
+    try:
+        from multiprocessing.shared_memory import SharedMemory
+
+    except ImportError:
+        s = "utilities.fitness.shared_data.get_shared_memory\n" \
+            "Error: shared memory datasets require Python 3.8 or later."
+        raise Exception(s)
+
+    return SharedMemory
+
+
+def publish(array):
+    """
+    Copy an array into a new block of shared memory. The block is removed
+    when the main process exits.
+
+    :param array: A numpy array, or None.
+    :return: A read-only copy of the array in shared memory, or None.
+    """
+
+    if array is None:
+        return None
+
+    SharedMemory = get_shared_memory()
+
+    array = np.ascontiguousarray(array)
+
+    # Shared memory blocks cannot be empty.
+    block = SharedMemory(create=True, size=max(1, array.nbytes))
+    atexit.register(remove, block)
+
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    shared[...] = array
+    shared.flags.writeable = False
+
+    descriptor = SharedArray(block.name, array.shape, array.dtype.str)
+    published[id(shared)] = descriptor, shared, block
+
+    return shared
+
+
+def attach(descriptor):
+    """
+    Attach to an array in shared memory, without copying it.
+
+    :param descriptor: A SharedArray descriptor.
+    :return: A read-only array backed by the shared memory.
+    """
+
+    SharedMemory = get_shared_memory()
+
+    # Workers share the resource tracker of the main process, so the block
+    # is only removed once the main process has finished with it.
+    block = SharedMemory(name=descriptor.name)
+
+    shared = np.ndarray(descriptor.shape, dtype=np.dtype(descriptor.dtype),
+                        buffer=block.buf)
+    shared.flags.writeable = False
+
+    published[id(shared)] = descriptor, shared, block
+
+    return shared
+
+
+def get_descriptor(array):
+    """
+    Returns the descriptor of an array which has been published to (or
+    attached from) shared memory.
+
+    :param array: Any object.
+    :return: A SharedArray descriptor, or None if the object is not an array
+    in shared memory.
+    """
+
+    entry = published.get(id(array))
+
+    if entry is not None and entry[1] is array:
+        return entry[0]
+
+    return None
+
+
+def share_state(state):
+    """
+    Replace all arrays in shared memory in a dictionary of attributes (e.g.
+    the state of a fitness function being pickled) with their descriptors.
+
+    :param state: A dictionary of attributes.
+    :return: A new dictionary of attributes.
+    """
+
+    return {key: get_descriptor(value) or value for key, value in
+            state.items()}
+
+
+def attach_state(state):
+    """
+    Replace all shared array descriptors in a dictionary of attributes
+    (e.g. the state of an unpickled fitness function) with the arrays
+    themselves, attached from shared memory.
+
+    :param state: A dictionary of attributes.
+    :return: A new dictionary of attributes.
+    """
+
+    return {key: attach(value) if isinstance(value, SharedArray) else value
+            for key, value in state.items()}
+
+
+def remove(block):
+    """
+    Close and remove a block of shared memory created by this process.
+
+    :param block: A shared memory block.
+    :return: Nothing.
+    """
+
+    try:
+        block.close()
+
+    except BufferError:
+        # Arrays still use the block. It is closed when the process exits.
+        pass
+
+    try:
+        block.unlink()
+
+    except FileNotFoundError:
+        # The block has already been removed.
+        pass
@@ -0,0 +1,468 @@
+import builtins
+import operator
+import re
+
+from utilities.fitness.code_cache import compile_cached, get_code
+
+# Regular expression for all tokens in a Python expression which can be
+# evaluated with an explicit stack. Numbers are matched before names and
+# operators, and longer operators are matched before shorter ones.
+TOKEN_RE = re.compile(
+    r"\s*(?:"
+    r"(?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?[jJ]?)|"
+    r"(?P<name>[A-Za-z_][A-Za-z0-9_]*(?:\s*\.\s*[A-Za-z_][A-Za-z0-9_]*)*)|"
+    r"(?P<op>\*\*|//|<<|>>|<=|>=|==|!=|[-+*/%&|^~<>@()\[\],:])"
+    r")")
+
+# Binary operators with their precedence (higher binds tighter) and the
+# functions which apply them. Python's "**" operator is right-associative,
+# all other binary operators are left-associative.
+BINARY_OPS = {
+    "<": (0, operator.lt), ">": (0, operator.gt), "<=": (0, operator.le),
+    ">=": (0, operator.ge), "==": (0, operator.eq), "!=": (0, operator.ne),
+    "|": (1, operator.or_), "^": (2, operator.xor), "&": (3, operator.and_),
+    "<<": (4, operator.lshift), ">>": (4, operator.rshift),
+    "+": (5, operator.add), "-": (5, operator.sub),
+    "*": (6, operator.mul), "/": (6, operator.truediv),
+    "//": (6, operator.floordiv), "%": (6, operator.mod),
+    "@": (6, operator.matmul),
+    "**": (8, operator.pow)}
+
+# Unary operators bind tighter than all binary operators except "**".
+UNARY_OPS = {"-": operator.neg, "+": operator.pos, "~": operator.invert}
+UNARY_PRECEDENCE = 7
+
+# Python keywords which evaluate to constants.
+CONSTANTS = {"True": True, "False": False, "None": None}
+
+# All other Python keywords are not supported.
+KEYWORDS = {"and", "as", "assert", "async", "await", "break", "class",
+            "continue", "def", "del", "elif", "else", "except", "finally",
+            "for", "from", "global", "if", "import", "in", "is", "lambda",
+            "nonlocal", "not", "or", "pass", "raise", "return", "try",
+            "while", "with", "yield"}
+
+
+def tokenise(expr):
+    """
+    Split a Python expression into a list of tokens. Each token is a tuple
+    of the token type ("number", "name" or "op") and the token string.
+    Raises a ValueError if the expression contains anything which cannot be
+    evaluated with an explicit stack (e.g. strings or keyword arguments).
+
+    :param expr: A Python expression string.
+    :return: A list of tokens.
+    """
+
+    tokens, position, end = [], 0, len(expr.rstrip())
+
+    while position < end:
+        match = TOKEN_RE.match(expr, position)
+
+        if not match or match.end() == position:
+            s = "utilities.fitness.stack_eval.tokenise\n" \
+                "Error: Unsupported character at position %d in " \
+                "expression." % position
+            raise ValueError(s)
+
+        # Find the type of the matched token.
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+
+    return tokens
+
+
+def parse_number(token):
+    """
+    Convert a number token into a number, following the rules of Python
+    number literals.
+
+    :param token: A number token string.
+    :return: An int, float or complex number.
+    """
+
+    if token[-1] in "jJ":
+        # Imaginary number.
+        return complex(token)
+
+    elif "." in token or "e" in token or "E" in token:
+        # Floating point number.
+        return float(token)
+
+    elif len(token) > 1 and token[0] == "0" and token.strip("0"):
+        # Python does not allow leading zeros in non-zero integers.
+        s = "utilities.fitness.stack_eval.parse_number\n" \
+            "Error: Leading zeros in integer literal %s." % token
+        raise ValueError(s)
+
+    return int(token)
+
+
+def compile_postfix(expr):
+    """
+    Compile a Python expression into a postfix program using the
+    shunting-yard algorithm. The postfix program is a list of instructions,
+    each of which is a tuple of an instruction name and its argument:
+
+        ("const", value): push a constant.
+        ("name", parts): look up a (possibly dotted) name.
+        ("unary", function): apply a unary operator.
+        ("binary", function): apply a binary operator.
+        ("call", n): call a function with n arguments.
+        ("subscript", None): index an object.
+        ("slice", n): build a slice from n parts.
+        ("tuple", n): build a tuple from n items.
+
+    Supported expressions are numbers, names and attributes, unary and
+    binary operators, function calls with positional arguments, subscripts
+    and slices, and tuples. Boolean operators, conditional expressions,
+    chained comparisons, strings, keyword arguments and all other Python
+    syntax raise a ValueError.
+
+    Unlike Python's own parser, compilation uses no recursion, so there is
+    no limit on the nesting depth of the expression.
+
+    :param expr: A Python expression string.
+    :return: A postfix program.
+    """
+
+    program = []
+
+    # The stack of pending operators. Each item is a tuple of the operator
+    # type ("unary", "binary" or "group") and its details. Groups are
+    # opening brackets, i.e. calls, parentheses and subscripts.
+    ops = []
+
+    # Each group has a context: [group type, number of completed items,
+    # number of colons in the current item, whether the last item ended
+    # with a comma].
+    contexts = []
+
+    # Whether the parser expects an operand (True) or an operator (False)
+    # next.
+    expect_operand = True
+
+    def error(message):
+        s = "utilities.fitness.stack_eval.compile_postfix\n" \
+            "Error: %s" % message
+        return ValueError(s)
+
+    def pop_operators(precedence, right=False):
+        """
+        Pop operators from the operator stack onto the program while they
+        bind at least as tightly as a given precedence.
+
+        :param precedence: The precedence of the incoming operator.
+        :param right: True if the incoming operator is right-associative.
+        :return: True if a comparison operator was popped.
+        """
+
+        comparison = False
+
+        while ops and ops[-1][0] != "group":
+            op_precedence = ops[-1][1]
+
+            if op_precedence < precedence or \
+                    (right and op_precedence == precedence):
+                break
+
+            kind, op_precedence, function = ops.pop()
+            program.append((kind, function))
+            comparison = comparison or (kind == "binary" and
+                                        op_precedence == 0)
+
+        return comparison
+
+    def end_item(context):
+        """
+        Finish the current item of a group, i.e. an argument, a tuple item
+        or a subscript item.
+
+        :param context: The context of the current group.
+        :return: Nothing.
+        """
+
+        if context[2]:
+            # The item is a slice. Missing parts of the slice are None.
+            if expect_operand:
+                program.append(("const", None))
+            program.append(("slice", context[2] + 1))
+
+        elif expect_operand:
+            raise error("Missing item in brackets.")
+
+        context[1] += 1
+
+    for kind, token in tokenise(expr):
+
+        if kind == "number" or kind == "name":
+            if not expect_operand:
+                raise error("Unexpected operand %s." % token)
+
+            if kind == "number":
+                program.append(("const", parse_number(token)))
+
+            elif token in CONSTANTS:
+                program.append(("const", CONSTANTS[token]))
+
+            else:
+                parts = tuple(part.strip() for part in token.split("."))
+
+                if any(part in KEYWORDS or part in CONSTANTS
+                       for part in parts):
+                    raise error("Unsupported keyword in %s." % token)
+
+                program.append(("name", parts))
+
+            expect_operand = False
+
+        elif token in "([":
+
+            if expect_operand and token == "(":
+                # A parenthesised expression or a tuple.
+                contexts.append(["paren", 0, 0, False])
+
+            elif expect_operand:
+                raise error("List displays are not supported.")
+
+            elif token == "(":
+                # A function call on the preceding operand.
+                contexts.append(["call", 0, 0, False])
+
+            else:
+                # A subscript of the preceding operand.
+                contexts.append(["subscript", 0, 0, False])
+
+            ops.append(("group", None, None))
+            expect_operand = True
+
+        elif token in ")]":
+            if not contexts:
+                raise error("Unbalanced brackets.")
+
+            context = contexts.pop()
+
+            if (token == ")") == (context[0] == "subscript"):
+                raise error("Mismatched brackets.")
+
+            pop_operators(-1)
+            ops.pop()
+
+            if expect_operand and not context[2] and \
+                    (context[1] == 0 or context[3]):
+                # The group is empty, or its last item ended with a comma.
+                if context[0] == "subscript" and context[1] == 0:
+                    raise error("Empty subscript.")
+                tuple_items = True
+
+            else:
+                end_item(context)
+                tuple_items = context[1] > 1
+
+            if context[0] == "call":
+                program.append(("call", context[1]))
+
+            elif tuple_items or (context[0] == "paren" and context[1] == 0):
+                # The group is a tuple (or a subscript by a tuple).
+                program.append(("tuple", context[1]))
+
+                if context[0] == "subscript":
+                    program.append(("subscript", None))
+
+            elif context[0] == "subscript":
+                program.append(("subscript", None))
+
+            expect_operand = False
+
+        elif token == ",":
+            if not contexts:
+                raise error("Tuples must be enclosed in brackets.")
+
+            pop_operators(-1)
+            end_item(contexts[-1])
+            contexts[-1][2], contexts[-1][3] = 0, True
+            expect_operand = True
+
+        elif token == ":":
+            if not contexts or contexts[-1][0] != "subscript" or \
+                    contexts[-1][2] == 2:
+                raise error("Unexpected colon.")
+
+            pop_operators(-1)
+
+            if expect_operand:
+                # Missing parts of the slice are None.
+                program.append(("const", None))
+
+            contexts[-1][2] += 1
+            expect_operand = True
+
+        elif expect_operand:
+            # A unary operator.
+            if token not in UNARY_OPS:
+                raise error("Unexpected operator %s." % token)
+
+            ops.append(("unary", UNARY_PRECEDENCE, UNARY_OPS[token]))
+
+        else:
+            # A binary operator.
+            precedence, function = BINARY_OPS[token]
+
+            if pop_operators(precedence, right=(token == "**")) and \
+                    precedence == 0:
+                raise error("Chained comparisons are not supported.")
+
+            ops.append(("binary", precedence, function))
+            expect_operand = True
+
+            if contexts:
+                # The current item of the group has not ended.
+                contexts[-1][3] = False
+
+        if contexts and kind != "op":
+            # An operand is part of the current item of the group.
+            contexts[-1][3] = False
+
+    if contexts:
+        raise error("Unbalanced brackets.")
+
+    elif expect_operand:
+        raise error("Incomplete expression.")
+
+    pop_operators(-1)
+
+    return program
+
+
+def get_arity(instruction, argument):
+    """
+    Returns the number of operands taken from the value stack by an
+    instruction of a postfix program.
+
+    :param instruction: The name of the instruction.
+    :param argument: The argument of the instruction.
+    :return: The number of operands of the instruction.
+    """
+
+    if instruction in ("const", "name"):
+        return 0
+
+    elif instruction == "unary":
+        return 1
+
+    elif instruction in ("binary", "subscript"):
+        return 2
+
+    elif instruction == "call":
+        # The function and its arguments.
+        return argument + 1
+
+    else:
+        # Slices and tuples.
+        return argument
+
+
+def apply_instruction(instruction, argument, operands, global_vars,
+                      local_vars):
+    """
+    Apply a single instruction of a postfix program to its operands.
+
+    :param instruction: The name of the instruction.
+    :param argument: The argument of the instruction.
+    :param operands: A list of the operands of the instruction.
+    :param global_vars: A dictionary of global variables.
+    :param local_vars: A dictionary of local variables. Names are looked up
+    first in the local variables, then the global variables, then Python
+    builtins.
+    :return: The value of the instruction.
+    """
+
+    if instruction == "const":
+        return argument
+
+    elif instruction == "name":
+        # Look up the first part of the name, then any attributes.
+        name = argument[0]
+
+        if name in local_vars:
+            value = local_vars[name]
+        elif name in global_vars:
+            value = global_vars[name]
+        elif hasattr(builtins, name):
+            value = getattr(builtins, name)
+        else:
+            raise NameError("name '%s' is not defined" % name)
+
+        for attribute in argument[1:]:
+            value = getattr(value, attribute)
+
+        return value
+
+    elif instruction == "binary":
+        return argument(operands[0], operands[1])
+
+    elif instruction == "unary":
+        return argument(operands[0])
+
+    elif instruction == "call":
+        return operands[0](*operands[1:])
+
+    elif instruction == "subscript":
+        return operands[0][operands[1]]
+
+    elif instruction == "slice":
+        return slice(*operands)
+
+    elif instruction == "tuple":
+        return tuple(operands)
+
+
+def eval_postfix(program, global_vars, local_vars):
+    """
+    Evaluate a postfix program compiled by compile_postfix using an explicit
+    value stack.
+
+    :param program: A postfix program.
+    :param global_vars: A dictionary of global variables.
+    :param local_vars: A dictionary of local variables.
+    :return: The value of the program.
+    """
+
+    stack = []
+
+    for instruction, argument in program:
+
+        # Take the operands of the instruction from the stack.
+        arity = get_arity(instruction, argument)
+        operands = stack[len(stack) - arity:]
+        del stack[len(stack) - arity:]
+
+        stack.append(apply_instruction(instruction, argument, operands,
+                                       global_vars, local_vars))
+
+    return stack[-1]
+
+
+def stack_eval(expr, global_vars, local_vars):
+    """
+    Evaluate a Python expression with an explicit stack rather than with
+    Python's eval(). Python's parser and compiler are recursive, and so
+    eval() fails on deeply nested expressions, e.g. the phenotypes of very
+    deep derivation trees. Expressions which are not supported by
+    compile_postfix are evaluated with eval() instead.
+
+    :param expr: A Python expression string.
+    :param global_vars: A dictionary of global variables.
+    :param local_vars: A dictionary of local variables.
+    :return: The value of the expression.
+    """
+
+    try:
+        program = get_code(("postfix", expr), lambda: compile_postfix(expr))
+
+    except ValueError:
+        # The expression is not supported, fall back to eval().
+        return eval(compile_cached(expr), global_vars, local_vars)
+
+    return eval_postfix(program, global_vars, local_vars)
@@ -51,6 +51,10 @@ def check_genome_mapping(ind):
     attributes_0 = vars(ind)
     attributes_1 = vars(new_ind)
 
+    # Mapping checkpoints depend on how each individual was created, and
+    # are not genome-encoded attributes.
+    attributes_1['checkpoints'] = attributes_0['checkpoints']
+
     if params['GENOME_OPERATIONS']:
         # If this parameter is set then the new individual will have no tree.
         attributes_0['tree'] = None
@@ -128,43 +132,46 @@ def check_genome_from_tree(ind_tree):
     :return: Nothing.
     """
 
-    if ind_tree.children:
-        # This node has children and thus must have an associated codon.
+    # Traverse the tree in preorder using an explicit stack.
+    stack = [ind_tree]
 
-        if not ind_tree.codon:
-            s = "utilities.representation.check_methods." \
-                "check_genome_from_tree\n" \
-                "Error: Node with children has no codon.\n" \
-                "       %s" % (str(ind_tree.children))
-            raise Exception(s)
+    while stack:
+        node = stack.pop()
 
-        # Check production choices for node root.
-        productions = params['BNF_GRAMMAR'].rules[ind_tree.root]['choices']
+        if node.children:
+            # This node has children and thus must have an associated codon.
 
-        # Select choice based on node codon.
-        selection = ind_tree.codon % len(productions)
-        chosen_prod = productions[selection]
+            if not node.codon:
+                s = "utilities.representation.check_methods." \
+                    "check_genome_from_tree\n" \
+                    "Error: Node with children has no codon.\n" \
+                    "       %s" % (str(node.children))
+                raise Exception(s)
 
-        # Build list of roots of the chosen production.
-        prods = [prod['symbol'] for prod in chosen_prod['choice']]
-        roots = []
+            # Check production choices for node root.
+            productions = params['BNF_GRAMMAR'].rules[node.root]['choices']
 
-        # Build list of the roots of all node children.
-        for kid in ind_tree.children:
-            roots.append(kid.root)
+            # Select choice based on node codon.
+            selection = node.codon % len(productions)
+            chosen_prod = productions[selection]
 
-        # Match production roots with children roots.
-        if roots != prods:
-            s = "utilities.representation.check_methods." \
-                "check_genome_from_tree\n" \
-                "Error: Codons are incorrect for given tree.\n" \
-                "       Codon productions:\t%s\n       " \
-                "       Actual children:\t%s" % (str(prods), str(roots))
-            raise Exception(s)
+            # Build list of roots of the chosen production.
+            prods = [prod['symbol'] for prod in chosen_prod['choice']]
+
+            # Build list of the roots of all node children.
+            roots = [kid.root for kid in node.children]
+
+            # Match production roots with children roots.
+            if roots != prods:
+                s = "utilities.representation.check_methods." \
+                    "check_genome_from_tree\n" \
+                    "Error: Codons are incorrect for given tree.\n" \
+                    "       Codon productions:\t%s\n       " \
+                    "       Actual children:\t%s" % (str(prods), str(roots))
+                raise Exception(s)
 
-    for kid in ind_tree.children:
-        # Recurse over all children.
-        check_genome_from_tree(kid)
+        # Check all children, leftmost child first.
+        stack.extend(reversed(node.children))
 
 
 def check_expansion(tree, nt_keys):
@@ -177,24 +184,23 @@ def check_expansion(tree, nt_keys):
     :return: True if tree is not fully expanded, else False.
     """
 
-    check = False
-    if tree.root in nt_keys:
-        # Current node is a NT and should have children
-        if tree.children:
-            # Everything is as expected
-            for child in tree.children:
-                # Recurse over all children.
-                check = child.check_expansion(nt_keys)
+    # Traverse all non-terminal nodes using an explicit stack.
+    stack = [tree]
 
-                if check:
-                    # End recursion.
-                    break
+    while stack:
+        node = stack.pop()
 
-        else:
-            # Current node is not completely expanded.
-            check = True
+        if node.root in nt_keys:
+            # Current node is a NT and should have children
+
+            if not node.children:
+                # Current node is not completely expanded.
+                return True
 
-    return check
+            # Everything is as expected, check all children.
+            stack.extend(reversed(node.children))
+
+    return False
 
 
 def build_genome(tree, genome):
@@ -206,13 +212,17 @@ def build_genome(tree, genome):
     :return: The fully built genome of a subtree.
     """
 
-    if tree.codon:
-        # If the current node has a codon, append it to the genome.
-        genome.append(tree.codon)
+    # Traverse the tree in preorder using an explicit stack.
+    stack = [tree]
+
+    while stack:
+        node = stack.pop()
 
-    for child in tree.children:
-        # Recurse on all children.
-        genome = child.build_genome(genome)
+        if node.codon:
+            # If the current node has a codon, append it to the genome.
+            genome.append(node.codon)
+
+        stack.extend(reversed(node.children))
 
     return genome
 
@@ -227,36 +237,42 @@ def get_nodes_and_depth(tree, nodes=0, max_depth=0):
     :return: number, max_depth.
     """
 
-    # Increment number of nodes in the tree.
-    nodes += 1
-
-    # Set the depth of the current node.
-    if tree.parent:
-        tree.depth = tree.parent.depth + 1
-    else:
-        tree.depth = 1
-
-    # Check the recorded max_depth.
-    if tree.depth > max_depth:
-        max_depth = tree.depth
+    # Traverse the tree in preorder using an explicit stack, so that the
+    # depth of each parent is set before the depths of its children.
+    stack = [tree]
 
-    # Create list of all non-terminal children of current node.
-    NT_kids = [kid for kid in tree.children if kid.root in
-               params['BNF_GRAMMAR'].non_terminals]
+    while stack:
+        node = stack.pop()
 
-    if not NT_kids and get_output(tree):
-        # Current node has only terminal children.
+        # Increment number of nodes in the tree.
         nodes += 1
 
-        # Terminal children increase the current node depth by one.
+        # Set the depth of the current node.
+        if node.parent:
+            node.depth = node.parent.depth + 1
+        else:
+            node.depth = 1
+
         # Check the recorded max_depth.
-        if tree.depth + 1 > max_depth:
-            max_depth = tree.depth + 1
+        if node.depth > max_depth:
+            max_depth = node.depth
 
-    else:
-        for child in NT_kids:
-            # Recurse over all children.
-            nodes, max_depth = get_nodes_and_depth(child, nodes, max_depth)
+        # Create list of all non-terminal children of current node.
+        NT_kids = [kid for kid in node.children if kid.root in
+                   params['BNF_GRAMMAR'].non_terminals]
+
+        if not NT_kids and get_output(node):
+            # Current node has only terminal children.
+            nodes += 1
+
+            # Terminal children increase the current node depth by one.
+            # Check the recorded max_depth.
+            if node.depth + 1 > max_depth:
+                max_depth = node.depth + 1
+
+        else:
+            # Visit all non-terminal children.
+            stack.extend(reversed(NT_kids))
 
     return nodes, max_depth
 
@@ -270,11 +286,17 @@ def get_max_tree_depth(tree, max_depth=1):
     :return: The maximum depth of the tree.
     """
 
-    curr_depth = get_current_depth(tree)
-    if curr_depth > max_depth:
-        max_depth = curr_depth
-    for child in tree.children:
-        max_depth = get_max_tree_depth(child, max_depth)
+    # Traverse the tree using an explicit stack of nodes and their depths.
+    stack = [(tree, get_current_depth(tree))]
+
+    while stack:
+        node, curr_depth = stack.pop()
+
+        if curr_depth > max_depth:
+            max_depth = curr_depth
+
+        stack.extend([(child, curr_depth + 1) for child in node.children])
+
     return max_depth
 
 
@@ -307,38 +329,31 @@ def get_current_depth(tree):
 
 def get_output(ind_tree):
     """
-    Calls the recursive build_output(self) which returns a list of all
-    node roots. Joins this list to create the full phenotype of an
-    individual. This two-step process speeds things up as it only joins
-    the phenotype together once rather than at every node.
+    Builds a list of all leaf node roots and joins this list to create the
+    full phenotype of an individual. This two-step process speeds things up
+    as it only joins the phenotype together once rather than at every node.
 
     :param ind_tree: a full tree for which the phenotype string is to be built.
     :return: The complete built phenotype string of an individual.
     """
 
-    def build_output(tree):
-        """
-        Recursively adds all node roots to a list which can be joined to
-        create the phenotype.
+    # Traverse the tree in preorder using an explicit stack, and add all leaf
+    # node roots to a list.
+    output, stack = [], list(reversed(ind_tree.children))
 
-        :return: The list of all node roots.
-        """
+    while stack:
+        child = stack.pop()
 
-        output = []
-        for child in tree.children:
-            if not child.children:
-                # If the current child has no children it is a terminal.
-                # Append it to the output.
-                output.append(child.root)
+        if not child.children:
+            # If the current child has no children it is a terminal.
+            # Append it to the output.
+            output.append(child.root)
 
-            else:
-                # Otherwise it is a non-terminal. Recurse on all
-                # non-terminals.
-                output += build_output(child)
-
-        return output
+        else:
+            # Otherwise it is a non-terminal. Visit all its children.
+            stack.extend(reversed(child.children))
 
-    return "".join(build_output(ind_tree))
+    return "".join(output)
 
 
 def ret_true(obj):
@@ -384,32 +399,36 @@ def generate_codon(NT, choice):
 
 def check_tree(tree):
     """
-    Recursively traverse a tree and ensure that all parents and children are
-    correct.
+    Traverse a tree and ensure that all parents and children are correct.
     
     :param tree: A tree.
     :return: Nothing.
     """
 
-    if tree.children:
+    # Traverse the tree in preorder using an explicit stack.
+    stack = [tree]
 
-        if not tree.codon:
-            s = "utilities.representation.check_methods.check_tree\n" \
-                "Error: Node with children has no associated codon."
-            raise Exception(s)
+    while stack:
+        node = stack.pop()
 
-        for child in tree.children:
+        if node.children:
 
-            if child.parent != tree:
+            if not node.codon:
                 s = "utilities.representation.check_methods.check_tree\n" \
-                    "Error: Child doesn't belong to parent.\n" \
-                    "       Child parent:  %s\n" \
-                    "       Actual parent: %s\n" \
-                    "       Child P depth: %s\n" \
-                    "       Parent depth:  %s" % \
-                    (child.parent.root, tree.root,
-                     child.parent.depth, tree.depth)
+                    "Error: Node with children has no associated codon."
                 raise Exception(s)
 
-            else:
-                check_tree(child)
+            for child in node.children:
+
+                if child.parent != node:
+                    s = "utilities.representation.check_methods.check_tree\n" \
+                        "Error: Child doesn't belong to parent.\n" \
+                        "       Child parent:  %s\n" \
+                        "       Actual parent: %s\n" \
+                        "       Child P depth: %s\n" \
+                        "       Parent depth:  %s" % \
+                        (child.parent.root, node.root,
+                         child.parent.depth, node.depth)
+                    raise Exception(s)
+
+            stack.extend(reversed(node.children))
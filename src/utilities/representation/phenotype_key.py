@@ -0,0 +1,65 @@
+from hashlib import blake2b
+
+from algorithm.parameters import params
+from utilities.stats import trackers
+
+"""Keys for looking up phenotypes in caches and sets of phenotypes. For
+grammars which produce long phenotypes (e.g. program synthesis), storing the
+full phenotype string as the key of every cache entry uses a lot of memory.
+Instead, a fixed-size digest of the phenotype can be used as the key,
+depending on params['PHENOTYPE_KEYS']:
+    "phenotype": the phenotype string itself is the key (the default),
+    "digest": a 16 byte digest of the phenotype is the key,
+    "verified_digest": as "digest", but all phenotypes are also stored so
+        that digest collisions are detected. This uses more memory than
+        "phenotype" and is only meant for checking that digests are safe
+        for a given problem."""
+
+# The size of phenotype digests in bytes. The probability of a collision
+# between any two of a billion phenotypes is about 1e-21.
+DIGEST_SIZE = 16
+
+verified = {}
+# This dict stores the phenotype of each digest when digests are verified.
+
+
+def get_phenotype_key(phenotype):
+    """
+    Returns the key of a phenotype for use in caches and sets of phenotypes.
+
+    :param phenotype: A phenotype string.
+    :return: The phenotype string itself, or a digest of the phenotype.
+    """
+
+    if params['PHENOTYPE_KEYS'] == "phenotype":
+        return phenotype
+
+    key = blake2b(phenotype.encode(), digest_size=DIGEST_SIZE).digest()
+
+    if params['PHENOTYPE_KEYS'] == "verified_digest":
+        # Check that no other phenotype has the same digest.
+        if verified.setdefault(key, phenotype) != phenotype:
+            s = "utilities.representation.phenotype_key.get_phenotype_key\n" \
+                "Error: digest collision between phenotypes:\n" \
+                "       %s\n       %s" % (verified[key], phenotype)
+            raise Exception(s)
+
+    return key
+
+
+def intern_phenotype(phenotype):
+    """
+    Returns the copy of a phenotype string held by the fitness cache, so that
+    individuals with the same phenotype share a single copy of the string.
+    Phenotypes are not interned with sys.intern, as interned strings may
+    never be freed, which would keep every phenotype of a run in memory no
+    matter how the cache is bounded.
+
+    :param phenotype: A phenotype string, or None for unmapped individuals.
+    :return: The shared phenotype string.
+    """
+
+    if phenotype is None or not params['CACHE']:
+        return phenotype
+
+    return trackers.cache.get_canonical(phenotype)
@@ -0,0 +1,347 @@
+import heapq
+from collections import OrderedDict, deque
+from hashlib import blake2b
+from math import log
+from sys import getsizeof
+
+import numpy as np
+from algorithm.parameters import params
+
+"""Trackers with bounded memory use, for long runs where the trackers in
+utilities.stats.trackers would otherwise grow without limit."""
+
+# The approximate number of bytes used by the fitness cache for each entry,
+# in addition to the phenotype and fitness themselves (i.e. hash table slots,
+# links used for eviction and the entry of the canonical phenotype).
+ENTRY_OVERHEAD = 180
+
+
+class DistinctCounter(object):
+    """
+    Approximate counter of distinct phenotype keys, using the HyperLogLog
+    algorithm. Memory use is fixed (one byte per register) no matter how
+    many keys are added. With the default of 2^14 registers the relative
+    error of the count is about 0.8%; small counts are almost exact.
+    """
+
+    def __init__(self, precision=14):
+        """
+        Initialise an empty counter.
+
+        :param precision: The number of bits of each hash used to select a
+        register. The counter has 2^precision registers.
+        """
+
+        self.precision = precision
+        self.registers = bytearray(2 ** precision)
+
+    def add(self, item):
+        """
+        Add a phenotype key to the counter.
+
+        :param item: A string or bytes, e.g. a phenotype key.
+        :return: Nothing.
+        """
+
+        if isinstance(item, str):
+            item = item.encode()
+
+        # A stable 64 bit hash, so that counters saved in the state of a run
+        # remain valid when the run is loaded by another process.
+        h = int.from_bytes(blake2b(item, digest_size=8).digest(), "big")
+
+        # The first bits of the hash select a register; the register keeps
+        # the largest position of the first set bit in the remaining bits.
+        bits = 64 - self.precision
+        index, rest = h >> bits, h & ((1 << bits) - 1)
+        rank = bits - rest.bit_length() + 1
+
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        """
+        Estimate the number of distinct keys added to the counter.
+
+        :return: The estimated number of distinct keys.
+        """
+
+        m = len(self.registers)
+        registers = np.frombuffer(bytes(self.registers), dtype=np.uint8)
+
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -registers.astype(float))
+
+        zeros = m - np.count_nonzero(registers)
+        if estimate <= 2.5 * m and zeros:
+            # Use linear counting for small counts.
+            estimate = m * log(m / zeros)
+
+        return int(round(estimate))
+
+
+class FitnessCache(object):
+    """
+    A dictionary of the fitnesses of phenotypes, which can be bounded in the
+    number of entries (params['CACHE_SIZE']) and in its approximate memory
+    use in megabytes (params['CACHE_MEMORY']). When the cache is full,
+    entries are evicted according to params['CACHE_EVICTION']:
+        "lru": the least recently used entry is evicted first,
+        "lfu": the least frequently used entry is evicted first,
+        "age": the entry added in the earliest generation is evicted first.
+    If neither bound is set the cache keeps all entries, like a plain dict.
+
+    Since evicted phenotypes can no longer be counted, the number of
+    distinct phenotypes ever added to a bounded cache is tracked by an
+    approximate distinct counter.
+
+    The cache also keeps the phenotype string of each entry, so that
+    individuals with the same phenotype as an entry can share its string
+    (see utilities.representation.phenotype_key.intern_phenotype). Strings
+    are only kept for as long as their entries.
+    """
+
+    def __init__(self):
+        """
+        Initialise an empty fitness cache.
+        """
+
+        # The fitness of each phenotype. Entries are kept in eviction order
+        # for the "lru" and "age" policies.
+        self.entries = OrderedDict()
+
+        # The number of uses of each phenotype, for the "lfu" policy.
+        self.uses = {}
+
+        # The order in which phenotypes were added, used to break ties
+        # between equally used phenotypes, and a heap of (uses, order,
+        # phenotype) tuples, for the "lfu" policy. The heap is updated
+        # lazily: when a phenotype is used, a new tuple is pushed and the old
+        # one is left in the heap, and is skipped when it is popped.
+        self.order, self.heap, self.added = {}, [], 0
+
+        # The phenotype string of each entry, by the phenotype, when
+        # phenotypes are their own keys.
+        self.canonical = {}
+
+        # The approximate memory use of all entries, in bytes.
+        self.memory = 0
+
+        # The number of entries evicted so far.
+        self.evictions = 0
+
+        # The approximate number of distinct phenotypes ever added.
+        self.distinct = DistinctCounter()
+
+    def __contains__(self, phenotype):
+        return phenotype in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, phenotype):
+        """
+        Look up the fitness of a phenotype, and mark the phenotype as used.
+
+        :param phenotype: A phenotype string.
+        :return: The fitness of the phenotype.
+        """
+
+        fitness = self.entries[phenotype]
+
+        if params['CACHE_EVICTION'] == "lru":
+            self.entries.move_to_end(phenotype)
+
+        elif params['CACHE_EVICTION'] == "lfu":
+            self.count_use(phenotype)
+
+        return fitness
+
+    def __setitem__(self, phenotype, fitness):
+        """
+        Set the fitness of a phenotype, evicting other entries if the cache
+        is full.
+
+        :param phenotype: A phenotype string.
+        :param fitness: The fitness of the phenotype.
+        :return: Nothing.
+        """
+
+        bounded = self.is_bounded()
+
+        if phenotype in self.entries:
+            # Replace the existing entry.
+            self.memory -= entry_size(phenotype, self.entries[phenotype])
+            if params['CACHE_EVICTION'] == "lru":
+                self.entries.move_to_end(phenotype)
+
+        elif bounded:
+            # Count the new phenotype.
+            self.distinct.add(phenotype)
+
+        self.entries[phenotype] = fitness
+        self.memory += entry_size(phenotype, fitness)
+
+        if isinstance(phenotype, str):
+            self.canonical.setdefault(phenotype, phenotype)
+
+        if params['CACHE_EVICTION'] == "lfu":
+            self.count_use(phenotype)
+
+        if bounded:
+            self.evict()
+
+    def count_use(self, phenotype):
+        """
+        Count a use of a phenotype, for the "lfu" policy.
+
+        :param phenotype: A phenotype string.
+        :return: Nothing.
+        """
+
+        if phenotype not in self.order:
+            self.order[phenotype] = self.added
+            self.added += 1
+
+        self.uses[phenotype] = self.uses.get(phenotype, 0) + 1
+        heapq.heappush(self.heap, (self.uses[phenotype],
+                                   self.order[phenotype], phenotype))
+
+        if len(self.heap) > 2 * len(self.entries) + 100:
+            # Remove the out of date tuples from the heap.
+            self.heap = [(uses, self.order[phenotype], phenotype) for
+                         phenotype, uses in self.uses.items()]
+            heapq.heapify(self.heap)
+
+    def is_bounded(self):
+        """
+        :return: True if the size or memory use of the cache is bounded.
+        """
+
+        return bool(params['CACHE_SIZE'] or params['CACHE_MEMORY'])
+
+    def is_full(self):
+        """
+        :return: True if the cache holds more entries or uses more memory
+        than allowed.
+        """
+
+        return (params['CACHE_SIZE'] and
+                len(self.entries) > params['CACHE_SIZE']) or \
+            (params['CACHE_MEMORY'] and
+             self.memory > params['CACHE_MEMORY'] * 1024 * 1024)
+
+    def evict(self):
+        """
+        Evict entries until the cache is no longer full.
+
+        :return: Nothing.
+        """
+
+        while self.entries and self.is_full():
+
+            if params['CACHE_EVICTION'] == "lfu":
+                # The least frequently used entry is at the top of the heap,
+                # once out of date tuples have been skipped. Ties are broken
+                # by age.
+                while True:
+                    uses, order, phenotype = heapq.heappop(self.heap)
+                    if self.uses.get(phenotype) == uses and \
+                            self.order.get(phenotype) == order:
+                        break
+
+            else:
+                # The first entry is the least recently used or the oldest.
+                phenotype = next(iter(self.entries))
+
+            self.memory -= entry_size(phenotype, self.entries.pop(phenotype))
+            self.uses.pop(phenotype, None)
+            self.order.pop(phenotype, None)
+            self.canonical.pop(phenotype, None)
+            self.evictions += 1
+
+    def get_canonical(self, phenotype):
+        """
+        Returns the string of a phenotype which is shared by all individuals
+        with that phenotype.
+
+        :param phenotype: A phenotype string.
+        :return: The phenotype string of the entry of the phenotype, or the
+        phenotype itself if it is not in the cache.
+        """
+
+        return self.canonical.get(phenotype, phenotype)
+
+    def count_distinct(self):
+        """
+        :return: The number of distinct phenotypes ever added to the cache.
+        This is exact for an unbounded cache, and approximate otherwise.
+        """
+
+        if self.is_bounded():
+            return self.distinct.count()
+
+        return len(self.entries)
+
+
+class RuntimeErrorLog(object):
+    """
+    Counter of the runtime errors of a run, which keeps only a bounded
+    sample of the phenotypes which caused them: the most recent
+    params['RUNTIME_ERROR_SAMPLE_SIZE'] phenotypes. Can be used in place of
+    a list of phenotypes, i.e. phenotypes are added with append() and the
+    number of runtime errors is given by len().
+    """
+
+    def __init__(self):
+        """
+        Initialise an empty log.
+        """
+
+        # The number of runtime errors so far.
+        self.count = 0
+
+        # The phenotypes of the most recent runtime errors.
+        self.sample = deque()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.sample)
+
+    def append(self, phenotype):
+        """
+        Record a runtime error.
+
+        :param phenotype: The phenotype which caused the runtime error.
+        :return: Nothing.
+        """
+
+        self.count += 1
+        self.sample.append(phenotype)
+
+        while len(self.sample) > params['RUNTIME_ERROR_SAMPLE_SIZE']:
+            # Drop the oldest phenotype from the sample.
+            self.sample.popleft()
+
+
+def entry_size(phenotype, fitness):
+    """
+    Estimate the memory used by an entry of the fitness cache.
+
+    :param phenotype: A phenotype string.
+    :param fitness: The fitness of the phenotype, a number or a list of
+    numbers for multi-objective problems.
+    :return: The approximate size of the entry in bytes.
+    """
+
+    size = ENTRY_OVERHEAD + getsizeof(phenotype) + getsizeof(fitness)
+
+    if isinstance(fitness, list):
+        size += sum([getsizeof(i) for i in fitness])
+
+    return size
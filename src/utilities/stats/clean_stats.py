@@ -16,3 +16,9 @@ def clean_stats():
 
     if not params['MUTATE_DUPLICATES']:
         stats.pop('regens')
+
+    if not params['RACING_QUANTILE']:
+        stats.pop('truncated')
+
+    if not params['REGEX_BACKTRACKING_CHECK']:
+        stats.pop('rejected_regexes')
@@ -1,13 +1,17 @@
 """Utilities for tracking progress of runs, including time taken per
 generation, fitness plots, fitness caches, etc."""
 
-cache = {}
-# This dict stores the cache for an evolutionary run. The key for each entry
-# is the phenotype of the individual, the value is its fitness.
+from utilities.stats.bounded_trackers import FitnessCache, RuntimeErrorLog
 
-runtime_error_cache = []
-# This list stores a list of phenotypes which produce runtime errors over an
-# evolutionary run.
+cache = FitnessCache()
+# This dict-like object stores the cache for an evolutionary run. The key for
+# each entry is the phenotype of the individual, the value is its fitness.
+# The size of the cache can be bounded, see
+# utilities.stats.bounded_trackers.FitnessCache.
+
+runtime_error_cache = RuntimeErrorLog()
+# This list-like object counts the runtime errors over an evolutionary run,
+# and stores a sample of the phenotypes which produced them.
 
 best_fitness_list = []
 # fitness_plot is simply a list of the best fitnesses at each generation.